@@ -1,11 +1,13 @@
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from qdrant_client.models import Filter, FieldCondition, MatchValue
 from contextlib import asynccontextmanager
 from sqlmodel import select
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
+import asyncio
+from functools import partial
 from typing import List, Optional
 from pydantic import BaseModel
 import re
@@ -16,6 +18,7 @@ from prometheus_fastapi_instrumentator import Instrumentator
 
 from chat import ChatRouter, LegalRAGChain, WebLawChain, ChitChatChain, HybridChain, ChatMode
 from rag import RAG
+from components import ComponentLoader
 from models import get_async_session, VBQPPLDoc, VBQPPLSection, PhapDienDieu
 
 logging.basicConfig(level=logging.INFO)
@@ -27,19 +30,34 @@ web_chain = None
 chit_chat_chain = None
 rag_engine = None
 hybrid_chain = None
+components = None
+
+# RAG components each endpoint needs (see RAG.COMPONENTS)
+SEARCH_COMPONENTS = ("qdrant", "dense_encoder", "sparse_encoder")
+CHAT_COMPONENTS = SEARCH_COMPONENTS + ("reranker",)
+# Seconds between attempts to reach Qdrant (or the model server) while it is down
+RETRY_INTERVAL = 5.0
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global router, legal_rag_chain, web_chain, chit_chat_chain, hybrid_chain, rag_engine
+    global router, legal_rag_chain, web_chain, chit_chat_chain, hybrid_chain, rag_engine, components
     
-    # 1. Init RAG Engine (Heavy loading)
-    try:
-        logging.info("Initializing RAG Engine...")
-        rag_engine = RAG()
-        logging.info("RAG Engine Initialized.")
-    except Exception as e:
-        logging.error(f"FATAL: Failed to initialize RAG: {str(e)}")
-        raise
+    # 1. Init RAG Engine: models load in the background, DB-only endpoints are served meanwhile
+    rag_engine = RAG(lazy=True)
+    components = ComponentLoader()
+    # Components served by another process are retried until it is up
+    remote = {"qdrant"}
+    if rag_engine.model_server_client is not None:
+        remote |= {"dense_encoder", "sparse_encoder"}
+    for name in RAG.COMPONENTS:
+        components.register(
+            name, partial(rag_engine.load_component, name),
+            # Without the citation index, retrieval only loses exact citation lookups
+            required=name != "citation_index",
+            retry_interval=RETRY_INTERVAL if name in remote else None
+        )
+    components.start()
+    logging.info("Loading RAG components in the background...")
 
     # 2. Init Chat Strategies
     try:
@@ -56,6 +74,7 @@ async def lifespan(app: FastAPI):
     yield
     
     # Cleanup
+    components.shutdown()
     if rag_engine:
         rag_engine.close()
         logging.info("RAG Engine Closed.")
@@ -75,9 +94,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def require_components(names):
+    """Raise 503 while any of the given RAG components is still loading (or failed)"""
+    if not rag_engine or components is None:
+        raise HTTPException(status_code=503, detail="RAG Engine not ready")
+    missing = components.missing(names)
+    if missing:
+        raise HTTPException(status_code=503, detail=f"RAG components not ready: {', '.join(missing)}")
+
 @app.get("/")
 async def root():
-    return {"status": "ok", "message": "Law RAG API is ready"}
+    ready = components is not None and components.ready()
+    return {"status": "ok", "ready": ready,
+            "message": "Law RAG API is ready" if ready else "Law RAG API is starting"}
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: per-component load state; 503 until every required component is loaded"""
+    if components is None:
+        return JSONResponse(status_code=503, content={"ready": False, "components": {}})
+    status = components.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
 
 class ChatRequest(BaseModel):
     message: str
@@ -85,10 +127,35 @@ class ChatRequest(BaseModel):
     mode: ChatMode = ChatMode.AUTO 
     stream: bool = True # Flag to control streaming vs full response
 
+class SearchRequest(BaseModel):
+    query: str
+    top_k: int = 10
+    collections: Optional[List[str]] = None
+    doc_ids: Optional[List[str]] = None  # Restrict to these documents (e.g. ["57/2020/QH14"])
+    auto_filter: bool = True  # Detect document numbers / law names in the query
+
+@app.post("/search")
+async def search_endpoint(request: SearchRequest):
+    """
+    Hybrid retrieval without LLM generation, optionally scoped to documents.
+    """
+    require_components(SEARCH_COMPONENTS)
+    try:
+        return await asyncio.to_thread(
+            rag_engine.retrieve,
+            request.query,
+            top_k=request.top_k,
+            collection_names=request.collections,
+            doc_ids=request.doc_ids,
+            auto_filter=request.auto_filter
+        )
+    except Exception as e:
+        logging.error(f"Search Error: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
-    if not rag_engine:
-        raise HTTPException(status_code=503, detail="RAG Engine not ready")
+    require_components(CHAT_COMPONENTS)
 
     async def chat_streamer():
         try:
@@ -331,7 +398,10 @@ async def get_document(doc_id: str, session: AsyncSession = Depends(get_async_se
                     "source": "vbqppl"
                 },
                 "content": content_list,
-                "full_content": doc.content
+                # Crawls with --content-mode lazy leave content empty when there are sections
+                "full_content": doc.content or "\n\n".join(
+                    f"{section.label}\n{section.content}" for section in sections
+                )
             }
         
         # Fallback: Try Qdrant/Pháp Điển if not found in VBQPPL (legacy support)
@@ -0,0 +1,68 @@
+"""
+Section-level vs clause-level retrieval on du_lieu_luat_dataset.json
+
+Runs RAG.retrieve on the VBQPPL collection for every question, once on the
+Điều-level sections and once on the Khoản/Điểm sub-chunks (built with
+`python ingest_qdrant.py --clauses`), and reports:
+
+- retrieval recall of the citations in the reference answer, matched the same
+  way as compute_metrics.py
+- prompt size of the packed context (format_law_docs_for_prompt), in
+  characters and words
+
+    python benchmark_clauses.py --input ../data/du_lieu_luat_dataset.json --top-k 10
+"""
+import json
+import time
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+
+from rag import RAG
+from chat import format_law_docs_for_prompt
+from compute_metrics import extract_citations_from_text, match_docs_to_citations
+
+load_dotenv()
+
+
+def run(rag_engine, questions, top_k, clause_level):
+    recalls, chars, words, latencies = [], [], [], []
+    for question, answer in questions:
+        start = time.perf_counter()
+        sources = rag_engine.retrieve(
+            question, top_k=top_k, collection_names=[rag_engine.vb_collection_name], clause_level=clause_level
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        matched, clean_gt = match_docs_to_citations(extract_citations_from_text(answer), sources)
+        recalls.append(len(matched) / len(clean_gt) if clean_gt else 1.0)
+        prompt = format_law_docs_for_prompt(sources)
+        chars.append(len(prompt))
+        words.append(len(prompt.split()))
+    return recalls, chars, words, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Section-level vs clause-level retrieval (recall, prompt size)")
+    parser.add_argument("--input", default="../data/du_lieu_luat_dataset.json")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=None, help="Max number of questions")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        dataset = json.load(f)
+    questions = [(item["question"], item.get("answer", "")) for item in dataset if item.get("question")]
+    questions = questions[:args.limit]
+    print(f"Loaded {len(questions)} questions from {args.input}")
+
+    rag_engine = RAG()
+    print(f"{'mode':<10} {'recall@' + str(args.top_k):>10} {'chars':>9} {'words':>8} {'p50 ms':>8}")
+    for mode, clause_level in (("section", False), ("clause", True)):
+        recalls, chars, words, latencies = run(rag_engine, questions, args.top_k, clause_level)
+        print(f"{mode:<10} {np.mean(recalls):>10.4f} {np.mean(chars):>9.0f} {np.mean(words):>8.0f} "
+              f"{np.percentile(latencies, 50):>8.1f}")
+    rag_engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark dense encoders
+
+pool: encode a sample of the VBQPPL corpus with the CPU encoder pool for
+several worker counts and report documents/sec, so the worker/thread split can
+be tuned for an ingestion node:
+
+    python benchmark_encoders.py --sample 2000 pool --workers 1 2 4 8
+
+onnx: compare the ONNX Runtime backends with PyTorch. Reports cosine agreement
+with the PyTorch vectors (parity check, non-zero exit code below --min-cosine)
+and single-query latency / batch throughput of every backend:
+
+    python benchmark_encoders.py --sample 200 onnx --queries 100
+"""
+import os
+import sys
+import time
+import argparse
+from itertools import islice
+from dotenv import load_dotenv
+import numpy as np
+
+from encoders import CPUEncoderPool, ENCODER_BACKENDS, create_dense_encoder
+from ingest_qdrant import iter_vbqppl_records
+
+load_dotenv()
+
+
+def load_sample(path: str, n: int):
+    return [text for _, text, _ in islice(iter_vbqppl_records(path), n)]
+
+
+def bench_cpu_pool(texts, workers_list, threads_per_worker, token_budget, batch_size):
+    model_name = os.getenv("EMBEDDING_MODEL")
+    max_seq_length = int(os.getenv("MAX_SEQ_LENGTH"))
+    vector_size = int(os.getenv("VECTOR_SIZE"))
+
+    print(f"{'workers':>8} {'threads':>8} {'docs/s':>10} {'seconds':>9}")
+    for workers in workers_list:
+        pool = CPUEncoderPool(
+            model_name, max_seq_length, vector_size, workers,
+            threads_per_worker=threads_per_worker, token_budget=token_budget
+        )
+        # Warm-up: spawn the workers and load the model outside the timed region
+        pool.embed_documents(texts[:workers * 4])
+
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            pool.embed_documents(texts[i:i + batch_size])
+        seconds = time.perf_counter() - start
+        print(f"{workers:>8} {pool.threads_per_worker:>8} {len(texts) / seconds:>10.1f} {seconds:>9.1f}")
+        pool.close()
+
+
+def bench_onnx(texts, n_queries, min_cosine):
+    model_name = os.getenv("EMBEDDING_MODEL")
+    max_seq_length = int(os.getenv("MAX_SEQ_LENGTH"))
+    # Query-sized inputs: the first line of a section is usually its title/heading
+    queries = [t.split("\n", 1)[0][:200] for t in texts[:n_queries]]
+
+    reference = None
+    ok = True
+    print(f"{'backend':>10} {'p50 ms':>8} {'p95 ms':>8} {'docs/s':>9} {'cos mean':>9} {'cos min':>9}")
+    for backend in ENCODER_BACKENDS:
+        encoder = create_dense_encoder(model_name, max_seq_length, device="cpu", backend=backend, token_budget=32768)
+        encoder.embed_query(queries[0])  # warm-up
+
+        latencies = []
+        for q in queries:
+            start = time.perf_counter()
+            encoder.embed_query(q)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        vectors = np.asarray(encoder.embed_documents(texts), dtype=np.float32)
+        docs_per_second = len(texts) / (time.perf_counter() - start)
+
+        if reference is None:
+            reference = vectors
+            cos_mean = cos_min = 1.0
+        else:
+            # All backends return L2-normalized vectors
+            cosines = (vectors * reference).sum(axis=1)
+            cos_mean, cos_min = float(cosines.mean()), float(cosines.min())
+            ok = ok and cos_min >= min_cosine
+
+        p50, p95 = np.percentile(latencies, [50, 95])
+        print(f"{backend:>10} {p50:>8.1f} {p95:>8.1f} {docs_per_second:>9.1f} {cos_mean:>9.4f} {cos_min:>9.4f}")
+
+    print("Parity check", "PASSED" if ok else f"FAILED (min cosine < {min_cosine})")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dense encoders")
+    parser.add_argument("--input", default=os.getenv("VBQPPL"), help="Corpus to sample texts from")
+    parser.add_argument("--sample", type=int, default=2000, help="Number of sections to encode")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pool_parser = subparsers.add_parser("pool", help="CPU encoder pool docs/sec vs worker count")
+    pool_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to try")
+    pool_parser.add_argument("--threads-per-worker", type=int, default=None,
+                             help="torch threads per worker (default: cpu_count / workers)")
+    pool_parser.add_argument("--token-budget", type=int, default=32768)
+    pool_parser.add_argument("--batch-size", type=int, default=1024, help="Texts per embed_documents call")
+
+    onnx_parser = subparsers.add_parser("onnx", help="ONNX Runtime parity check and latency vs PyTorch")
+    onnx_parser.add_argument("--queries", type=int, default=100, help="Single-query latency samples")
+    onnx_parser.add_argument("--min-cosine", type=float, default=0.99,
+                             help="Minimum per-text cosine similarity with the PyTorch vectors")
+    args = parser.parse_args()
+
+    texts = load_sample(args.input, args.sample)
+    print(f"Loaded {len(texts)} sections from {args.input} ({os.cpu_count()} CPUs)")
+    if args.command == "pool":
+        bench_cpu_pool(texts, args.workers, args.threads_per_worker, args.token_budget, args.batch_size)
+    elif not bench_onnx(texts, args.queries, args.min_cosine):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Recall vs latency of Qdrant collection profiles on the ALQAC-2025 ground truth
+
+Build the same corpus with different profiles, e.g.
+
+    python ingest_alqac25.py --collection alqac25_int8 --profile int8
+    python ingest_alqac25.py --collection alqac25_binary --profile binary
+
+then compare them across query-time settings:
+
+    python benchmark_retrieval.py --collections alqac25_collection alqac25_int8 alqac25_binary \
+        --oversampling 1 2 4 --rescore both --top-k 10
+
+Queries are embedded once up front, so the reported latency is the Qdrant
+query time only. Recall@k counts ground-truth (law_id, article_id) pairs found
+in the top k results.
+"""
+import os
+import ast
+import csv
+import json
+import time
+import argparse
+from itertools import product
+from dotenv import load_dotenv
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import Prefetch, SparseVector, Fusion, FusionQuery
+from fastembed import SparseTextEmbedding
+
+from encoders import create_dense_encoder
+from collection_profiles import make_search_params
+
+load_dotenv()
+
+
+def load_alqac_questions(path: str):
+    """Return [(question, {(law_id, article_id)})] for questions with relevant_articles"""
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            dataset = json.load(f)
+    else:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            dataset = list(csv.DictReader(f))
+
+    questions = []
+    for item in dataset:
+        articles = item.get("relevant_articles")
+        if isinstance(articles, str):
+            try:
+                articles = ast.literal_eval(articles)
+            except (ValueError, SyntaxError):
+                articles = json.loads(articles)
+        if not articles:
+            continue
+        text = item.get("text") or item.get("question_content") or item.get("question")
+        gt = {(a["law_id"], str(a["article_id"])) for a in articles}
+        questions.append((text, gt))
+    return questions
+
+
+def run_queries(client, collection, dense_vecs, sparse_vecs, top_k, search_params, mode):
+    latencies, results = [], []
+    for dense_vec, sparse_vec in zip(dense_vecs, sparse_vecs):
+        start = time.perf_counter()
+        if mode == "dense":
+            points = client.query_points(
+                collection_name=collection, query=dense_vec, using="dense",
+                limit=top_k, search_params=search_params, with_payload=["doc_id", "article_id"]
+            ).points
+        else:
+            points = client.query_points(
+                collection_name=collection,
+                prefetch=[
+                    Prefetch(query=dense_vec, using="dense", limit=top_k * 5, params=search_params),
+                    Prefetch(query=sparse_vec, using="sparse", limit=top_k * 5)
+                ],
+                query=FusionQuery(fusion=Fusion.RRF),
+                limit=top_k,
+                with_payload=["doc_id", "article_id"]
+            ).points
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({(p.payload.get("doc_id"), str(p.payload.get("article_id"))) for p in points})
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency of Qdrant collection profiles (ALQAC-2025)")
+    parser.add_argument("--input", default="../ALQAC-2025/ALQAC_2025_QA.csv",
+                        help="ALQAC QA dataset with relevant_articles (CSV or JSON)")
+    parser.add_argument("--collections", nargs="+", default=["alqac25_collection"])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[None],
+                        help="Quantization oversampling factors to try")
+    parser.add_argument("--rescore", choices=["on", "off", "both", "default"], default="default",
+                        help="Rescore quantized candidates with the original vectors")
+    parser.add_argument("--hnsw-ef", type=int, nargs="+", default=[None], help="hnsw_ef values to try")
+    parser.add_argument("--mode", choices=["hybrid", "dense"], default="hybrid",
+                        help="hybrid mirrors RAG._query_collection; dense isolates the quantized search")
+    parser.add_argument("--limit", type=int, default=None, help="Max number of questions")
+    args = parser.parse_args()
+
+    questions = load_alqac_questions(args.input)[:args.limit]
+    print(f"Loaded {len(questions)} questions with ground truth from {args.input}")
+
+    encoder = create_dense_encoder(os.getenv("EMBEDDING_MODEL"), int(os.getenv("MAX_SEQ_LENGTH", 512)))
+    sparse_model = SparseTextEmbedding(model_name="Qdrant/bm25")
+    texts = [q for q, _ in questions]
+    dense_vecs = [encoder.embed_query(t) for t in texts]
+    sparse_vecs = [
+        SparseVector(indices=e.indices.tolist(), values=e.values.tolist())
+        for e in sparse_model.embed(texts)
+    ]
+
+    rescore_options = {"on": [True], "off": [False], "both": [True, False], "default": [None]}[args.rescore]
+    client = QdrantClient(host=os.getenv("QDRANT_HOST"), port=int(os.getenv("QDRANT_PORT")))
+
+    print(f"{'collection':<28} {'rescore':>7} {'oversmp':>7} {'hnsw_ef':>7} "
+          f"{'recall@' + str(args.top_k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for collection in args.collections:
+        for rescore, oversampling, hnsw_ef in product(rescore_options, args.oversampling, args.hnsw_ef):
+            search_params = make_search_params(hnsw_ef=hnsw_ef, rescore=rescore, oversampling=oversampling)
+            # Warm-up so the first query does not pay for loading segments from disk
+            run_queries(client, collection, dense_vecs[:5], sparse_vecs[:5], args.top_k, search_params, args.mode)
+            latencies, results = run_queries(
+                client, collection, dense_vecs, sparse_vecs, args.top_k, search_params, args.mode
+            )
+            recall = np.mean([len(found & gt) / len(gt) for found, (_, gt) in zip(results, questions)])
+            p50, p95 = np.percentile(latencies, [50, 95])
+            print(f"{collection:<28} {str(rescore):>7} {str(oversampling):>7} {str(hnsw_ef):>7} "
+                  f"{recall:>10.4f} {p50:>8.1f} {p95:>8.1f}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -416,9 +416,16 @@ class LegalRAGChain:
          # --- BƯỚC 1: PARALLEL SEARCH (CHỈ SEARCH THÔ) ---
         logging.info(f"Searching Qdrant for {len(queries)} queries parallelly...")
         
+        # MMR dùng vector của rerank_query: encode một lần và dùng lại khi search query đó
+        query_vec = None
+        if rag_engine.mmr_enabled:
+            query_vec = await asyncio.to_thread(rag_engine.embedding.embed_query, rerank_query)
+
         # Mỗi query lấy top 20 thô (chưa rerank)
         tasks = [
-            asyncio.to_thread(rag_engine.retrieve, q, top_k=20, collection_names=collection_names) 
+            asyncio.to_thread(rag_engine.retrieve, q, top_k=20, collection_names=collection_names,
+                              with_vectors=rag_engine.mmr_enabled,
+                              query_vec=query_vec if q == rerank_query else None)
             for q in queries
         ]
         
@@ -445,6 +452,10 @@ class LegalRAGChain:
              yield json.dumps({"type": "error", "content": "Không tìm thấy văn bản liên quan."}, ensure_ascii=False) + "\n"
              return
 
+        # --- BƯỚC 2b: MMR - BỎ CÁC BẢN GẦN TRÙNG LẶP (Pháp Điển/VBQPPL, văn bản sửa đổi) ---
+        merged_candidates = await asyncio.to_thread(rag_engine.diversify, query_vec, merged_candidates)
+        logging.info(f"Candidates after MMR: {len(merged_candidates)}")
+
         # --- BƯỚC 3: SINGLE RERANK (Rerank 1 lần duy nhất) ---
         # QUAN TRỌNG: Rerank dựa trên câu hỏi gốc (message)
         
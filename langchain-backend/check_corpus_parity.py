@@ -0,0 +1,89 @@
+"""
+Check: the backend's corpus reader matches law-crawler/corpus.py
+
+langchain-backend/corpus.py keeps its own copy of the streaming reader so the
+API server and ingestion scripts do not need the crawler checkout. This check
+compares the source of every reader function and constant in both copies and
+reads the same sample files with each. Exits with status 1 if they differ.
+
+    python check_corpus_parity.py
+    python check_corpus_parity.py --crawler ../law-crawler/corpus.py
+"""
+import os
+import sys
+import json
+import inspect
+import argparse
+import tempfile
+import importlib.util
+
+import corpus
+
+READER_FUNCTIONS = ['_is_truncated', '_iter_json_array', 'iter_corpus']
+READER_CONSTANTS = ['READ_CHUNK_SIZE', '_SEPARATORS', '_MAX_PARTIAL_TOKEN']
+DEFAULT_CRAWLER_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'law-crawler', 'corpus.py')
+
+
+def load_crawler_corpus(path: str):
+    # Loaded by path: `import corpus` here is the backend copy
+    spec = importlib.util.spec_from_file_location('crawler_corpus', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def read_all(module, path: str):
+    try:
+        return list(module.iter_corpus(path))
+    except ValueError as e:
+        return f"ValueError: {e}"
+
+
+def sample_files(root: str):
+    records = [{'id': str(i), 'content': 'Điều 1. \\u0110 "x" ' * i, 'n': -1.5e-7 * i, 'ok': None} for i in range(50)]
+    samples = {
+        'array.json': json.dumps(records, ensure_ascii=False, indent=2),
+        'ascii.json': json.dumps(records),
+        'lines.jsonl': ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records),
+        'empty.json': '[]',
+        'malformed.json': json.dumps(records, indent=2).replace('"id": "7"', '"id": 7 7', 1),
+        'truncated.json': json.dumps(records)[:-40],
+    }
+    for name, text in samples.items():
+        path = os.path.join(root, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        yield name, path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the backend corpus reader with the crawler's")
+    parser.add_argument('--crawler', default=DEFAULT_CRAWLER_CORPUS, help="Path to law-crawler/corpus.py")
+    args = parser.parse_args()
+
+    crawler = load_crawler_corpus(args.crawler)
+    differences = []
+    for name in READER_FUNCTIONS:
+        if inspect.getsource(getattr(corpus, name)) != inspect.getsource(getattr(crawler, name)):
+            differences.append(f"source of {name}")
+    for name in READER_CONSTANTS:
+        if getattr(corpus, name) != getattr(crawler, name):
+            differences.append(f"value of {name}")
+
+    root = tempfile.mkdtemp(prefix='check_corpus_')
+    for name, path in sample_files(root):
+        # Small chunks so records are split across reads
+        for chunk_size in (7, 1 << 20):
+            corpus.READ_CHUNK_SIZE = crawler.READ_CHUNK_SIZE = chunk_size
+            if read_all(corpus, path) != read_all(crawler, path):
+                differences.append(f"records read from {name} (chunk size {chunk_size})")
+
+    for difference in differences:
+        print(f"DIFFERENT {difference}")
+    print(f"{len(READER_FUNCTIONS)} functions, {len(READER_CONSTANTS)} constants compared: "
+          f"{'identical' if not differences else f'{len(differences)} differences'}")
+    sys.exit(1 if differences else 0)
+
+
+if __name__ == "__main__":
+    main()
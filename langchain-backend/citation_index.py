@@ -0,0 +1,201 @@
+"""
+Exact-citation index: (document, Điều number) -> section IDs
+
+Questions such as "Điều 36 Bộ luật Lao động 2019" name the answer directly, so
+instead of relying on dense/BM25 search and reranking, the cited article is
+looked up in a dictionary built at ingest time:
+
+- VBQPPL sections are keyed by the document number (`doc_id`), the normalized
+  document title and the law name the title starts with ("bộ luật lao động"
+  for "Bộ luật Lao động 2019"), combined with the "Điều N" of their hierarchy
+  path.
+- Pháp Điển điều are keyed by their own code ("Điều 36.3.LQ.1") and by the
+  source articles listed in their VBQPPL notes ("Điều 1 Luật Thanh niên số
+  57/2020/QH14 ...").
+
+The index is a JSON file (CITATION_INDEX, default ./citation_index.json) that
+RAG loads into memory at startup; lookups are plain dict accesses.
+
+    python citation_index.py build      # also run at the end of ingest_qdrant.py
+"""
+import os
+import re
+import json
+import argparse
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from corpus import iter_corpus
+from utils import get_section_point_ids
+from query_filters import extract_doc_numbers, extract_law_names
+
+load_dotenv()
+
+DEFAULT_INDEX_PATH = "./citation_index.json"
+
+_ARTICLE_RE = re.compile(r'\bĐiều\s+(\d+[a-zđ]?)\b', re.IGNORECASE)
+# Pháp Điển article codes, e.g. "Điều 36.3.LQ.1."
+_PD_CODE_RE = re.compile(r'\bĐiều\s+(\d+\.\d+\.[A-ZĐ]+\.\d+)', re.IGNORECASE)
+_YEAR_RE = re.compile(r'(?<![/\d])((?:19|20)\d{2})(?![/\d])')
+# Words that may sit between "Điều N" and the document name ("Điều 36 của Bộ luật ...")
+_LINK_WORDS = {"của", "trong", "tại", "theo", "thuộc"}
+_MAX_NAME_WORDS = 12
+
+# (payload id, doc_id), stored as a JSON list
+Entry = Tuple[str, str]
+
+
+def normalize_name(name: str) -> str:
+    """Case/whitespace-insensitive key for a document title or law name"""
+    name = unicodedata.normalize("NFC", name).lower()
+    name = re.sub(r'[^\w\s]', ' ', name)
+    return " ".join(name.split())
+
+
+def _key(doc_ref: str, article: str) -> str:
+    return f"{doc_ref}|{article.lower()}"
+
+
+class CitationIndex:
+    """In-memory map from citation keys to the sections they point at"""
+
+    def __init__(self, entries: Optional[Dict[str, List[Entry]]] = None):
+        self.entries: Dict[str, List[Entry]] = entries or {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    # ---- build ----
+
+    def add(self, doc_ref: str, article: str, payload_id: str, doc_id: str):
+        bucket = self.entries.setdefault(_key(doc_ref, article), [])
+        if [payload_id, doc_id] not in bucket:
+            bucket.append([payload_id, doc_id])
+
+    def add_vbqppl(self, items: Iterable[dict]):
+        for item in items:
+            doc_id = item.get("id")
+            if not doc_id:
+                continue
+            title = item.get("title")
+            names = []
+            if title and title != "Unknown Title":
+                names.append(normalize_name(title))
+                # The same name extract_law_names finds in a query ("Bộ luật Lao động"),
+                # unless the title only mentions it ("Nghị định ... Luật Đất đai")
+                for law_name in extract_law_names(title)[:1]:
+                    law_name = normalize_name(law_name)
+                    if names[0].startswith(law_name) and law_name not in names:
+                        names.append(law_name)
+            sections = item.get("sections") or []
+            for section, payload_id in zip(sections, get_section_point_ids(doc_id, sections)[0]):
+                hierarchy_path = section.get("hierarchy_path", "")
+                label = section.get("label") or hierarchy_path.split(" > ")[-1]
+                match = _ARTICLE_RE.match(label.strip())
+                if not match:
+                    continue
+                article = match.group(1)
+                self.add(doc_id.upper(), article, payload_id, doc_id)
+                for name in names:
+                    self.add(name, article, payload_id, doc_id)
+
+    def add_phapdien(self, items: Iterable[dict]):
+        for item in items:
+            payload_id = item.get("ID")
+            if not payload_id:
+                continue
+            code = _PD_CODE_RE.match(item.get("TEN", ""))
+            if code:
+                self.add("phapdien", code.group(1), payload_id, "")
+            # Notes cite the source article, e.g. "(Điều 1 Luật Thanh niên số 57/2020/QH14 ...)"
+            for ref in item.get("VBQPPL") or []:
+                text = ref.get("name") or ""
+                article = _ARTICLE_RE.search(text)
+                if not article:
+                    continue
+                numbers = extract_doc_numbers(text)
+                for number in numbers:
+                    self.add(number, article.group(1), payload_id, number)
+                for name in extract_law_names(text[article.end():]):
+                    self.add(normalize_name(name), article.group(1), payload_id, numbers[0] if numbers else "")
+
+    # ---- query ----
+
+    def lookup(self, query: str, limit: int = 10) -> List[str]:
+        """Payload IDs of the articles cited in query (empty if it cites none)"""
+        articles = [m.group(1) for m in _ARTICLE_RE.finditer(query)]
+        pd_codes = [m.group(1) for m in _PD_CODE_RE.finditer(query)]
+        if not articles and not pd_codes:
+            return []
+
+        refs = extract_doc_numbers(query)
+        refs += [normalize_name(name) for name in extract_law_names(query)]
+
+        found: List[Entry] = []
+        for code in pd_codes:
+            found += self.entries.get(_key("phapdien", code), [])
+        for ref in refs:
+            for article in articles:
+                found += self.entries.get(_key(ref, article), [])
+        # Case-insensitive: known names right after "Điều N" ("điều 36 bộ luật lao động 2019" is
+        # both the 2019 title and "bộ luật lao động"); the year below picks the version
+        for m in _ARTICLE_RE.finditer(query):
+            words = normalize_name(query[m.end():]).split()
+            while words and words[0] in _LINK_WORDS:
+                words = words[1:]
+            for n in range(min(len(words), _MAX_NAME_WORDS), 0, -1):
+                key = _key(" ".join(words[:n]), m.group(1))
+                found += self.entries.get(key, [])
+
+        # "Bộ luật Lao động 2019": prefer the version whose number carries the year
+        years = _YEAR_RE.findall(query)
+        if years:
+            dated = [e for e in found if any(f"/{y}/" in e[1] for y in years)]
+            found = dated or found
+
+        ids = []
+        for payload_id, _ in found:
+            if payload_id not in ids:
+                ids.append(payload_id)
+        return ids[:limit]
+
+    # ---- persistence ----
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CitationIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+
+def build_citation_index(phapdien_path: Optional[str], vbqppl_path: Optional[str], output_path: str) -> CitationIndex:
+    """Build the index from the corpus files used for ingestion and save it"""
+    index = CitationIndex()
+    if phapdien_path and os.path.exists(phapdien_path):
+        index.add_phapdien(iter_corpus(phapdien_path))
+    if vbqppl_path and os.path.exists(vbqppl_path):
+        index.add_vbqppl(iter_corpus(vbqppl_path))
+    index.save(output_path)
+    print(f"Saved citation index with {len(index)} keys to {output_path}")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the exact-citation index")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--phapdien", default=os.path.join(os.getenv("PHAPDIEN_DIR", ""), "Dieu.json"))
+    parser.add_argument("--vbqppl", default=os.getenv("VBQPPL"))
+    parser.add_argument("--output", default=os.getenv("CITATION_INDEX", DEFAULT_INDEX_PATH))
+    args = parser.parse_args()
+    build_citation_index(args.phapdien, args.vbqppl, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Clause-level (Khoản / Điểm) sub-chunks of VBQPPL sections
+
+Điều-level sections can be thousands of tokens long: the dense vector only sees
+the first MAX_SEQ_LENGTH tokens and the whole article ends up in the prompt.
+Sections are therefore also split into clauses and indexed in a secondary
+collection (ingest_qdrant.py --clauses):
+
+    Điều intro ("Người lao động có các quyền sau đây:")   -> clause_index 0
+    "1. ..." without điểm                                 -> Khoản 1
+    "2. ... sau đây:" + "a) ..." + "b) ..."               -> Khoản 2 Điểm a, Khoản 2 Điểm b
+
+Each sub-chunk carries the parent section's payload ID (`parent_id`, indexed)
+and content hash (`parent_hash`). RAG searches the sub-chunks with
+query_points_groups grouped by parent, and pack_clause_group rebuilds one
+source per section containing only the clauses that matched.
+"""
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils import get_content_hash, get_point_uuid
+
+# "1. Nội dung", "1.Nội dung" at the start of a line (not "1.2" numbering)
+_KHOAN_RE = re.compile(r'^\s*(\d+)\.(?!\d)\s*')
+# "a) Nội dung", "đ) Nội dung"
+_DIEM_RE = re.compile(r'^\s*([a-zđ])\)\s*')
+
+# (point_id, embed_content, payload), same as ingest_qdrant.PointRecord
+PointRecord = Tuple[str, str, dict]
+
+
+def split_clauses(content: str) -> List[Dict[str, Any]]:
+    """
+    Split an article's content into clauses. Returns dicts with `label`
+    ("" for the intro, "Khoản 2", "Khoản 2 Điểm a"), `lead` (the khoản text
+    introducing its điểm, empty otherwise) and `text`.
+    """
+    intro: List[str] = []
+    khoans: List[Tuple[str, List[str], List[Tuple[str, List[str]]]]] = []
+
+    for line in content.split("\n"):
+        if not line.strip():
+            continue
+        khoan = _KHOAN_RE.match(line)
+        diem = _DIEM_RE.match(line)
+        if khoan:
+            khoans.append((khoan.group(1), [line.strip()], []))
+        elif diem:
+            if not khoans:
+                # Điểm listed directly under the Điều intro
+                khoans.append(("", [], []))
+            khoans[-1][2].append((diem.group(1), [line.strip()]))
+        elif khoans and khoans[-1][2]:
+            khoans[-1][2][-1][1].append(line.strip())
+        elif khoans:
+            khoans[-1][1].append(line.strip())
+        else:
+            intro.append(line.strip())
+
+    clauses = []
+    if intro:
+        clauses.append({"label": "", "lead": "", "text": "\n".join(intro)})
+    for number, lead_lines, diems in khoans:
+        lead = "\n".join(lead_lines)
+        if not diems:
+            clauses.append({"label": f"Khoản {number}", "lead": "", "text": lead})
+            continue
+        for letter, diem_lines in diems:
+            label = f"Khoản {number} Điểm {letter}" if number else f"Điểm {letter}"
+            clauses.append({"label": label, "lead": lead, "text": "\n".join(diem_lines)})
+    return clauses
+
+
+def iter_clause_records(section_records: Iterator[PointRecord]) -> Iterator[PointRecord]:
+    """Turn VBQPPL section records (ingest_qdrant.iter_vbqppl_records) into clause records"""
+    for _, _, parent in section_records:
+        clauses = split_clauses(parent["content"]) or [{"label": "", "lead": "", "text": parent["content"]}]
+        for index, clause in enumerate(clauses):
+            label = clause["label"]
+            body = f"{clause['lead']}\n{clause['text']}" if clause["lead"] else clause["text"]
+            embed_content = f"{parent['title']}\n{parent['hierarchy_path']}\n{label}\n{body}"
+            point_key = f"{parent['id']}#{index}"
+            yield get_point_uuid(point_key), embed_content, {
+                "id": point_key,
+                "parent_id": parent["id"],
+                "parent_hash": parent["content_hash"],
+                "doc_id": parent["doc_id"],
+                "url": parent["url"],
+                "source": parent["source"],
+                "title": parent["title"],
+                "hierarchy_path": parent["hierarchy_path"],
+                "clause": label,
+                "clause_index": index,
+                "lead": clause["lead"],
+                "content": clause["text"],
+                "embed_content": embed_content,
+                "content_hash": get_content_hash(embed_content)
+            }
+
+
+def pack_clause_group(group, with_vectors: bool = False) -> Optional[dict]:
+    """
+    One source per parent section from a query_points_groups group: the
+    matched clauses in document order, each khoản lead-in written once.
+    The source keeps the parent's ID so citations resolve to the section.
+    """
+    hits = [hit for hit in group.hits if hit.payload]
+    if not hits:
+        return None
+    top = hits[0]
+    payload = top.payload
+
+    lines = []
+    written_leads = set()
+    ordered = sorted(hits, key=lambda h: h.payload.get("clause_index", 0))
+    for hit in ordered:
+        lead = hit.payload.get("lead")
+        if lead and lead not in written_leads:
+            written_leads.add(lead)
+            lines.append(lead)
+        lines.append(hit.payload.get("content", ""))
+
+    source = {
+        "id": payload.get("parent_id", group.id),
+        "doc_id": payload.get("doc_id", ""),
+        "article_id": payload.get("article_id", ""),
+        "title": payload.get("title", ""),
+        "hierarchy_path": payload.get("hierarchy_path", ""),
+        "url": payload.get("url", "#"),
+        "content": "\n".join(lines),
+        "score": top.score,
+        "source": payload.get("source", ""),
+        "clauses": [hit.payload.get("clause", "") for hit in ordered]
+    }
+    if with_vectors and top.vector:
+        source["vector"] = top.vector.get("dense") if isinstance(top.vector, dict) else top.vector
+    return source
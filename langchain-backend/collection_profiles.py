@@ -0,0 +1,117 @@
+"""
+Qdrant collection profiles (storage / quantization / HNSW settings)
+
+Memory on the Qdrant node is the scaling limit, so collections can be created
+with a profile that trades RAM for a small amount of recall:
+
+    default   float32 dense vectors and HNSW graph in RAM (previous behaviour)
+    int8      scalar int8 quantized vectors in RAM, float32 originals on disk
+    binary    1-bit binary quantized vectors in RAM, float32 originals on disk
+    on_disk   int8 profile with the HNSW graph and sparse index on disk as well
+
+With quantization, searches run on the in-RAM quantized vectors and the top
+`limit * oversampling` candidates are rescored with the original vectors read
+from disk. The query-side knobs come from the environment, see
+search_params_from_env.
+"""
+import os
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+
+from qdrant_client.models import (
+    BinaryQuantization, BinaryQuantizationConfig, Distance, HnswConfigDiff,
+    OptimizersConfigDiff, QuantizationSearchParams, ScalarQuantization,
+    ScalarQuantizationConfig, ScalarType, SearchParams, SparseIndexParams,
+    SparseVectorParams, VectorParams
+)
+
+DEFAULT_PROFILE = "default"
+
+
+@dataclass
+class CollectionProfile:
+    name: str
+    quantization: Optional[str] = None  # None | "int8" | "binary"
+    vectors_on_disk: bool = False
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    hnsw_on_disk: bool = False
+    sparse_on_disk: bool = False
+    # Segments larger than this (in KB) get an HNSW index; raise it during bulk loads
+    indexing_threshold: Optional[int] = None
+
+    def vectors_config(self, vector_size: int) -> Dict[str, VectorParams]:
+        return {"dense": VectorParams(size=vector_size, distance=Distance.COSINE, on_disk=self.vectors_on_disk)}
+
+    def sparse_vectors_config(self) -> Dict[str, SparseVectorParams]:
+        return {"sparse": SparseVectorParams(index=SparseIndexParams(on_disk=self.sparse_on_disk))}
+
+    def quantization_config(self):
+        if self.quantization == "int8":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=0.99, always_ram=True
+            ))
+        if self.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def hnsw_config(self) -> HnswConfigDiff:
+        return HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct, on_disk=self.hnsw_on_disk)
+
+    def optimizers_config(self) -> Optional[OptimizersConfigDiff]:
+        if self.indexing_threshold is None:
+            return None
+        return OptimizersConfigDiff(indexing_threshold=self.indexing_threshold)
+
+    def describe(self) -> str:
+        return (f"{self.name}: quantization={self.quantization or 'none'}, vectors_on_disk={self.vectors_on_disk}, "
+                f"hnsw(m={self.hnsw_m}, ef_construct={self.hnsw_ef_construct}, on_disk={self.hnsw_on_disk}), "
+                f"sparse_on_disk={self.sparse_on_disk}")
+
+
+PROFILES: Dict[str, CollectionProfile] = {
+    "default": CollectionProfile("default"),
+    "int8": CollectionProfile("int8", quantization="int8", vectors_on_disk=True),
+    "binary": CollectionProfile("binary", quantization="binary", vectors_on_disk=True),
+    "on_disk": CollectionProfile(
+        "on_disk", quantization="int8", vectors_on_disk=True, hnsw_on_disk=True,
+        sparse_on_disk=True
+    ),
+}
+
+
+def get_profile(name: Optional[str] = None, hnsw_m: Optional[int] = None, hnsw_ef_construct: Optional[int] = None,
+                indexing_threshold: Optional[int] = None) -> CollectionProfile:
+    """Look up a profile (COLLECTION_PROFILE by default) and apply HNSW / optimizer overrides"""
+    name = name or os.getenv("COLLECTION_PROFILE", DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise ValueError(f"Unknown collection profile '{name}', expected one of {list(PROFILES)}")
+    overrides = {
+        "hnsw_m": hnsw_m,
+        "hnsw_ef_construct": hnsw_ef_construct,
+        "indexing_threshold": indexing_threshold,
+    }
+    return replace(PROFILES[name], **{k: v for k, v in overrides.items() if v is not None})
+
+
+def make_search_params(hnsw_ef: Optional[int] = None, rescore: Optional[bool] = None,
+                       oversampling: Optional[float] = None) -> Optional[SearchParams]:
+    """Build dense-search params; None if nothing is set (Qdrant defaults apply)"""
+    quantization = None
+    if rescore is not None or oversampling is not None:
+        quantization = QuantizationSearchParams(rescore=rescore, oversampling=oversampling)
+    if hnsw_ef is None and quantization is None:
+        return None
+    return SearchParams(hnsw_ef=hnsw_ef, quantization=quantization)
+
+
+def search_params_from_env() -> Optional[SearchParams]:
+    """Dense-search params from QDRANT_HNSW_EF, QDRANT_RESCORE and QDRANT_OVERSAMPLING"""
+    hnsw_ef = os.getenv("QDRANT_HNSW_EF")
+    rescore = os.getenv("QDRANT_RESCORE")
+    oversampling = os.getenv("QDRANT_OVERSAMPLING")
+    return make_search_params(
+        hnsw_ef=int(hnsw_ef) if hnsw_ef else None,
+        rescore=rescore.lower() in ("1", "true", "yes") if rescore else None,
+        oversampling=float(oversampling) if oversampling else None
+    )
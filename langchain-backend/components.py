@@ -0,0 +1,110 @@
+"""
+Background initialization of the API's heavy components
+
+The embedding model, BM25 model, reranker client and citation index take a
+while to load. Instead of blocking startup on all of them, app.py registers
+each one here and they are loaded on a thread pool while the server already
+answers DB-only endpoints. Request handlers check the components they need
+(`missing`) and /readyz reports per-component state, load time and the
+overall time-to-ready. Components that depend on another service (Qdrant) can
+be retried until it comes up.
+"""
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+@dataclass
+class ComponentState:
+    name: str
+    required: bool = True
+    state: str = PENDING
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {"state": self.state, "required": self.required, "seconds": self.seconds, "error": self.error}
+
+
+class ComponentLoader:
+    """Loads registered components concurrently and tracks their readiness"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self.components: Dict[str, ComponentState] = {}
+        self._loaders: Dict[str, Callable[[], None]] = {}
+        self._retry_intervals: Dict[str, Optional[float]] = {}
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.started_at: Optional[float] = None
+        self.time_to_ready: Optional[float] = None
+
+    def register(self, name: str, loader: Callable[[], None], required: bool = True,
+                 retry_interval: Optional[float] = None):
+        """
+        Optional components (required=False) do not hold back readiness if they
+        fail. With retry_interval, a failed load is retried every that many seconds.
+        """
+        self.components[name] = ComponentState(name, required=required)
+        self._loaders[name] = loader
+        self._retry_intervals[name] = retry_interval
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers or len(self.components) or 1, thread_name_prefix="component-loader")
+        for name in self.components:
+            self._executor.submit(self._load, name)
+
+    def _load(self, name: str):
+        component = self.components[name]
+        component.state = LOADING
+        start = time.perf_counter()
+        while True:
+            try:
+                self._loaders[name]()
+                component.state = READY
+                component.error = None
+                logging.info(f"Component '{name}' ready in {time.perf_counter() - start:.1f}s")
+                break
+            except Exception as e:
+                component.state = FAILED
+                component.error = str(e)
+                logging.error(f"Component '{name}' failed to load: {e}")
+                retry_interval = self._retry_intervals[name]
+                if retry_interval is None or self._stopped.wait(retry_interval):
+                    break
+        component.seconds = round(time.perf_counter() - start, 3)
+
+        with self._lock:
+            if self.time_to_ready is None and self.ready():
+                self.time_to_ready = round(time.perf_counter() - self.started_at, 3)
+                logging.info(f"All required components ready in {self.time_to_ready:.1f}s")
+
+    def missing(self, names: Iterable[str]) -> List[str]:
+        """Names of the given components that are not loaded (yet)"""
+        return [name for name in names if self.components[name].state != READY]
+
+    def ready(self) -> bool:
+        return all(c.state == READY for c in self.components.values() if c.required)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready(),
+            "time_to_ready": self.time_to_ready,
+            "uptime": round(time.perf_counter() - self.started_at, 3) if self.started_at else None,
+            "components": {name: c.to_dict() for name, c in self.components.items()},
+        }
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,98 @@
+"""
+Streaming corpus reader
+
+Corpus files (vbqppl_content.json, Pháp Điển Dieu.json, ALQAC law files) can be
+several GB once full texts and sections are included. `iter_corpus` decodes one
+record at a time so ingestion memory stays bounded by the largest document.
+
+Both formats produced by the crawlers are supported:
+- JSON: a top-level array of records
+- JSONL: one record per line (`.jsonl` / `.ndjson`)
+
+The reader is the same code as in law-crawler/corpus.py (which also has the
+writers); the backend keeps its own copy so it runs without the crawler
+checkout. check_corpus_parity.py fails when the two copies drift apart.
+"""
+
+import json
+from typing import Any, Dict, Iterator
+
+READ_CHUNK_SIZE = 1 << 20  # 1 MiB
+_SEPARATORS = ' \t\r\n,'
+# Longest token prefix that cannot be decoded yet (a split \uXXXX pair, '-1.5e+')
+_MAX_PARTIAL_TOKEN = 16
+
+
+def _is_truncated(error: json.JSONDecodeError, buf_len: int) -> bool:
+    """
+    Whether a decode error can be fixed by reading more of the file: the
+    decoder stopped at (or a partial literal/escape before) the end of the
+    buffer, or a string is still open. Anything else is a malformed record.
+    """
+    return error.msg.startswith('Unterminated string') or error.pos >= buf_len - _MAX_PARTIAL_TOKEN
+
+
+def _iter_json_array(f, buf: str) -> Iterator[Dict[str, Any]]:
+    """Incrementally decode records from a top-level JSON array"""
+    decoder = json.JSONDecoder()
+    pos = buf.index('[') + 1
+    read_size = READ_CHUNK_SIZE
+
+    while True:
+        while pos < len(buf) and buf[pos] in _SEPARATORS:
+            pos += 1
+
+        if pos < len(buf) and buf[pos] == ']':
+            return
+
+        if pos < len(buf):
+            try:
+                record, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if not _is_truncated(e, len(buf)):
+                    raise ValueError(f"Malformed record in JSON array: {e.msg}") from e
+                # Record is split across chunks; read more below
+            else:
+                read_size = READ_CHUNK_SIZE
+                yield record
+                continue
+
+        chunk = f.read(read_size)
+        if not chunk:
+            raise ValueError("Unexpected end of file while reading JSON array")
+        buf = buf[pos:] + chunk
+        pos = 0
+        # Grow reads geometrically so very large records are not re-scanned too often
+        read_size = max(read_size, len(buf))
+
+
+def iter_corpus(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield corpus records one at a time from a JSON array or JSONL file.
+
+    The format is detected from the first non-whitespace character, so a
+    `.json` file that actually holds JSON Lines is also accepted.
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buf = ''
+        while not buf.strip():
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                return
+            buf += chunk
+
+        if buf.lstrip()[0] == '[':
+            yield from _iter_json_array(f, buf)
+            return
+
+        # JSON Lines: finish the partially read line, then go line by line
+        lines = buf.split('\n')
+        lines[-1] += f.readline()
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
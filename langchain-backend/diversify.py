@@ -0,0 +1,94 @@
+"""
+Maximal-marginal-relevance selection and near-duplicate collapse
+
+Multi-query search returns many near-identical candidates (amended versions of
+the same article, the Pháp Điển copy and the VBQPPL copy, ...). Before they are
+sent to the reranker, candidates are re-selected with MMR over their dense
+vectors:
+
+    score(d) = λ * sim(q, d) - (1 - λ) * max_{s in selected} sim(d, s)
+
+and any candidate whose similarity to an already selected one reaches the
+duplicate cutoff is dropped. All similarities come from one matrix product;
+the greedy loop only updates a running max per candidate.
+"""
+import os
+import logging
+from typing import Any, List, Optional
+
+import numpy as np
+
+DEFAULT_MMR_LAMBDA = 0.7
+DEFAULT_DUP_THRESHOLD = 0.95
+DEFAULT_MMR_TOP_N = 30
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def mmr_select(query_vec, doc_vecs, top_n: int, lambda_mult: float = DEFAULT_MMR_LAMBDA,
+               dup_threshold: Optional[float] = DEFAULT_DUP_THRESHOLD) -> List[int]:
+    """Indices of up to top_n documents in MMR order, skipping near-duplicates"""
+    doc_vecs = _normalize(np.asarray(doc_vecs, dtype=np.float32))
+    query_vec = _normalize(np.asarray(query_vec, dtype=np.float32))
+    n = len(doc_vecs)
+    if n == 0 or top_n <= 0:
+        return []
+
+    relevance = doc_vecs @ query_vec
+    pairwise = doc_vecs @ doc_vecs.T
+    max_sim = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+
+    selected = []
+    while len(selected) < top_n and available.any():
+        redundancy = np.where(np.isfinite(max_sim), max_sim, 0.0)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_sim = np.maximum(max_sim, pairwise[best])
+        if dup_threshold is not None:
+            available &= max_sim < dup_threshold
+    return selected
+
+
+def diversify_sources(query_vec, sources: List[dict[str, Any]], top_n: int = DEFAULT_MMR_TOP_N,
+                      lambda_mult: float = DEFAULT_MMR_LAMBDA,
+                      dup_threshold: Optional[float] = DEFAULT_DUP_THRESHOLD) -> List[dict[str, Any]]:
+    """
+    MMR over sources carrying a "vector" (see RAG.retrieve(with_vectors=True)).
+    Sources without a vector (exact citation matches) are kept in front.
+    Vectors are removed from the returned sources.
+    """
+    pinned = [s for s in sources if s.get("vector") is None]
+    candidates = [s for s in sources if s.get("vector") is not None]
+
+    kept = candidates
+    if candidates:
+        order = mmr_select(
+            query_vec, [s["vector"] for s in candidates], max(top_n - len(pinned), 0),
+            lambda_mult=lambda_mult, dup_threshold=dup_threshold
+        )
+        kept = [candidates[i] for i in order]
+    logging.info(f"MMR kept {len(kept)}/{len(candidates)} candidates "
+                 f"(lambda={lambda_mult}, dup_threshold={dup_threshold}, pinned={len(pinned)})")
+    return [strip_vector(s) for s in pinned + kept]
+
+
+def strip_vector(source: dict[str, Any]) -> dict[str, Any]:
+    return {k: v for k, v in source.items() if k != "vector"}
+
+
+def mmr_settings_from_env():
+    """(enabled, lambda, dup_threshold, top_n) from MMR_ENABLED, MMR_LAMBDA, MMR_DUP_THRESHOLD, MMR_TOP_N"""
+    dup_threshold = os.getenv("MMR_DUP_THRESHOLD")
+    return (
+        os.getenv("MMR_ENABLED", "true").lower() in ("1", "true", "yes"),
+        float(os.getenv("MMR_LAMBDA", DEFAULT_MMR_LAMBDA)),
+        float(dup_threshold) if dup_threshold else DEFAULT_DUP_THRESHOLD,
+        int(os.getenv("MMR_TOP_N", DEFAULT_MMR_TOP_N)),
+    )
@@ -0,0 +1,246 @@
+"""
+Persistent on-disk embedding cache for ingestion
+
+Dense and BM25 vectors are cached by sha256(embed_content) under a directory
+namespaced by (embedding model, max_seq_length), so re-ingesting unchanged text
+(new crawl data, ALQAC, re-creating collections) skips the encoders entirely.
+
+Layout of a store directory:
+    meta.json             model name, max_seq_length, dim, dtype
+    dense.bin             (rows, dim) float16/float32, row-major, append-only
+    sparse_indices.bin    uint32, append-only
+    sparse_values.bin     float32, append-only
+    index.tsv             content_hash \\t row \\t sparse_offset \\t sparse_len
+
+Vector files are read through np.memmap, so cached vectors are loaded without
+any parsing/deserialization. Data is appended before its index line, but the
+three vector files are flushed separately, so a crash can leave a half-written
+index line, a torn dense row or sparse files of different lengths. Opening the
+store repairs that (see _recover): the index is cut back to its complete
+entries whose vectors are all on disk, and every file to what they reference.
+"""
+import os
+import json
+import threading
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils import slugify_model_name, get_content_hash
+
+
+class SparseVec(NamedTuple):
+    """BM25 vector with the same attributes as fastembed's SparseEmbedding"""
+    indices: np.ndarray
+    values: np.ndarray
+
+
+class EmbeddingStore:
+    """Append-only, memory-mapped store of dense + sparse vectors keyed by content hash"""
+
+    def __init__(self, root: str, model_name: str, max_seq_length: int, dim: int, dtype: str = "float16"):
+        self.model_name = model_name
+        self.max_seq_length = int(max_seq_length)
+        self.dim = int(dim)
+        self.dtype = np.dtype(dtype)
+        self.path = os.path.join(root, f"{slugify_model_name(model_name)}_{self.max_seq_length}")
+        os.makedirs(self.path, exist_ok=True)
+
+        self._check_meta()
+
+        self._dense_path = os.path.join(self.path, "dense.bin")
+        self._sp_idx_path = os.path.join(self.path, "sparse_indices.bin")
+        self._sp_val_path = os.path.join(self.path, "sparse_values.bin")
+        self._index_path = os.path.join(self.path, "index.tsv")
+
+        # content_hash -> (row, sparse_offset, sparse_len)
+        self._index = {}
+        self._recover()
+
+        self._dense = None
+        self._sp_idx = None
+        self._sp_val = None
+        self._mapped_rows = 0
+        self._mapped_sparse = 0
+
+        self._dense_f = open(self._dense_path, "ab")
+        self._sp_idx_f = open(self._sp_idx_path, "ab")
+        self._sp_val_f = open(self._sp_val_path, "ab")
+        self._index_f = open(self._index_path, "a", encoding="utf-8")
+
+        self.hits = 0
+        self.misses = 0
+        # get/put may be called from different pipeline threads
+        self._lock = threading.Lock()
+
+    def _check_meta(self):
+        meta_path = os.path.join(self.path, "meta.json")
+        meta = {
+            "model_name": self.model_name,
+            "max_seq_length": self.max_seq_length,
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+        }
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                existing = json.load(f)
+            if existing != meta:
+                raise ValueError(f"Embedding store at {self.path} was created with {existing}, not {meta}")
+        else:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2)
+
+    def _recover(self):
+        """
+        Load index.tsv and cut the store back to a consistent state after a crash
+
+        Entries are appended in row/offset order, so everything after the first
+        half-written line, or the first entry whose vectors are not fully on
+        disk, is dropped (and re-encoded on the next miss). The index is then
+        rewritten atomically if it lost lines, and each vector file is truncated
+        to the extent the remaining entries reference, so new rows and sparse
+        offsets (taken from the file ends) line up again.
+        """
+        row_bytes = self.dim * self.dtype.itemsize
+        sizes = [os.path.getsize(p) if os.path.exists(p) else 0
+                 for p in (self._dense_path, self._sp_idx_path, self._sp_val_path)]
+        rows_on_disk = sizes[0] // row_bytes
+        sparse_on_disk = min(sizes[1], sizes[2]) // 4
+
+        lines, complete = [], True
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "rb") as f:
+                for raw in f:
+                    parts = raw.decode("utf-8", errors="replace").rstrip("\n").split("\t")
+                    try:
+                        if not raw.endswith(b"\n") or len(parts) != 4:
+                            raise ValueError
+                        row, offset, length = int(parts[1]), int(parts[2]), int(parts[3])
+                    except ValueError:
+                        complete = False
+                        break
+                    if row >= rows_on_disk or offset + length > sparse_on_disk:
+                        complete = False
+                        break
+                    self._index[parts[0]] = (row, offset, length)
+                    lines.append(raw)
+
+        if not complete:
+            tmp_path = self._index_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.writelines(lines)
+            os.replace(tmp_path, self._index_path)
+
+        rows = max((row + 1 for row, _, _ in self._index.values()), default=0)
+        sparse = max((offset + length for _, offset, length in self._index.values()), default=0)
+        for path, size, keep in ((self._dense_path, sizes[0], rows * row_bytes),
+                                 (self._sp_idx_path, sizes[1], sparse * 4),
+                                 (self._sp_val_path, sizes[2], sparse * 4)):
+            if size > keep:
+                os.truncate(path, keep)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, content_hash: str) -> bool:
+        return content_hash in self._index
+
+    def _remap(self, min_rows: int, min_sparse: int):
+        """(Re)open memory maps so they cover rows/sparse entries appended since the last map"""
+        if self._dense is None or min_rows > self._mapped_rows:
+            self._dense_f.flush()
+            rows = os.path.getsize(self._dense_path) // (self.dim * self.dtype.itemsize)
+            self._dense = np.memmap(self._dense_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+            self._mapped_rows = rows
+        if self._sp_idx is None or min_sparse > self._mapped_sparse:
+            self._sp_idx_f.flush()
+            self._sp_val_f.flush()
+            n = os.path.getsize(self._sp_idx_path) // 4
+            if n == 0:
+                # Nothing to map yet (e.g. only empty BM25 vectors were stored)
+                self._sp_idx = np.zeros(0, dtype=np.uint32)
+                self._sp_val = np.zeros(0, dtype=np.float32)
+            else:
+                self._sp_idx = np.memmap(self._sp_idx_path, dtype=np.uint32, mode="r", shape=(n,))
+                self._sp_val = np.memmap(self._sp_val_path, dtype=np.float32, mode="r", shape=(n,))
+            self._mapped_sparse = n
+
+    def get(self, hashes: Sequence[str]) -> Tuple[np.ndarray, List[SparseVec]]:
+        """
+        Load cached vectors for hashes that are all present in the store.
+
+        Returns a (len(hashes), dim) float32 array and the matching sparse vectors
+        (views into the memory-mapped files).
+        """
+        entries = [self._index[h] for h in hashes]
+        if not entries:
+            return np.zeros((0, self.dim), dtype=np.float32), []
+
+        rows = np.fromiter((e[0] for e in entries), dtype=np.int64, count=len(entries))
+        with self._lock:
+            self._remap(int(rows.max()) + 1, max(off + n for _, off, n in entries))
+            dense_map, sp_idx, sp_val = self._dense, self._sp_idx, self._sp_val
+
+        dense = np.asarray(dense_map[rows], dtype=np.float32)
+        sparse = [SparseVec(sp_idx[off:off + n], sp_val[off:off + n]) for _, off, n in entries]
+        return dense, sparse
+
+    def put(self, hashes: Sequence[str], dense: np.ndarray, sparse: Sequence):
+        """Append vectors for new hashes (already cached hashes are ignored)"""
+        with self._lock:
+            self._put(hashes, np.asarray(dense), sparse)
+
+    def _put(self, hashes: Sequence[str], dense: np.ndarray, sparse: Sequence):
+        row = self._dense_f.tell() // (self.dim * self.dtype.itemsize)
+        sparse_offset = self._sp_idx_f.tell() // 4
+
+        lines = []
+        for i, h in enumerate(hashes):
+            if h in self._index:
+                continue
+            indices = np.asarray(sparse[i].indices, dtype=np.uint32)
+            values = np.asarray(sparse[i].values, dtype=np.float32)
+
+            self._dense_f.write(np.ascontiguousarray(dense[i], dtype=self.dtype).tobytes())
+            self._sp_idx_f.write(indices.tobytes())
+            self._sp_val_f.write(values.tobytes())
+
+            self._index[h] = (row, sparse_offset, len(indices))
+            lines.append(f"{h}\t{row}\t{sparse_offset}\t{len(indices)}\n")
+            row += 1
+            sparse_offset += len(indices)
+
+        if lines:
+            # Vectors must hit the files before the index references them
+            self._dense_f.flush()
+            self._sp_idx_f.flush()
+            self._sp_val_f.flush()
+            self._index_f.writelines(lines)
+            self._index_f.flush()
+
+    def embed(self, texts: Sequence[str],
+              dense_fn: Callable[[List[str]], Sequence],
+              sparse_fn: Callable[[List[str]], Sequence],
+              hashes: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, List[SparseVec]]:
+        """
+        Return dense + sparse vectors for texts, running the encoders only on
+        texts that are not cached yet. Output order matches the input order.
+        """
+        if hashes is None:
+            hashes = [get_content_hash(t) for t in texts]
+
+        miss_idx = [i for i, h in enumerate(hashes) if h not in self._index]
+        self.misses += len(miss_idx)
+        self.hits += len(hashes) - len(miss_idx)
+
+        if miss_idx:
+            miss_texts = [texts[i] for i in miss_idx]
+            miss_hashes = [hashes[i] for i in miss_idx]
+            self.put(miss_hashes, np.asarray(dense_fn(miss_texts), dtype=np.float32), list(sparse_fn(miss_texts)))
+
+        return self.get(hashes)
+
+    def close(self):
+        for f in (self._dense_f, self._sp_idx_f, self._sp_val_f, self._index_f):
+            f.close()
+        self._dense = self._sp_idx = self._sp_val = None
@@ -0,0 +1,391 @@
+"""
+Dense encoder helpers for ingestion
+
+VBQPPL sections range from one line to tens of thousands of characters. Feeding
+them to the encoder in corpus order makes every batch pad to its longest member
+(up to MAX_SEQ_LENGTH tokens). encode_by_token_budget instead sorts texts by
+token length and packs batches under a padded-token budget, then restores the
+original order, so short sections run in large batches and long ones in small
+batches that fit in memory.
+
+On GPU-less nodes a single PyTorch process scales poorly across many cores.
+CPUEncoderPool runs several encoder processes with pinned thread counts that
+write their vectors straight into a shared-memory output buffer.
+
+ONNXEmbeddings runs the exported transformer through ONNX Runtime, optionally
+with dynamic int8 quantization, for CPU-only serving. create_dense_encoder picks
+the backend from EMBEDDING_BACKEND (torch | onnx | onnx-int8) and is shared by
+RAG and the ingest scripts.
+"""
+import os
+import json
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils import slugify_model_name
+
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def token_lengths(tokenizer, texts: Sequence[str], max_seq_length: int) -> np.ndarray:
+    """Number of tokens (incl. special tokens, after truncation) of each text"""
+    if not texts:
+        return np.zeros(0, dtype=np.int64)
+    encoded = tokenizer(
+        list(texts),
+        add_special_tokens=True,
+        truncation=True,
+        max_length=max_seq_length,
+        return_attention_mask=False,
+        return_token_type_ids=False
+    )
+    return np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64, count=len(texts))
+
+
+def plan_token_budget_batches(lengths: np.ndarray, token_budget: int, max_batch_size: int = 256) -> List[np.ndarray]:
+    """
+    Group text indices into batches whose padded size (batch size x longest
+    member) stays within token_budget.
+
+    Texts are taken longest first, so an out-of-memory batch shows up at the
+    start of a run rather than at the end. A single text longer than the budget
+    gets a batch of its own.
+    """
+    order = np.argsort(-lengths, kind="stable")
+    batches = []
+    start = 0
+    while start < len(order):
+        longest = max(int(lengths[order[start]]), 1)
+        size = max(1, min(max_batch_size, token_budget // longest))
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+def encode_by_token_budget(model, texts: Sequence[str], token_budget: int,
+                           max_batch_size: int = 256, normalize_embeddings: bool = True) -> np.ndarray:
+    """
+    Encode texts with a SentenceTransformer using token-budgeted, length-sorted
+    batches. Returns a (len(texts), dim) float32 array in the input order.
+    """
+    lengths = token_lengths(model.tokenizer, texts, model.max_seq_length)
+    out = None
+    for idx in plan_token_budget_batches(lengths, token_budget, max_batch_size):
+        vectors = model.encode(
+            [texts[i] for i in idx],
+            batch_size=len(idx),
+            convert_to_numpy=True,
+            normalize_embeddings=normalize_embeddings,
+            show_progress_bar=False
+        )
+        if out is None:
+            out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+        out[idx] = vectors
+    return out if out is not None else np.zeros((0, 0), dtype=np.float32)
+
+
+class TokenBudgetEmbeddings:
+    """
+    Wraps a HuggingFaceEmbeddings so embed_documents uses token-budgeted
+    batching. Queries are single texts and go straight to the wrapped model.
+    """
+
+    def __init__(self, embedding, token_budget: int, max_batch_size: int = 256):
+        self.embedding = embedding
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.normalize_embeddings = embedding.encode_kwargs.get("normalize_embeddings", False)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return encode_by_token_budget(
+            self.embedding._client, texts, self.token_budget,
+            max_batch_size=self.max_batch_size,
+            normalize_embeddings=self.normalize_embeddings
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embedding.embed_query(text)
+
+
+# ============ CPU process pool ============
+
+_worker_model = None
+
+
+def _init_encoder_worker(model_name: str, max_seq_length: int, num_threads: int):
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+    torch.set_num_threads(num_threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+    _worker_model.max_seq_length = max_seq_length
+
+
+def _encode_into_shm(shm_name: str, shape: Tuple[int, int], rows: np.ndarray,
+                     texts: List[str], normalize_embeddings: bool) -> float:
+    """Encode one batch in a worker and write it to its rows of the shared output buffer"""
+    start = time.perf_counter()
+    vectors = _worker_model.encode(
+        texts,
+        batch_size=len(texts),
+        convert_to_numpy=True,
+        normalize_embeddings=normalize_embeddings,
+        show_progress_bar=False
+    )
+    shm = SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        out[rows] = vectors
+        del out
+    finally:
+        shm.close()
+    return time.perf_counter() - start
+
+
+class CPUEncoderPool:
+    """
+    Dense encoder backed by a pool of CPU worker processes.
+
+    embed_documents splits texts into token-budgeted batches (see
+    plan_token_budget_batches), spreads them over the workers and returns the
+    vectors in input order. Each worker pins torch to `threads_per_worker`
+    threads so the workers do not oversubscribe the cores.
+    """
+
+    def __init__(self, model_name: str, max_seq_length: int, dim: int,
+                 workers: int, threads_per_worker: Optional[int] = None,
+                 token_budget: int = 32768, max_batch_size: int = 256,
+                 normalize_embeddings: bool = True):
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.max_seq_length = max_seq_length
+        self.dim = dim
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.normalize_embeddings = normalize_embeddings
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        # spawn: workers load their own torch runtime instead of inheriting the parent's thread pools
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_encoder_worker,
+            initargs=(model_name, max_seq_length, self.threads_per_worker)
+        )
+        self.docs = 0
+        self.seconds = 0.0
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        start = time.perf_counter()
+        shape = (len(texts), self.dim)
+        lengths = token_lengths(self.tokenizer, texts, self.max_seq_length)
+        # Smaller batches than a single process would use, so every worker gets a share of the window
+        budget = max(1, min(self.token_budget, int(lengths.sum()) // self.workers))
+        batches = plan_token_budget_batches(lengths, budget, self.max_batch_size)
+
+        shm = SharedMemory(create=True, size=len(texts) * self.dim * 4)
+        try:
+            futures = [
+                self._executor.submit(
+                    _encode_into_shm, shm.name, shape, idx,
+                    [texts[i] for i in idx], self.normalize_embeddings
+                )
+                for idx in batches
+            ]
+            for future in futures:
+                future.result()
+            vectors = np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+        self.docs += len(texts)
+        self.seconds += time.perf_counter() - start
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0].tolist()
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.docs / self.seconds if self.seconds > 0 else 0.0
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+# ============ ONNX Runtime backend ============
+
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+ONNX_META_FILE = "encoder.json"
+
+
+def onnx_model_dir(model_name: str) -> str:
+    """Directory holding the exported ONNX encoder for a model (ONNX_MODEL_DIR/<slug>)"""
+    return os.path.join(os.getenv("ONNX_MODEL_DIR", "./onnx_models"), slugify_model_name(model_name))
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True) -> str:
+    """
+    Export the transformer of a SentenceTransformer model to ONNX.
+
+    Writes model.onnx (fp32), model.int8.onnx (dynamic int8 quantization of the
+    weights, if quantize), the tokenizer and encoder.json with the pooling mode.
+    Pooling and normalization run in numpy at inference time.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0]
+    pooling = next((m for m in st if type(m).__name__ == "Pooling"), None)
+    pooling_mode = pooling.get_pooling_mode_str() if pooling is not None else "cls"
+    if pooling_mode not in ("cls", "mean"):
+        raise ValueError(f"Unsupported pooling mode for ONNX export: {pooling_mode}")
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, ONNX_FP32_FILE)
+    dummy = transformer.tokenizer(["Điều 1. Phạm vi điều chỉnh"], return_tensors="pt")
+    logging.info(f"Exporting {model_name} to {fp32_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(transformer.auto_model.eval()),
+            (dummy["input_ids"], dummy["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=17,
+            dynamo=False
+        )
+    transformer.tokenizer.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = os.path.join(output_dir, ONNX_INT8_FILE)
+        logging.info(f"Quantizing to {int8_path}")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    with open(os.path.join(output_dir, ONNX_META_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "pooling": pooling_mode,
+            "dim": st.get_sentence_embedding_dimension()
+        }, f, indent=2)
+    return output_dir
+
+
+class ONNXEmbeddings:
+    """Dense encoder running an exported model through ONNX Runtime on CPU"""
+
+    def __init__(self, model_dir: str, quantized: bool = False, max_seq_length: int = 512,
+                 num_threads: Optional[int] = None, token_budget: int = 32768, max_batch_size: int = 256):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, ONNX_META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.pooling = meta["pooling"]
+        self.dim = meta["dim"]
+        self.max_seq_length = max_seq_length
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        model_path = os.path.join(model_dir, ONNX_INT8_FILE if quantized else ONNX_FP32_FILE)
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts, padding=True, truncation=True,
+            max_length=self.max_seq_length, return_tensors="np"
+        )
+        mask = encoded["attention_mask"].astype(np.int64)
+        hidden = self.session.run(None, {
+            "input_ids": encoded["input_ids"].astype(np.int64),
+            "attention_mask": mask
+        })[0]
+
+        if self.pooling == "cls":
+            vectors = hidden[:, 0]
+        else:
+            weights = mask[:, :, None].astype(np.float32)
+            vectors = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        lengths = token_lengths(self.tokenizer, texts, self.max_seq_length)
+        for idx in plan_token_budget_batches(lengths, self.token_budget, self.max_batch_size):
+            out[idx] = self._encode_batch([texts[i] for i in idx])
+        return out
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode_batch([text])[0].tolist()
+
+
+def create_dense_encoder(model_name: str, max_seq_length: int, device: str = "cpu",
+                         backend: Optional[str] = None, token_budget: int = 0):
+    """
+    Create the dense encoder for EMBEDDING_BACKEND (or `backend`):
+
+    - torch: HuggingFaceEmbeddings (wrapped in TokenBudgetEmbeddings if token_budget > 0)
+    - onnx / onnx-int8: ONNXEmbeddings, exporting the model first if needed
+
+    All backends expose embed_documents / embed_query and return normalized vectors.
+    """
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {ENCODER_BACKENDS}")
+
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embedding = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": device},
+            encode_kwargs={"convert_to_numpy": True, "normalize_embeddings": True}
+        )
+        embedding._client.max_seq_length = max_seq_length
+        if token_budget > 0:
+            embedding = TokenBudgetEmbeddings(embedding, token_budget)
+        return embedding
+
+    quantized = backend == "onnx-int8"
+    model_dir = onnx_model_dir(model_name)
+    model_file = ONNX_INT8_FILE if quantized else ONNX_FP32_FILE
+    if not os.path.exists(os.path.join(model_dir, model_file)):
+        export_onnx(model_name, model_dir, quantize=quantized)
+    return ONNXEmbeddings(
+        model_dir, quantized=quantized, max_seq_length=max_seq_length,
+        token_budget=token_budget or 32768
+    )
@@ -1,138 +1,80 @@
-from qdrant_client.models import Distance, VectorParams, SparseVectorParams, SparseIndexParams, PointStruct
-from qdrant_client import QdrantClient
+"""
+Ingest the ALQAC-2025 law corpus into Qdrant
+
+Shares the indexing helpers of ingest_qdrant.py: deterministic point IDs,
+content hashes (--incremental), the on-disk embedding cache (--cache-dir) and
+the resumable ingestion pipeline (--resume).
+"""
 import os
+import argparse
 from dotenv import load_dotenv
-from langchain_huggingface import HuggingFaceEmbeddings
-from fastembed import SparseTextEmbedding
-import uuid
-from tqdm import tqdm
-import json
-import torch
+from qdrant_client import QdrantClient
+from typing import Iterator
 
-from utils import get_alqac_point_id
+from utils import get_alqac_point_id, get_point_uuid, get_content_hash
+from corpus import iter_corpus
+from encoders import CPUEncoderPool
+from ingest_qdrant import PointRecord, add_ingest_arguments, ingest_collection, load_dense_embedding, open_embedding_store
 
 load_dotenv()
 
 # Configuration
-batch_size = 128
-model_name = os.getenv("EMBEDDING_MODEL")
-model_kwargs = {"device": "cuda" if torch.cuda.is_available() else "cpu"}
-encode_kwargs = {"convert_to_numpy": True, "normalize_embeddings": True}
+collection_name = "alqac25_collection"
+DEFAULT_DATA_PATH = "/home/nt-loi/law-chatbot/ALQAC-2025/alqac25_law.json"
 
-print(f"Loading dense embedding model: {model_name}")
-embedding = HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs, encode_kwargs=encode_kwargs)
-embedding._client.max_seq_length = int(os.getenv("MAX_SEQ_LENGTH"))
 
-print("Loading sparse embedding model: Qdrant/bm25")
-sparse_embedding = SparseTextEmbedding(model_name="Qdrant/bm25")
+def iter_alqac_records(path: str) -> Iterator[PointRecord]:
+    """Yield one point per ALQAC article, streaming the law file"""
+    for doc in iter_corpus(path):
+        doc_id = doc.get("id")
+        articles = doc.get("articles", [])
 
-client = QdrantClient(host=os.getenv("QDRANT_HOST"), port=os.getenv("QDRANT_PORT"))
-collection_name = "alqac25_collection"
-vector_size = int(os.getenv("VECTOR_SIZE"))
-
-# Recreate collection
-if client.collection_exists(collection_name):
-    print(f"Deleting existing collection: {collection_name}")
-    client.delete_collection(collection_name)
-
-client.create_collection(
-    collection_name=collection_name,
-    vectors_config={"dense": VectorParams(size=vector_size, distance=Distance.COSINE)},
-    sparse_vectors_config={"sparse": SparseVectorParams(index=SparseIndexParams(on_disk=False))}
-)
-print(f"Created collection: {collection_name} (Dim: {vector_size})")
-
-# Load data
-data_path = "/home/nt-loi/law-chatbot/ALQAC-2025/alqac25_law.json"
-with open(data_path, "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-points = []
-batch_texts = []
-batch_metas = []
-
-for doc in tqdm(data, desc="Processing documents"):
-    doc_id = doc.get("id")
-    articles = doc.get("articles", [])
-    
-    for article in articles:
-        article_id = article.get("id")
-        content = article.get("text", "")
-        # Use doc_id as title since it's the law name in ALQAC-2025
-        title = doc_id
-        
-        embed_content = f"{title}\n{content}"
-        
-        batch_texts.append(embed_content)
-        batch_metas.append({
-            "doc_id": doc_id,
-            "article_id": article_id,
-            "title": title,
-            "content": content,
-            "embed_content": embed_content
-        })
-        
-        if len(batch_texts) >= batch_size:
-            # Embed batch
-            batch_dense_vectors = embedding.embed_documents(batch_texts)
-            batch_sparse_vectors = list(sparse_embedding.embed(batch_texts))
-            
-            for text, meta, dense_vec, sparse_vec in zip(batch_texts, batch_metas, batch_dense_vectors, batch_sparse_vectors):
-                points.append(
-                    PointStruct(
-                        id=str(uuid.uuid4()),
-                        vector={
-                            "dense": dense_vec,
-                            "sparse": {
-                                "indices": sparse_vec.indices,
-                                "values": sparse_vec.values
-                            }
-                        },
-                        payload={
-                            "id": get_alqac_point_id(meta["doc_id"], meta["article_id"]),
-                            "doc_id": meta["doc_id"],
-                            "article_id": meta["article_id"],
-                            "source": "alqac25",
-                            "title": meta["title"],
-                            "content": meta["content"],
-                            "embed_content": text
-                        }
-                    )
-                )
-            
-            client.upsert(collection_name=collection_name, points=points)
-            points = []
-            batch_texts = []
-            batch_metas = []
-
-# Process remaining items
-if batch_texts:
-    batch_dense_vectors = embedding.embed_documents(batch_texts)
-    batch_sparse_vectors = list(sparse_embedding.embed(batch_texts))
-    
-    for text, meta, dense_vec, sparse_vec in zip(batch_texts, batch_metas, batch_dense_vectors, batch_sparse_vectors):
-        points.append(
-            PointStruct(
-                id=str(uuid.uuid4()),
-                vector={
-                    "dense": dense_vec,
-                    "sparse": {
-                        "indices": sparse_vec.indices,
-                        "values": sparse_vec.values
-                    }
-                },
-                payload={
-                    "id": get_alqac_point_id(meta["doc_id"], meta["article_id"]),
-                    "doc_id": meta["doc_id"],
-                    "article_id": meta["article_id"],
-                    "source": "alqac25",
-                    "title": meta["title"],
-                    "content": meta["content"],
-                    "embed_content": text
-                }
-            )
-        )
-    client.upsert(collection_name=collection_name, points=points)
-
-print(f"Indexed ALQAC-2025 nodes into {collection_name}")
-client.close()
+        for article in articles:
+            article_id = article.get("id")
+            content = article.get("text", "")
+            # Use doc_id as title since it's the law name in ALQAC-2025
+            title = doc_id
+
+            embed_content = f"{title}\n{content}"
+            point_key = get_alqac_point_id(doc_id, article_id)
+            yield get_point_uuid(point_key), embed_content, {
+                "id": point_key,
+                "doc_id": doc_id,
+                "article_id": article_id,
+                "source": "alqac25",
+                "title": title,
+                "content": content,
+                "embed_content": embed_content,
+                "content_hash": get_content_hash(embed_content)
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest ALQAC-2025 law corpus into Qdrant")
+    parser.add_argument("--input", default=os.getenv("ALQAC_LAW", DEFAULT_DATA_PATH),
+                        help="Path to alqac25_law.json (JSON array or JSONL)")
+    parser.add_argument("--collection", default=collection_name,
+                        help="Target collection (e.g. to build copies with different --profile)")
+    add_ingest_arguments(parser)
+    args = parser.parse_args()
+
+    embedding = load_dense_embedding(args)
+
+    client = QdrantClient(host=os.getenv("QDRANT_HOST"), port=os.getenv("QDRANT_PORT"))
+    store = open_embedding_store(args.cache_dir)
+
+    ingest_collection(
+        client, args.collection, iter_alqac_records(args.input),
+        embedding, args, store=store, desc="Processing documents"
+    )
+    print(f"Indexed ALQAC-2025 nodes into {args.collection}")
+
+    if store is not None:
+        store.close()
+    if isinstance(embedding, CPUEncoderPool):
+        embedding.close()
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Pipelined Qdrant ingestion
+
+    prepare  ──►  dense encode  ──►  BM25 encode  ──►  upload
+    (thread)      (main thread)      (subprocess)      (thread pool, wait=False)
+
+Stages are connected by bounded queues, so the dense encoder keeps the GPU/CPU
+busy while earlier batches are being BM25-encoded and uploaded, and memory stays
+bounded regardless of corpus size. Per-stage throughput is reported at the end.
+
+For full rebuilds, an IngestCheckpoint records how far into the input stream
+every batch has been uploaded, so an interrupted run can be resumed.
+"""
+import os
+import json
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+from tqdm import tqdm
+
+from embedding_store import EmbeddingStore, SparseVec
+
+_DONE = object()
+
+# Points per upload request; pipeline batches can be larger than this
+UPLOAD_BATCH_SIZE = 256
+
+# ============ BM25 worker process ============
+
+_sparse_model = None
+
+
+def _init_sparse_worker(model_name: str):
+    global _sparse_model
+    from fastembed import SparseTextEmbedding
+    _sparse_model = SparseTextEmbedding(model_name=model_name)
+
+
+def _sparse_encode(texts: List[str]):
+    start = time.perf_counter()
+    vectors = [
+        SparseVec(np.asarray(v.indices, dtype=np.uint32), np.asarray(v.values, dtype=np.float32))
+        for v in _sparse_model.embed(texts)
+    ]
+    return vectors, time.perf_counter() - start
+
+
+# ============ Bookkeeping ============
+
+class StageStats:
+    """Busy time and item count of a single pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int, seconds: float):
+        with self._lock:
+            self.items += items
+            self.seconds += seconds
+
+    def __str__(self):
+        rate = self.items / self.seconds if self.seconds > 0 else 0.0
+        return f"{self.name:<8} {self.items:>9} items  {self.seconds:>9.1f}s busy  {rate:>9.1f} items/s"
+
+
+class IngestCheckpoint:
+    """
+    Resume checkpoint for one collection.
+
+    Stores the number of input records for which every batch has been uploaded
+    (`offset`). Batches finish out of order, so only the contiguous prefix of
+    completed batches advances the offset.
+    """
+
+    def __init__(self, path: str, collection_name: str, resume: bool = True, save_every: int = 20):
+        self.path = path
+        self.collection_name = collection_name
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._finished: Dict[int, int] = {}  # batch_no -> end offset
+        self._next_batch = 0
+        self._since_save = 0
+
+        state = {}
+        if resume and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f).get(collection_name, {})
+        self.offset = int(state.get("offset", 0))
+        self.completed = bool(state.get("completed", False))
+
+    def mark_done(self, batch_no: int, end_offset: int):
+        with self._lock:
+            self._finished[batch_no] = end_offset
+            while self._next_batch in self._finished:
+                self.offset = self._finished.pop(self._next_batch)
+                self._next_batch += 1
+                self._since_save += 1
+            if self._since_save >= self.save_every:
+                self._save()
+
+    def save(self, completed: bool = False):
+        with self._lock:
+            self.completed = completed
+            self._save()
+
+    def _save(self):
+        data = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        data[self.collection_name] = {"offset": self.offset, "completed": self.completed}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._since_save = 0
+
+
+@dataclass
+class _Batch:
+    no: int
+    end_offset: int  # input records consumed after this batch
+    records: list
+    hashes: List[str]
+    dense: Optional[np.ndarray] = None
+    sparse: Optional[list] = None
+    miss_idx: List[int] = field(default_factory=list)
+    sparse_future: Optional[Future] = None
+
+
+# ============ Pipeline ============
+
+class IngestPipeline:
+    """Overlaps text preparation, dense encoding, BM25 encoding and uploads for one collection"""
+
+    def __init__(self, client: QdrantClient, collection_name: str, embedding,
+                 batch_size: int = 128,
+                 store: Optional[EmbeddingStore] = None,
+                 sparse_model_name: str = "Qdrant/bm25",
+                 queue_size: int = 4,
+                 upload_workers: int = 4,
+                 checkpoint: Optional[IngestCheckpoint] = None):
+        """
+        Args:
+            client: Qdrant client (shared by the upload threads)
+            collection_name: Target collection
+            embedding: Dense encoder exposing embed_documents(texts)
+            batch_size: Records per batch
+            store: Optional on-disk embedding cache
+            sparse_model_name: fastembed sparse model loaded in the BM25 subprocess
+            queue_size: Max batches buffered between consecutive stages
+            upload_workers: Concurrent upload requests
+            checkpoint: Resume checkpoint (skips already uploaded input records)
+        """
+        self.client = client
+        self.collection_name = collection_name
+        self.embedding = embedding
+        self.batch_size = batch_size
+        self.store = store
+        self.sparse_model_name = sparse_model_name
+        self.queue_size = queue_size
+        self.upload_workers = upload_workers
+        self.checkpoint = checkpoint
+
+        self.stats = {name: StageStats(name) for name in ("prepare", "dense", "sparse", "upload")}
+        self._error: Optional[BaseException] = None
+
+    # ---- stages ----
+
+    def _prepare(self, records: Iterable, out: queue.Queue):
+        """Stage 1: read records (skipping the checkpointed prefix) and group them into batches"""
+        try:
+            skip = self.checkpoint.offset if self.checkpoint else 0
+            offset = 0
+            batch_no = 0
+            pending = []
+            start = time.perf_counter()
+            for record in records:
+                offset += 1
+                if offset <= skip:
+                    continue
+                pending.append(record)
+                if len(pending) >= self.batch_size:
+                    self.stats["prepare"].add(len(pending), time.perf_counter() - start)
+                    out.put(_Batch(batch_no, offset, pending, [r[2]["content_hash"] for r in pending]))
+                    batch_no += 1
+                    pending = []
+                    start = time.perf_counter()
+                if self._error:
+                    return
+            if pending:
+                self.stats["prepare"].add(len(pending), time.perf_counter() - start)
+                out.put(_Batch(batch_no, offset, pending, [r[2]["content_hash"] for r in pending]))
+        except BaseException as e:
+            self._error = e
+        finally:
+            out.put(_DONE)
+
+    def _encode_dense(self, batch: _Batch, sparse_executor: ProcessPoolExecutor):
+        """Stage 2: dense vectors (cache hits from the store, misses from the encoder); dispatch BM25"""
+        start = time.perf_counter()
+        n = len(batch.records)
+        if self.store is not None:
+            batch.miss_idx = [i for i, h in enumerate(batch.hashes) if h not in self.store]
+        else:
+            batch.miss_idx = list(range(n))
+        miss_set = set(batch.miss_idx)
+        hit_idx = [i for i in range(n) if i not in miss_set]
+
+        miss_texts = [batch.records[i][1] for i in batch.miss_idx]
+        if miss_texts:
+            batch.sparse_future = sparse_executor.submit(_sparse_encode, miss_texts)
+            miss_dense = np.asarray(self.embedding.embed_documents(miss_texts), dtype=np.float32)
+
+        batch.sparse = [None] * n
+        if hit_idx:
+            hit_dense, hit_sparse = self.store.get([batch.hashes[i] for i in hit_idx])
+            for i, vec in zip(hit_idx, hit_sparse):
+                batch.sparse[i] = vec
+
+        dim = miss_dense.shape[1] if miss_texts else hit_dense.shape[1]
+        batch.dense = np.empty((n, dim), dtype=np.float32)
+        if miss_texts:
+            batch.dense[batch.miss_idx] = miss_dense
+        if hit_idx:
+            batch.dense[hit_idx] = hit_dense
+        self.stats["dense"].add(n, time.perf_counter() - start)
+
+    def _collect(self, inp: queue.Queue, upload_executor: ThreadPoolExecutor, pbar: tqdm):
+        """Stage 3/4: wait for BM25 vectors, fill the cache, build points and dispatch uploads"""
+        in_flight = threading.BoundedSemaphore(self.upload_workers * 2)
+        try:
+            while True:
+                batch = inp.get()
+                if batch is _DONE:
+                    return
+                if batch.sparse_future is not None:
+                    vectors, seconds = batch.sparse_future.result()
+                    self.stats["sparse"].add(len(vectors), seconds)
+                    for i, vec in zip(batch.miss_idx, vectors):
+                        batch.sparse[i] = vec
+                    if self.store is not None:
+                        self.store.put([batch.hashes[i] for i in batch.miss_idx], batch.dense[batch.miss_idx], vectors)
+
+                points = [
+                    PointStruct(
+                        id=point_id,
+                        vector={
+                            "dense": dense_vec.tolist(),
+                            "sparse": {
+                                "indices": sparse_vec.indices.tolist(),
+                                "values": sparse_vec.values.tolist()
+                            }
+                        },
+                        payload=payload
+                    )
+                    for (point_id, _, payload), dense_vec, sparse_vec in zip(batch.records, batch.dense, batch.sparse)
+                ]
+                in_flight.acquire()
+                future = upload_executor.submit(self._upload, batch.no, batch.end_offset, points)
+                future.add_done_callback(lambda f, n=len(points): (in_flight.release(), pbar.update(n)))
+        except BaseException as e:
+            self._error = e
+            # Keep draining so the producer never blocks on a full queue
+            while inp.get() is not _DONE:
+                pass
+
+    def _upload(self, batch_no: int, end_offset: int, points: List[PointStruct]):
+        start = time.perf_counter()
+        try:
+            self.client.upload_points(
+                collection_name=self.collection_name,
+                points=points,
+                batch_size=UPLOAD_BATCH_SIZE,
+                wait=False
+            )
+        except BaseException as e:
+            self._error = e
+            raise
+        self.stats["upload"].add(len(points), time.perf_counter() - start)
+        if self.checkpoint:
+            self.checkpoint.mark_done(batch_no, end_offset)
+
+    # ---- driver ----
+
+    def run(self, records: Iterable, desc: str = "Indexing") -> int:
+        """Run the pipeline over records (point_id, embed_content, payload); returns the number uploaded"""
+        prepared: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        encoded: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        # spawn: forking after torch/CUDA initialisation is unsafe
+        sparse_executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_sparse_worker,
+            initargs=(self.sparse_model_name,)
+        )
+        upload_executor = ThreadPoolExecutor(max_workers=self.upload_workers, thread_name_prefix="upload")
+        pbar = tqdm(desc=desc, unit="point", initial=self.checkpoint.offset if self.checkpoint else 0)
+
+        producer = threading.Thread(target=self._prepare, args=(records, prepared), name="prepare", daemon=True)
+        collector = threading.Thread(target=self._collect, args=(encoded, upload_executor, pbar), name="collect", daemon=True)
+        producer.start()
+        collector.start()
+
+        wall_start = time.perf_counter()
+        try:
+            while True:
+                batch = prepared.get()
+                if batch is _DONE:
+                    break
+                if self._error:
+                    continue  # drain until the producer stops
+                self._encode_dense(batch, sparse_executor)
+                encoded.put(batch)
+        except BaseException as e:
+            self._error = e
+            while prepared.get() is not _DONE:
+                pass
+        finally:
+            encoded.put(_DONE)
+            collector.join()
+            producer.join()
+            upload_executor.shutdown(wait=True)
+            sparse_executor.shutdown(wait=True)
+            pbar.close()
+
+        if self._error:
+            raise self._error
+
+        wall = time.perf_counter() - wall_start
+        uploaded = self.stats["upload"].items
+        print(f"Pipeline throughput for {self.collection_name} ({wall:.1f}s wall, "
+              f"{uploaded / wall if wall > 0 else 0.0:.1f} points/s end-to-end):")
+        for stage in self.stats.values():
+            print(f"  {stage}")
+        return uploaded
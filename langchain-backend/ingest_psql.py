@@ -4,12 +4,13 @@ This provides fast document retrieval for UI display (replacing slow Qdrant payl
 """
 import json
 import os
-import hashlib
 from tqdm import tqdm
 from sqlmodel import Session, select
-from sqlalchemy import text
+from sqlalchemy import text, delete
 from dotenv import load_dotenv
 
+from corpus import iter_corpus
+from utils import get_section_point_ids
 from models import (
     engine, init_db,
     VBQPPLDoc, VBQPPLSection,
@@ -21,41 +22,42 @@ load_dotenv()
 BATCH_SIZE = 100  # Smaller batch for stability
 
 
-def get_section_id(doc_id: str, hierarchy_path: str) -> str:
-    """
-    Generate unique section ID (MD5 Hash) based on document ID and section path.
-    This matches the ID format used in Qdrant for consistency.
-    """
-    safe_doc_id = str(doc_id) if doc_id else "unknown_doc"
-    safe_path = str(hierarchy_path) if hierarchy_path else "general"
-    raw_combination = f"{safe_doc_id}_{safe_path}"
-    return hashlib.md5(raw_combination.encode('utf-8')).hexdigest()
+def load_changed_ids(manifest_path: str) -> set:
+    """Document IDs listed in a crawler change manifest (vbqppl_crawler.py --manifest)"""
+    return {record["doc_id"] for record in iter_corpus(manifest_path)}
 
 
-def ingest_vbqppl(session: Session, data_path: str):
-    """Ingest VBQPPL documents and sections"""
-    print(f"\n📚 Loading VBQPPL data from: {data_path}")
-    
-    with open(data_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    print(f"   Found {len(data)} documents")
+def ingest_vbqppl(session: Session, data_path: str, changed_ids: set = None):
+    """
+    Ingest VBQPPL documents and sections
+
+    With changed_ids, only those documents are (re-)ingested: their existing
+    rows and sections are replaced, all other documents are left untouched.
+    """
+    print(f"\n📚 Streaming VBQPPL data from: {data_path}")
     
     doc_count = 0
     section_count = 0
     errors = 0
     
-    for item in tqdm(data, desc="Processing VBQPPL"):
+    for item in tqdm(iter_corpus(data_path), desc="Processing VBQPPL", unit="doc"):
         doc_id = item.get("id")
         if not doc_id:
             continue
         
+        if changed_ids is not None:
+            if doc_id not in changed_ids:
+                continue
         # Check if document already exists
-        if session.get(VBQPPLDoc, doc_id):
+        elif session.get(VBQPPLDoc, doc_id):
             continue
 
         try:
             with session.begin_nested():
+                if changed_ids is not None:
+                    session.execute(delete(VBQPPLSection).where(VBQPPLSection.doc_id == doc_id))
+                    session.execute(delete(VBQPPLDoc).where(VBQPPLDoc.id == doc_id))
+                
                 # Create document
                 doc = VBQPPLDoc(
                     id=doc_id,
@@ -71,12 +73,11 @@ def ingest_vbqppl(session: Session, data_path: str):
                 
                 # Create sections
                 sections = item.get("sections") or []
-                for section in sections:
+                # Same IDs as the Qdrant payload (repeated hierarchy paths are numbered)
+                hash_ids, _ = get_section_point_ids(doc_id, sections)
+                for section, hash_id in zip(sections, hash_ids):
                     hierarchy_path = section.get("hierarchy_path", "")
                     
-                    # Calculate Hash ID to match Qdrant ID
-                    hash_id = get_section_id(doc_id, hierarchy_path)
-                    
                     section_obj = VBQPPLSection(
                         hash_id=hash_id,
                         doc_id=doc_id,
@@ -113,17 +114,12 @@ def ingest_vbqppl(session: Session, data_path: str):
 
 def ingest_phapdien(session: Session, data_path: str):
     """Ingest Pháp Điển data"""
-    print(f"\n📖 Loading Pháp Điển data from: {data_path}")
-    
-    with open(data_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    print(f"   Found {len(data)} điều")
+    print(f"\n📖 Streaming Pháp Điển data from: {data_path}")
     
     count = 0
     errors = 0
     
-    for item in tqdm(data, desc="Processing Pháp Điển"):
+    for item in tqdm(iter_corpus(data_path), desc="Processing Pháp Điển", unit="điều"):
         try:
             dieu = PhapDienDieu(
                 id=item.get("ID"),
@@ -161,16 +157,22 @@ def ingest_phapdien(session: Session, data_path: str):
 
 
 def main():
-    import sys
+    import argparse
     
-    # Check for --drop flag
-    drop_all = "--drop" in sys.argv
+    parser = argparse.ArgumentParser(description="Ingest Pháp Điển and VBQPPL data into PostgreSQL")
+    parser.add_argument("--drop", action="store_true", help="Drop and recreate all tables first")
+    parser.add_argument("--changes", default=None,
+                        help="Change manifest from vbqppl_crawler.py: only re-ingest the listed VBQPPL documents")
+    args = parser.parse_args()
     
     print("🚀 Starting PostgreSQL Ingestion")
     print("=" * 50)
     
     # Initialize database
-    init_db(drop_all=drop_all)
+    init_db(drop_all=args.drop)
+    changed_ids = load_changed_ids(args.changes) if args.changes else None
+    if changed_ids is not None:
+        print(f"🔁 Re-ingesting {len(changed_ids)} changed documents from {args.changes}")
     
     # Get data paths from environment
     vbqppl_path = os.getenv("VBQPPL")
@@ -189,10 +191,16 @@ def main():
     with Session(engine) as session:
         # Ingest VBQPPL
         if os.path.exists(vbqppl_path):
-            ingest_vbqppl(session, vbqppl_path)
+            ingest_vbqppl(session, vbqppl_path, changed_ids)
         else:
             print(f"⚠️  VBQPPL file not found: {vbqppl_path}")
         
+        # The change manifest only covers the main VBQPPL corpus
+        if changed_ids is not None:
+            print("\n" + "=" * 50)
+            print("✅ PostgreSQL Incremental Ingestion Complete!")
+            return
+        
         # Ingest QA VBQPPL
         if os.path.exists(qa_vbqppl_path):
             ingest_vbqppl(session, qa_vbqppl_path)
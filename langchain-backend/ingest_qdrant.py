@@ -1,186 +1,355 @@
-from qdrant_client.models import Distance, VectorParams, SparseVectorParams, SparseIndexParams, PointStruct
+"""
+Ingest Pháp Điển and VBQPPL data into Qdrant (dense + BM25 sparse vectors)
+
+Point IDs are derived deterministically from the payload ID (see get_point_uuid),
+and every point stores a `content_hash` of its embedded text. This allows an
+incremental mode that only embeds new or changed sections and deletes points
+that disappeared from the corpus:
+
+    python ingest_qdrant.py                 # full rebuild (drops collections)
+    python ingest_qdrant.py --incremental   # only re-embed what changed
+
+Vectors can additionally be cached on disk (EMBEDDING_CACHE_DIR or --cache-dir)
+so unchanged texts never go through the encoders again, even after a full rebuild.
+
+Encoding, BM25 and uploads are overlapped by ingest_pipeline.IngestPipeline;
+an interrupted full rebuild can be continued with --resume. With --clauses,
+VBQPPL sections are also indexed as Khoản/Điểm sub-chunks (see clause_chunks.py).
+"""
+from qdrant_client.models import (
+    Disabled, PayloadSchemaType, PointIdsList, TextIndexParams, TextIndexType, TokenizerType, VectorParamsDiff
+)
 from qdrant_client import QdrantClient
 import os
+import argparse
 from dotenv import load_dotenv
-from langchain_huggingface import HuggingFaceEmbeddings
-from fastembed import SparseTextEmbedding
-import uuid
 from tqdm import tqdm
-import json
+from typing import Dict, Iterator, Optional, Tuple
 import torch
 
-from utils import slugify_model_name, get_collection_name, get_point_id
+from utils import get_collection_name, get_section_point_ids, get_point_uuid, get_content_hash, batched
+from corpus import iter_corpus
+from embedding_store import EmbeddingStore
+from ingest_pipeline import IngestPipeline, IngestCheckpoint
+from encoders import CPUEncoderPool, create_dense_encoder
+from collection_profiles import PROFILES, CollectionProfile, get_profile
+from citation_index import DEFAULT_INDEX_PATH, build_citation_index
+from clause_chunks import iter_clause_records
 
 load_dotenv()
 
 
-batch_size = 128
+# Records per pipeline batch. With token-budgeted encoding this is the window
+# that gets length-sorted, so it is larger than a single encoder batch.
+batch_size = 1024
 model_name = os.getenv("EMBEDDING_MODEL")
-model_kwargs = {"device": "cuda" if torch.cuda.is_available() else "cpu"}
-encode_kwargs = {"convert_to_numpy": True, 
-                "normalize_embeddings": True}
-embedding = HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs, encode_kwargs=encode_kwargs)
-embedding._client.max_seq_length = int(os.getenv("MAX_SEQ_LENGTH"))
-sparse_embedding = SparseTextEmbedding(model_name="Qdrant/bm25")
-
-# client = QdrantClient(path="./qdrant_data")
-client = QdrantClient(host=os.getenv("QDRANT_HOST"), port=os.getenv("QDRANT_PORT"))
-pd_collection = get_collection_name("phapdien", model_name)
-vb_collection = get_collection_name("vbqppl", model_name)
-vector_size = os.getenv("VECTOR_SIZE")
-
-if client.collection_exists(pd_collection):
-    client.delete_collection(pd_collection)
-
-if client.collection_exists(vb_collection):
-    client.delete_collection(vb_collection)
-
-client.create_collection(
-    collection_name=pd_collection,
-    vectors_config={"dense": VectorParams(size=vector_size, distance=Distance.COSINE)},
-    sparse_vectors_config={"sparse": SparseVectorParams(index=SparseIndexParams(on_disk=False))}
-)
-print(f"Created collection: {pd_collection} (Dim: {vector_size})")
-
-with open(os.getenv("PHAPDIEN_DIR") + "/Dieu.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-points = []
-for i in tqdm(range(0, len(data), batch_size), desc="Indexing Phap Dien"):
-    batch_data = data[i:i + batch_size]
-    batch_texts = [f"{item['TEN']}\n{item['NoiDung']}" for item in batch_data]
-    batch_dense_vectors = embedding.embed_documents(batch_texts)
-    batch_sparse_vectors = list(sparse_embedding.embed(batch_texts))
-    
-    for item, dense_vec, sparse_vec in zip(batch_data, batch_dense_vectors, batch_sparse_vectors):
-        points.append(
-            PointStruct(
-                id=str(uuid.uuid4()),
-                vector={
-                    "dense": dense_vec,
-                    "sparse": {
-                        "indices": sparse_vec.indices,
-                        "values": sparse_vec.values
-                    }
-                },
-                payload={
-                    "id": item["ID"],
-                    "source": "phapdien",
-                    "title": f"Pháp điển {item['TEN']}",
-                    "content": item['NoiDung'],
-                    "embed_content": f"{item['TEN']}\n{item['NoiDung']}",
-                    "url": "https://phapdien.moj.gov.vn/TraCuuPhapDien/MainBoPD.aspx"
-                }
-            )
+vector_size = int(os.getenv("VECTOR_SIZE"))
+
+# (point_id, embed_content, payload)
+PointRecord = Tuple[str, str, dict]
+
+# Payload fields used in filters (citation lookups, document-scoped search, clause grouping)
+KEYWORD_INDEX_FIELDS = ("id", "doc_id", "source", "parent_id")
+# Full-text indexed payload fields (law names detected in queries are matched against titles)
+TEXT_INDEX_FIELDS = ("title",)
+
+
+def iter_phapdien_records(path: str) -> Iterator[PointRecord]:
+    """Yield Pháp Điển points from Dieu.json, one điều at a time"""
+    for item in iter_corpus(path):
+        embed_content = f"{item['TEN']}\n{item['NoiDung']}"
+        yield get_point_uuid(item["ID"]), embed_content, {
+            "id": item["ID"],
+            "source": "phapdien",
+            "title": f"Pháp điển {item['TEN']}",
+            "content": item['NoiDung'],
+            "embed_content": embed_content,
+            "content_hash": get_content_hash(embed_content),
+            "url": "https://phapdien.moj.gov.vn/TraCuuPhapDien/MainBoPD.aspx"
+        }
+
+
+def iter_vbqppl_records(path: str) -> Iterator[PointRecord]:
+    """Yield VBQPPL section points, streaming the corpus one document at a time"""
+    for item in iter_corpus(path):
+        id = item.get("id")
+        title = item.get("title")
+        if title == "Unknown Title":
+            title = ""
+        url = item.get("url")
+
+        chunks = item.get("sections") or []
+        point_keys, duplicates = get_section_point_ids(id, chunks)
+        if duplicates:
+            print(f"{id}: {len(duplicates)} hierarchy paths shared by several sections, "
+                  f"numbered to keep them apart (e.g. {duplicates[0]!r})")
+        for chunk, point_key in zip(chunks, point_keys):
+            hierarchy_path = chunk.get("hierarchy_path", "")
+            content = f"{chunk.get('content')}"
+            embed_content = f"{title}\n{hierarchy_path}\n{content}"
+            yield get_point_uuid(point_key), embed_content, {
+                "id": point_key,
+                "doc_id": id,
+                "url": url or "",
+                "source": "vbqppl",
+                "title": title or "",
+                "hierarchy_path": hierarchy_path,
+                "content": content,
+                "embed_content": embed_content,
+                "content_hash": get_content_hash(embed_content)
+            }
+
+
+def ensure_collection(client: QdrantClient, collection_name: str, recreate: bool,
+                      profile: Optional[CollectionProfile] = None, update: bool = False):
+    """
+    Create the collection with the given profile, dropping it first when doing
+    a full rebuild. With update=True an existing collection is switched to the
+    profile's quantization / HNSW / optimizer settings in place. Payload
+    indexes are created if missing.
+    """
+    profile = profile or get_profile()
+    if recreate and client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+
+    if not client.collection_exists(collection_name):
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config=profile.vectors_config(vector_size),
+            sparse_vectors_config=profile.sparse_vectors_config(),
+            quantization_config=profile.quantization_config(),
+            hnsw_config=profile.hnsw_config(),
+            optimizers_config=profile.optimizers_config()
+        )
+        print(f"Created collection: {collection_name} (Dim: {vector_size}, profile {profile.describe()})")
+    elif update:
+        client.update_collection(
+            collection_name=collection_name,
+            vectors_config={"dense": VectorParamsDiff(on_disk=profile.vectors_on_disk)},
+            quantization_config=profile.quantization_config() or Disabled.DISABLED,
+            hnsw_config=profile.hnsw_config(),
+            optimizers_config=profile.optimizers_config()
         )
-        if len(points) >= batch_size:
-            client.upsert(collection_name=pd_collection, points=points)
-            points = []
+        print(f"Updated collection: {collection_name} (profile {profile.describe()})")
 
-if points:
-    client.upsert(collection_name=pd_collection, points=points)
+    ensure_payload_indexes(client, collection_name)
 
-print("Indexed Phap Dien nodes into", pd_collection)
 
-client.create_collection(
-    collection_name=vb_collection,
-    vectors_config={"dense": VectorParams(size=vector_size, distance=Distance.COSINE)},
-    sparse_vectors_config={"sparse": SparseVectorParams(index=SparseIndexParams(on_disk=False))}
-)
-print(f"Created collection: {vb_collection} (Dim: {vector_size})")
-
-with open(os.getenv("VBQPPL"), "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-points = []
-batch_texts = []
-batch_metas = []
-
-for item in tqdm(data, desc="Indexing VBQPPL"):
-    id = item.get("id")
-    title = item.get("title")
-    if title == "Unknown Title":
-        title = ""
-    url = item.get("url")
-
-    chunks = item.get("sections", [])
-    for chunk in chunks:
-        hierarchy_path = chunk.get("hierarchy_path", "")
-        content = f"{chunk.get('content')}"
-        embed_content = f"{title}\n{hierarchy_path}\n{content}"
-        batch_texts.append(embed_content)
-        batch_metas.append({
-            "id": id,
-            "title": title,
-            "url": url,
-            "hierarchy_path": hierarchy_path,
-            "content": content,
-            "embed_content": embed_content
-        })
-        
-        if len(batch_texts) >= batch_size:
-            batch_dense_vectors = embedding.embed_documents(batch_texts)
-            batch_sparse_vectors = list(sparse_embedding.embed(batch_texts))
-            
-            for text, meta, dense_vec, sparse_vec in zip(batch_texts, batch_metas, batch_dense_vectors, batch_sparse_vectors):
-                points.append(
-                    PointStruct(
-                        id=str(uuid.uuid4()),
-                        vector={
-                            "dense": dense_vec,
-                            "sparse": {
-                                "indices": sparse_vec.indices,
-                                "values": sparse_vec.values
-                            }
-                        },
-                        payload={
-                            "id": get_point_id(meta["id"], meta.get("hierarchy_path", "")),
-                            "doc_id": meta["id"],   
-                            "url": meta.get("url", ""),
-                            "source": "vbqppl",
-                            "title": meta.get("title", ""),
-                            "hierarchy_path": meta.get("hierarchy_path", ""),
-                            "content": meta.get("content", ""),
-                            "embed_content": text
-                        }
-                    )
-                )
-            
-            client.upsert(collection_name=vb_collection, points=points)
-            points = []
-            batch_texts = []
-            batch_metas = []
-
-# Process remaining items
-if batch_texts:
-    batch_dense_vectors = embedding.embed_documents(batch_texts)
-    batch_sparse_vectors = list(sparse_embedding.embed(batch_texts))
-    
-    for text, meta, dense_vec, sparse_vec in zip(batch_texts, batch_metas, batch_dense_vectors, batch_sparse_vectors):
-        points.append(
-            PointStruct(
-                id=str(uuid.uuid4()),
-                vector={
-                    "dense": dense_vec,
-                    "sparse": {
-                        "indices": sparse_vec.indices,
-                        "values": sparse_vec.values
-                    }
-                },
-                payload={
-                    "id": get_point_id(meta["id"], meta.get("hierarchy_path", "")),
-                    "doc_id": meta["id"],
-                    "url": meta.get("url", ""),
-                    "source": "vbqppl",
-                    "title": meta.get("title", ""),
-                    "hierarchy_path": meta.get("hierarchy_path", ""),
-                    "content": meta.get("content", ""),
-                    "embed_content": text
-                }
+def ensure_payload_indexes(client: QdrantClient, collection_name: str):
+    """Create payload indexes so filters on id/doc_id/source/title do not scan the collection"""
+    schema = client.get_collection(collection_name).payload_schema or {}
+    text_schema = TextIndexParams(type=TextIndexType.TEXT, tokenizer=TokenizerType.WORD, lowercase=True)
+    for field_name in KEYWORD_INDEX_FIELDS + TEXT_INDEX_FIELDS:
+        if field_name not in schema:
+            client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD if field_name in KEYWORD_INDEX_FIELDS else text_schema
             )
+            print(f"Created payload index on {collection_name}.{field_name}")
+
+
+def load_content_hashes(client: QdrantClient, collection_name: str) -> Dict[str, Optional[str]]:
+    """Scroll the collection and return {point_id: content_hash} (payload only, no vectors)"""
+    hashes = {}
+    offset = None
+    with tqdm(desc=f"Scanning {collection_name}", unit="point") as pbar:
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                limit=1024,
+                offset=offset,
+                with_payload=["content_hash"],
+                with_vectors=False
+            )
+            for point in points:
+                hashes[str(point.id)] = (point.payload or {}).get("content_hash")
+            pbar.update(len(points))
+            if offset is None:
+                break
+    return hashes
+
+
+def index_records(client: QdrantClient, collection_name: str, records: Iterator[PointRecord],
+                  embedding, incremental: bool = False, desc: str = "Indexing",
+                  store: Optional[EmbeddingStore] = None,
+                  checkpoint: Optional[IngestCheckpoint] = None,
+                  upload_workers: int = 4, queue_size: int = 4,
+                  batch_size: int = batch_size):
+    """
+    Embed and upsert records into a collection through the ingestion pipeline.
+
+    In incremental mode, records whose point already exists with the same
+    content hash are skipped, and points no longer present in the corpus are
+    deleted once the corpus has been fully read.
+    """
+    existing = load_content_hashes(client, collection_name) if incremental else {}
+    seen = set()
+    stats = {"upserted": 0, "unchanged": 0, "deleted": 0}
+
+    def changed_records():
+        for record in records:
+            point_id, _, payload = record
+            seen.add(point_id)
+            if existing.get(point_id) == payload["content_hash"]:
+                stats["unchanged"] += 1
+                continue
+            yield record
+
+    pipeline = IngestPipeline(
+        client, collection_name, embedding,
+        batch_size=batch_size, store=store, checkpoint=checkpoint,
+        upload_workers=upload_workers, queue_size=queue_size
+    )
+    stats["upserted"] = pipeline.run(changed_records(), desc=desc)
+    if checkpoint:
+        checkpoint.save(completed=True)
+
+    if incremental:
+        stale_ids = [point_id for point_id in existing if point_id not in seen]
+        for stale_batch in batched(stale_ids, 1024):
+            client.delete(collection_name=collection_name, points_selector=PointIdsList(points=stale_batch))
+        stats["deleted"] = len(stale_ids)
+
+    print(f"{collection_name}: {stats['upserted']} upserted, {stats['unchanged']} unchanged, {stats['deleted']} deleted")
+    if store is not None:
+        print(f"Embedding cache: {len(store)} cached vectors")
+    return stats
+
+
+def ingest_collection(client: QdrantClient, collection_name: str, records: Iterator[PointRecord],
+                      embedding, args, store: Optional[EmbeddingStore] = None, desc: str = "Indexing"):
+    """Create/resume a collection according to the CLI options and index records into it"""
+    checkpoint = None
+    if not args.incremental:
+        # Full rebuilds are resumable; incremental runs resume naturally via content hashes
+        checkpoint = IngestCheckpoint(args.checkpoint, collection_name, resume=args.resume)
+        if checkpoint.completed:
+            print(f"Skipping {collection_name}: already completed according to {args.checkpoint}")
+            return
+        if checkpoint.offset:
+            print(f"Resuming {collection_name} after {checkpoint.offset} records")
+
+    profile = get_profile(args.profile, args.hnsw_m, args.hnsw_ef_construct, args.indexing_threshold)
+    ensure_collection(
+        client, collection_name,
+        recreate=not args.incremental and not (checkpoint and checkpoint.offset),
+        profile=profile,
+        update=args.incremental and args.profile is not None
+    )
+    index_records(
+        client, collection_name, records, embedding,
+        incremental=args.incremental, desc=desc, store=store, checkpoint=checkpoint,
+        upload_workers=args.upload_workers, queue_size=args.queue_size,
+        batch_size=args.batch_size
+    )
+
+
+def add_ingest_arguments(parser: argparse.ArgumentParser):
+    """CLI options shared by the Qdrant ingestion scripts"""
+    parser.add_argument("--incremental", action="store_true",
+                        help="Keep existing collections; only embed new/changed points and delete removed ones")
+    parser.add_argument("--cache-dir", default=os.getenv("EMBEDDING_CACHE_DIR"),
+                        help="Directory of the on-disk embedding cache (disabled if unset)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume an interrupted full rebuild from the checkpoint file")
+    parser.add_argument("--checkpoint", default="./ingest_checkpoint.json",
+                        help="Checkpoint file for resumable full rebuilds")
+    parser.add_argument("--upload-workers", type=int, default=4,
+                        help="Concurrent Qdrant upload requests")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="Batches buffered between pipeline stages")
+    parser.add_argument("--batch-size", type=int, default=batch_size,
+                        help="Records per pipeline batch (window sorted by length before encoding)")
+    parser.add_argument("--token-budget", type=int, default=int(os.getenv("EMBEDDING_TOKEN_BUDGET", 32768)),
+                        help="Max padded tokens per encoder batch; 0 uses fixed-size batches in corpus order")
+    parser.add_argument("--encoder-workers", type=int, default=int(os.getenv("EMBEDDING_WORKERS", 0)),
+                        help="Encode on a pool of N CPU processes (for GPU-less nodes); 0 encodes in-process")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="torch threads per encoder worker (default: cpu_count / workers)")
+    parser.add_argument("--profile", choices=list(PROFILES), default=None,
+                        help="Collection storage/quantization profile (default: COLLECTION_PROFILE or 'default'); "
+                             "with --incremental, applied to the existing collection")
+    parser.add_argument("--hnsw-m", type=int, default=None, help="Override the profile's HNSW m")
+    parser.add_argument("--hnsw-ef-construct", type=int, default=None, help="Override the profile's HNSW ef_construct")
+    parser.add_argument("--indexing-threshold", type=int, default=None,
+                        help="Optimizer indexing_threshold (KB) for the collection")
+
+
+def load_dense_embedding(args):
+    """Load the dense encoder used for ingestion"""
+    max_seq_length = int(os.getenv("MAX_SEQ_LENGTH"))
+    if args.encoder_workers > 0:
+        pool = CPUEncoderPool(
+            model_name, max_seq_length, vector_size, args.encoder_workers,
+            threads_per_worker=args.threads_per_worker,
+            token_budget=args.token_budget or 32768
+        )
+        print(f"Encoding on {pool.workers} CPU workers x {pool.threads_per_worker} threads: {model_name}")
+        return pool
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Loading dense embedding model: {model_name} ({os.getenv('EMBEDDING_BACKEND', 'torch')} backend)")
+    return create_dense_encoder(model_name, max_seq_length, device=device, token_budget=args.token_budget)
+
+
+def open_embedding_store(cache_dir: Optional[str]) -> Optional[EmbeddingStore]:
+    """Open the on-disk embedding cache for the current model settings, if enabled"""
+    if not cache_dir:
+        return None
+    store = EmbeddingStore(
+        cache_dir, model_name, int(os.getenv("MAX_SEQ_LENGTH")), vector_size,
+        dtype=os.getenv("EMBEDDING_CACHE_DTYPE", "float16")
+    )
+    print(f"Using embedding cache: {store.path} ({len(store)} cached vectors)")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest Pháp Điển and VBQPPL into Qdrant")
+    add_ingest_arguments(parser)
+    parser.add_argument("--clauses", action="store_true",
+                        default=os.getenv("CLAUSE_INDEX", "false").lower() in ("1", "true", "yes"),
+                        help="Also index VBQPPL sections as Khoản/Điểm sub-chunks (clause collection)")
+    args = parser.parse_args()
+
+    embedding = load_dense_embedding(args)
+
+    # client = QdrantClient(path="./qdrant_data")
+    client = QdrantClient(host=os.getenv("QDRANT_HOST"), port=os.getenv("QDRANT_PORT"))
+    phapdien_path = os.getenv("PHAPDIEN_DIR") + "/Dieu.json"
+    pd_collection = get_collection_name("phapdien", model_name)
+    vb_collection = get_collection_name("vbqppl", model_name)
+    store = open_embedding_store(args.cache_dir)
+
+    ingest_collection(
+        client, pd_collection, iter_phapdien_records(phapdien_path),
+        embedding, args, store=store, desc="Indexing Phap Dien"
+    )
+    print("Indexed Phap Dien nodes into", pd_collection)
+
+    ingest_collection(
+        client, vb_collection, iter_vbqppl_records(os.getenv("VBQPPL")),
+        embedding, args, store=store, desc="Indexing VBQPPL"
+    )
+    print("Indexed VBQPPL nodes into", vb_collection)
+
+    if args.clauses:
+        clause_collection = get_collection_name("vbqppl_clauses", model_name)
+        ingest_collection(
+            client, clause_collection, iter_clause_records(iter_vbqppl_records(os.getenv("VBQPPL"))),
+            embedding, args, store=store, desc="Indexing VBQPPL clauses"
         )
-    client.upsert(collection_name=vb_collection, points=points)
+        print("Indexed VBQPPL clauses into", clause_collection)
+
+    build_citation_index(phapdien_path, os.getenv("VBQPPL"), os.getenv("CITATION_INDEX", DEFAULT_INDEX_PATH))
+
+    if store is not None:
+        store.close()
+    if isinstance(embedding, CPUEncoderPool):
+        embedding.close()
+    client.close()
 
-print("Indexed VBQPPL nodes into", vb_collection)
 
-client.close()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
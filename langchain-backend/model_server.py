@@ -0,0 +1,311 @@
+"""
+Shared embedding service for multi-worker serving
+
+`uvicorn app:app --workers N` would load the dense encoder and the BM25 model
+in every worker. Instead, one model server process owns the models and the API
+workers reach it over a Unix socket:
+
+    python model_server.py                                   # loads the models once
+    MODEL_SERVER_SOCKET=/tmp/law-rag-models.sock uvicorn app:app --workers 4
+
+Requests are length-prefixed msgpack frames. Texts from concurrent requests
+(any worker, any connection) are collected for up to MODEL_SERVER_MAX_WAIT_MS
+or MODEL_SERVER_MAX_BATCH texts and encoded as one batch (DynamicBatcher), so
+the API tier scales across cores without multiplying model RAM. Reranking
+stays in the workers: it is a Voyage API client and holds no model.
+
+RemoteDenseEncoder / RemoteSparseEncoder are drop-in replacements for the
+local encoders used by RAG (see RAG.load_dense_encoder).
+"""
+import os
+import time
+import socket
+import struct
+import asyncio
+import logging
+import argparse
+import threading
+from dataclasses import dataclass
+from typing import Callable, Iterator, List
+
+import numpy as np
+import ormsgpack
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_SOCKET_PATH = "/tmp/law-rag-models.sock"
+_HEADER = struct.Struct(">I")
+
+
+def _encode_frame(obj) -> bytes:
+    body = ormsgpack.packb(obj)
+    return _HEADER.pack(len(body)) + body
+
+
+# ---- server ----
+
+class DynamicBatcher:
+    """
+    Queue of encode requests. Each batch is started by the first waiting
+    request and closed after max_wait_ms or max_batch_size texts; fn runs on a
+    worker thread, one batch at a time.
+    """
+
+    def __init__(self, name: str, fn: Callable[[List[str]], list], max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0):
+        self.name = name
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.batches = 0
+        self.texts = 0
+        self.requests = 0
+
+    async def submit(self, texts: List[str]) -> list:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((texts, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            n_texts = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while n_texts < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                n_texts += len(item[0])
+
+            texts = [text for request_texts, _ in pending for text in request_texts]
+            try:
+                results = await asyncio.to_thread(self.fn, texts)
+            except Exception as e:
+                logging.error(f"{self.name} batch of {len(texts)} texts failed: {e}")
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(texts)
+            self.requests += len(pending)
+            start = 0
+            for request_texts, future in pending:
+                if not future.done():
+                    future.set_result(results[start:start + len(request_texts)])
+                start += len(request_texts)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class ModelServer:
+    """Owns the dense and BM25 models and serves them over a Unix socket"""
+
+    def __init__(self, socket_path: str, max_batch_size: int, max_wait_ms: float):
+        self.socket_path = socket_path
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.dense = None
+        self.sparse = None
+        self.dim = None
+        self.batchers = {}
+
+    def load_models(self):
+        import torch
+        from fastembed import SparseTextEmbedding
+        from encoders import create_dense_encoder
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        start = time.perf_counter()
+        self.dense = create_dense_encoder(
+            os.getenv("EMBEDDING_MODEL"), int(os.getenv("MAX_SEQ_LENGTH", 512)), device=device
+        )
+        self.sparse = SparseTextEmbedding(model_name="Qdrant/bm25")
+        self.dim = len(self.dense.embed_query("warm-up"))
+        logging.info(f"Models loaded in {time.perf_counter() - start:.1f}s "
+                     f"({os.getenv('EMBEDDING_BACKEND', 'torch')} backend, {device}, dim {self.dim})")
+
+    def _encode_dense(self, texts: List[str]) -> np.ndarray:
+        # Queries and documents share one batcher: the encoders embed queries without an instruction prefix
+        return np.asarray(self.dense.embed_documents(texts), dtype=np.float32)
+
+    def _encode_sparse(self, texts: List[str]) -> list:
+        return [
+            (e.indices.astype(np.int32).tobytes(), e.values.astype(np.float32).tobytes())
+            for e in self.sparse.embed(texts)
+        ]
+
+    async def handle_request(self, request: dict):
+        op = request.get("op")
+        if op == "dense":
+            vectors = await self.batchers["dense"].submit(request["texts"])
+            return {"dim": self.dim, "data": np.ascontiguousarray(vectors).tobytes()}
+        if op == "sparse":
+            return await self.batchers["sparse"].submit(request["texts"])
+        if op == "ping":
+            return {"dim": self.dim, "model": os.getenv("EMBEDDING_MODEL")}
+        if op == "stats":
+            return {name: batcher.stats() for name, batcher in self.batchers.items()}
+        raise ValueError(f"Unknown op '{op}'")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                header = await reader.readexactly(_HEADER.size)
+                request = ormsgpack.unpackb(await reader.readexactly(_HEADER.unpack(header)[0]))
+                try:
+                    response = {"result": await self.handle_request(request)}
+                except Exception as e:
+                    response = {"error": str(e)}
+                writer.write(_encode_frame(response))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self.batchers = {
+            "dense": DynamicBatcher("dense", self._encode_dense, self.max_batch_size, self.max_wait_ms),
+            "sparse": DynamicBatcher("sparse", self._encode_sparse, self.max_batch_size, self.max_wait_ms),
+        }
+        tasks = [asyncio.create_task(b.run()) for b in self.batchers.values()]
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self.handle_connection, path=self.socket_path)
+        logging.info(f"Model server listening on {self.socket_path} "
+                     f"(max batch {self.max_batch_size}, max wait {self.max_wait_ms} ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+# ---- client ----
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+class ModelServerClient:
+    """Blocking client; each thread keeps its own connection (RAG runs searches in threads)"""
+
+    def __init__(self, socket_path: str = None, timeout: float = 60.0):
+        self.socket_path = socket_path or os.getenv("MODEL_SERVER_SOCKET", DEFAULT_SOCKET_PATH)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(self.socket_path)
+            self._local.conn = conn
+        return conn
+
+    def _recv_exactly(self, conn: socket.socket, n: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = conn.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("Model server closed the connection")
+            buf += chunk
+        return bytes(buf)
+
+    def call(self, op: str, **kwargs):
+        conn = self._connection()
+        try:
+            conn.sendall(_encode_frame({"op": op, **kwargs}))
+            size = _HEADER.unpack(self._recv_exactly(conn, _HEADER.size))[0]
+            response = ormsgpack.unpackb(self._recv_exactly(conn, size))
+        except (OSError, ConnectionError):
+            # Drop the broken connection; the next call reconnects
+            conn.close()
+            self._local.conn = None
+            raise
+        if "error" in response:
+            raise ModelServerError(response["error"])
+        return response["result"]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RemoteDenseEncoder:
+    """embed_query / embed_documents through the model server"""
+
+    def __init__(self, client: ModelServerClient):
+        self.client = client
+        self.dim = client.call("ping")["dim"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        result = self.client.call("dense", texts=list(texts))
+        return np.frombuffer(result["data"], dtype=np.float32).reshape(-1, result["dim"]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+@dataclass
+class SparseResult:
+    indices: np.ndarray
+    values: np.ndarray
+
+
+class RemoteSparseEncoder:
+    """BM25 `embed(texts)` through the model server, same result shape as fastembed"""
+
+    def __init__(self, client: ModelServerClient):
+        self.client = client
+        client.call("ping")
+
+    def embed(self, texts: List[str]) -> Iterator[SparseResult]:
+        for indices, values in self.client.call("sparse", texts=list(texts)):
+            yield SparseResult(np.frombuffer(indices, dtype=np.int32), np.frombuffer(values, dtype=np.float32))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Shared embedding model server (Unix socket, dynamic batching)")
+    parser.add_argument("--socket", default=os.getenv("MODEL_SERVER_SOCKET", DEFAULT_SOCKET_PATH))
+    parser.add_argument("--max-batch-size", type=int, default=int(os.getenv("MODEL_SERVER_MAX_BATCH", 64)),
+                        help="Max texts per encoder batch")
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("MODEL_SERVER_MAX_WAIT_MS", 5)),
+                        help="How long a batch waits for more requests")
+    args = parser.parse_args()
+
+    server = ModelServer(args.socket, args.max_batch_size, args.max_wait_ms)
+    server.load_models()
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
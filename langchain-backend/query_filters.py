@@ -0,0 +1,117 @@
+"""
+Detect document references in user queries and turn them into Qdrant filters
+
+Users often scope a question to a specific document ("theo Luật Thanh niên
+2020...", "Nghị định 15/2020/NĐ-CP quy định..."). Document numbers are matched
+with the same patterns the crawler uses to extract VBQPPL IDs
+(HTMLFetcher.extract_document_id) and become a filter on `doc_id`; law names
+introduced by one of the ReferenceParser document types become a full-text
+filter on `title`. RAG.retrieve falls back to unfiltered search when the
+filtered search finds too little.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from qdrant_client.models import FieldCondition, Filter, MatchAny, MatchText
+
+_UPPER = "A-ZĐÀÁẢÃẠĂẰẮẲẴẶÂẦẤẨẪẬÈÉẺẼẸÊỀẾỂỄỆÌÍỈĨỊÒÓỎÕỌÔỒỐỔỖỘƠỜỚỞỠỢÙÚỦŨỤƯỪỨỬỮỰỲÝỶỸỴ"
+
+# Same patterns as law-crawler/vbqppl_crawler.py HTMLFetcher.extract_document_id (most specific first)
+DOC_NUMBER_PATTERNS = [
+    # Multi-part IDs with hyphens: e.g., 127/2007/TTLT-BQP-CCBVN
+    rf'(\d+/\d{{4}}/[{_UPPER}]+(?:-[{_UPPER}0-9]+)+)',
+    # IDs with suffix numbers: e.g., 13/2018/QH14, 65/2014/QH13
+    rf'(\d+/\d{{4}}/[{_UPPER}]+\d+)',
+    # Simple IDs: e.g., 15/2020/NĐ-CP
+    rf'(\d+/\d{{4}}/[{_UPPER}]+-[{_UPPER}]+)',
+    # Fallback: Simple alphanumeric pattern
+    r'(\d+/\d{4}/[A-Z]+(?:-[A-Z0-9]+)*)',
+]
+
+# Document types from law-crawler/qa_dataset_crawler.py ReferenceParser.DOC_TYPES,
+# longest first so "Bộ luật" wins over "Luật"
+DOC_TYPES = sorted([
+    "Luật", "Bộ luật", "Nghị quyết", "Nghị định", "Thông tư",
+    "Quyết định", "Pháp lệnh", "Hiến pháp", "Chỉ thị", "Công văn"
+], key=len, reverse=True)
+
+# Words that end a law name in free text ("Luật Đất đai quy định ...")
+_NAME_STOP_WORDS = {
+    "quy", "thì", "có", "là", "về", "được", "như", "không", "năm", "số", "hiện", "hành",
+    "mới", "nhất", "này", "đó", "nào", "khi", "nếu", "cho", "với", "và", "hay", "hoặc",
+    "thế", "gì", "sao", "bao", "phải", "ra", "đã", "sẽ", "đang", "theo", "tại", "trong",
+}
+_MAX_NAME_WORDS = 6
+
+_DOC_TYPE_RE = re.compile(
+    r'(?<!pháp\s)\b(' + '|'.join(re.escape(t) for t in DOC_TYPES) + r')\s+',
+    re.IGNORECASE
+)
+_NAME_WORD_RE = re.compile(r'[^\s,.;:?!()"“”]+|[,.;:?!()"“”]')
+
+
+@dataclass
+class DocumentRefs:
+    doc_numbers: List[str] = field(default_factory=list)
+    law_names: List[str] = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.doc_numbers or self.law_names)
+
+
+def extract_doc_numbers(text: str) -> List[str]:
+    """All document numbers in text (e.g. 15/2020/NĐ-CP), normalized to upper case"""
+    found = []
+    taken = []
+    for pattern in DOC_NUMBER_PATTERNS:
+        for m in re.finditer(pattern, text, re.IGNORECASE):
+            # Skip matches inside a longer number found by a more specific pattern
+            if any(s <= m.start() and m.end() <= e for s, e in taken):
+                continue
+            taken.append(m.span())
+            number = m.group(1).upper()
+            if number not in found:
+                found.append(number)
+    return found
+
+
+def extract_law_names(text: str) -> List[str]:
+    """
+    Law names introduced by a document type, e.g. "Luật Thanh niên" from
+    "theo Luật Thanh niên 2020 thì ...". The name must start with a capital
+    letter (so "pháp luật hiện hành" is not a reference) and is cut at
+    punctuation, digits or common function words.
+    """
+    names = []
+    for m in _DOC_TYPE_RE.finditer(text):
+        words = []
+        for word in _NAME_WORD_RE.findall(text, m.end()):
+            if (len(word) == 1 and not word.isalnum()) or word.lower() in _NAME_STOP_WORDS \
+                    or any(ch.isdigit() for ch in word) or len(words) >= _MAX_NAME_WORDS:
+                break
+            words.append(word)
+        # The name itself must start with a capital ("Luật Đất đai", not "luật này")
+        if words and words[0][0].isupper():
+            name = f"{m.group(1)} {' '.join(words)}"
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def detect_document_refs(query: str) -> DocumentRefs:
+    doc_numbers = extract_doc_numbers(query)
+    law_names = [] if doc_numbers else extract_law_names(query)
+    return DocumentRefs(doc_numbers=doc_numbers, law_names=law_names)
+
+
+def build_document_filter(refs: DocumentRefs) -> Optional[Filter]:
+    """Filter matching any referenced document: exact doc_id or all words of a law name in the title"""
+    conditions = []
+    if refs.doc_numbers:
+        conditions.append(FieldCondition(key="doc_id", match=MatchAny(any=refs.doc_numbers)))
+    for name in refs.law_names:
+        conditions.append(FieldCondition(key="title", match=MatchText(text=name)))
+    if not conditions:
+        return None
+    return Filter(should=conditions)
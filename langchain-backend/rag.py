@@ -1,79 +1,208 @@
 import os
-import torch
 import logging
-from typing import Any, List
+from typing import Any, List, Optional
 from dotenv import load_dotenv
 import asyncio
 from qdrant_client import QdrantClient
-from qdrant_client.models import Prefetch, SparseVector, Fusion, FusionQuery, Filter, FieldCondition, MatchAny
-from langchain_huggingface import HuggingFaceEmbeddings
-from fastembed import SparseTextEmbedding
-import voyageai
+from qdrant_client.models import Prefetch, SparseVector, Fusion, FusionQuery, Filter, FieldCondition, MatchAny, SearchParams
 
-from utils import get_collection_name, get_point_id
+from utils import get_collection_name, get_point_id, get_point_uuid
+from encoders import create_dense_encoder
+from collection_profiles import search_params_from_env
+from query_filters import build_document_filter, detect_document_refs
+from citation_index import CitationIndex, DEFAULT_INDEX_PATH
+from clause_chunks import pack_clause_group
+from diversify import diversify_sources, mmr_settings_from_env, strip_vector
+from model_server import ModelServerClient, RemoteDenseEncoder, RemoteSparseEncoder
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
 class RAG:
-    def __init__(self):
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        logging.info(f"RAG Device: {self.device}")
-        
-        # Init Qdrant
+    # Heavy components, loaded by load_components() or one by one (app.py loads them in the background)
+    COMPONENTS = ("qdrant", "dense_encoder", "sparse_encoder", "reranker", "citation_index")
+
+    def __init__(self, lazy: bool = False):
+        # Init Qdrant (the client connects on first request)
         self.qdrant_client = QdrantClient(
             host=os.getenv("QDRANT_HOST"), 
             port=int(os.getenv("QDRANT_PORT"))
         )
         
-        # Init Dense Embedding
-        embedding_name = os.getenv("EMBEDDING_MODEL")
-        model_kwargs = {"device": self.device}
-        encode_kwargs = {"convert_to_numpy": True, "normalize_embeddings": True}
-        self.embedding = HuggingFaceEmbeddings(
-            model_name=embedding_name, 
-            model_kwargs=model_kwargs, 
-            encode_kwargs=encode_kwargs
-        )
-        # Fix max length explicitly if needed, or rely on model default
-        self.embedding._client.max_seq_length = int(os.getenv("MAX_SEQ_LENGTH", 512))
-        
-        # Init Sparse Embedding
-        self.sparse_embedding = SparseTextEmbedding(model_name="Qdrant/bm25")
-        
         # Collection Names
-        self.pd_collection_name = get_collection_name("phapdien", embedding_name)
-        self.vb_collection_name = get_collection_name("vbqppl", embedding_name)
+        self.embedding_name = os.getenv("EMBEDDING_MODEL")
+        self.pd_collection_name = get_collection_name("phapdien", self.embedding_name)
+        self.vb_collection_name = get_collection_name("vbqppl", self.embedding_name)
         self.alqac25_collection_name = "alqac25_collection"
 
-        # Init Reranker
+        # Dense search params for quantized collections (QDRANT_RESCORE / QDRANT_OVERSAMPLING / QDRANT_HNSW_EF)
+        self.search_params = search_params_from_env()
+
+        # Document-scoped search when the query names a document (see query_filters.py)
+        self.auto_filter = os.getenv("QUERY_FILTER", "true").lower() in ("1", "true", "yes")
+        self.filter_min_results = int(os.getenv("QUERY_FILTER_MIN_RESULTS", 3))
+
+        # Clause-level search on VBQPPL (collection built by ingest_qdrant.py --clauses)
+        self.clause_search = os.getenv("CLAUSE_SEARCH", "false").lower() in ("1", "true", "yes")
+        self.clause_group_size = int(os.getenv("CLAUSE_GROUP_SIZE", 3))
+        self.clause_collections = {
+            self.vb_collection_name: get_collection_name("vbqppl_clauses", self.embedding_name)
+        }
+
+        # MMR / near-duplicate collapse of merged candidates before reranking (see diversify.py)
+        self.mmr_enabled, self.mmr_lambda, self.mmr_dup_threshold, self.mmr_top_n = mmr_settings_from_env()
+
+        # Multi-worker serving: encoders live in model_server.py, reached over MODEL_SERVER_SOCKET
+        self.model_server_client = None
+        if os.getenv("MODEL_SERVER_SOCKET"):
+            self.model_server_client = ModelServerClient(os.getenv("MODEL_SERVER_SOCKET"))
+
+        self.device = None
+        self.embedding = None
+        self.sparse_embedding = None
+        self.voyage_client = None
+        self.citation_index = None
+
+        # Reranker model name
         self.rerank_model_name = os.getenv("RERANKING_MODEL", "rerank-2")
         if "/" in self.rerank_model_name:
              logging.warning(f"RERANKING_MODEL ({self.rerank_model_name}) looks like a path/RepoID. Voyage requires a model name (e.g. 'rerank-2'). Defaulting to 'rerank-2'.")
              self.rerank_model_name = "rerank-2"
-        
+
+        if not lazy:
+            self.load_components()
+            logging.info("RAG Components Initialized Successfully.")
+
+    def load_components(self):
+        for name in self.COMPONENTS:
+            self.load_component(name)
+
+    def load_component(self, name: str):
+        getattr(self, f"load_{name}")()
+
+    def load_qdrant(self):
+        # Fails if Qdrant is unreachable
+        self.qdrant_client.get_collections()
+
+    def load_dense_encoder(self):
+        if self.model_server_client is not None:
+            self.embedding = RemoteDenseEncoder(self.model_server_client)
+            logging.info(f"Dense encoder: model server at {self.model_server_client.socket_path}")
+            return
+
+        import torch
+
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        logging.info(f"RAG Device: {self.device}")
+        # EMBEDDING_BACKEND: torch (default) | onnx | onnx-int8 (see encoders.py)
+        self.embedding = create_dense_encoder(
+            self.embedding_name,
+            int(os.getenv("MAX_SEQ_LENGTH", 512)),
+            device=self.device
+        )
+        logging.info(f"Dense encoder backend: {os.getenv('EMBEDDING_BACKEND', 'torch')}")
+
+    def load_sparse_encoder(self):
+        if self.model_server_client is not None:
+            self.sparse_embedding = RemoteSparseEncoder(self.model_server_client)
+            return
+
+        from fastembed import SparseTextEmbedding
+
+        self.sparse_embedding = SparseTextEmbedding(model_name="Qdrant/bm25")
+
+    def load_reranker(self):
+        import voyageai
+
         self.voyage_client = voyageai.Client(api_key=os.getenv("VOYAGE_API_KEY"))
-        logging.info("RAG Components Initialized Successfully.")
 
-    def _query_collection(self, collection_name: str, dense_vec: List[float], sparse_vec: SparseVector, top_k: int):
+    def load_citation_index(self):
+        # Exact-citation lookups ("Điều 36 Bộ luật Lao động"), built by ingest_qdrant.py
+        citation_index_path = os.getenv("CITATION_INDEX", DEFAULT_INDEX_PATH)
+        if os.path.exists(citation_index_path):
+            self.citation_index = CitationIndex.load(citation_index_path)
+            logging.info(f"Loaded citation index with {len(self.citation_index)} keys")
+        else:
+            logging.warning(f"Citation index not found at {citation_index_path}; exact citation lookup disabled")
+
+    def _query_collection(self, collection_name: str, dense_vec: List[float], sparse_vec: SparseVector, top_k: int,
+                          search_params: Optional[SearchParams] = None, query_filter: Optional[Filter] = None,
+                          with_vectors: bool = False):
         """Helper to query a single collection with Hybrid Search (RRF)"""
         try:
             return self.qdrant_client.query_points(
                 collection_name=collection_name,
                 prefetch=[
-                    Prefetch(query=dense_vec, using="dense", limit=top_k * 5),
-                    Prefetch(query=sparse_vec, using="sparse", limit=top_k * 5)
+                    Prefetch(query=dense_vec, using="dense", limit=top_k * 5,
+                             params=search_params or self.search_params, filter=query_filter),
+                    Prefetch(query=sparse_vec, using="sparse", limit=top_k * 5, filter=query_filter)
                 ],
                 query=FusionQuery(fusion=Fusion.RRF),
-                limit=top_k
+                query_filter=query_filter,
+                limit=top_k,
+                with_vectors=["dense"] if with_vectors else False
             ).points
         except Exception as e:
             logging.warning(f"Failed to query collection {collection_name}: {e}")
             return []
 
-    def retrieve(self, query: str, top_k: int = 5, collection_names: List[str] = None) -> List[dict[str, Any]]:
+    def _query_clause_groups(self, collection_name: str, dense_vec: List[float], sparse_vec: SparseVector,
+                             top_k: int, query_filter: Optional[Filter] = None, with_vectors: bool = False):
+        """Hybrid search over clause sub-chunks, grouped by parent section (None if the collection is unusable)"""
+        try:
+            return self.qdrant_client.query_points_groups(
+                collection_name=collection_name,
+                prefetch=[
+                    Prefetch(query=dense_vec, using="dense", limit=top_k * self.clause_group_size * 5,
+                             params=self.search_params, filter=query_filter),
+                    Prefetch(query=sparse_vec, using="sparse", limit=top_k * self.clause_group_size * 5,
+                             filter=query_filter)
+                ],
+                query=FusionQuery(fusion=Fusion.RRF),
+                query_filter=query_filter,
+                group_by="parent_id",
+                group_size=self.clause_group_size,
+                limit=top_k,
+                with_vectors=["dense"] if with_vectors else False
+            ).groups
+        except Exception as e:
+            logging.warning(f"Failed to query clause collection {collection_name}, using sections: {e}")
+            return None
+
+    @staticmethod
+    def _point_to_source(point, with_vectors: bool = False) -> dict[str, Any]:
+        payload = point.payload
+        source = {
+            "id": payload.get("id", ""),
+            "doc_id": payload.get("doc_id", ""),
+            "article_id": payload.get("article_id", ""),
+            "title": payload.get("title", ""),
+            "hierarchy_path": payload.get("hierarchy_path", ""),
+            "url": payload.get("url", "#"),
+            "content": payload.get("content", ""),
+            "score": point.score,
+            "source": payload.get("source", "")
+        }
+        if with_vectors and point.vector:
+            source["vector"] = point.vector.get("dense") if isinstance(point.vector, dict) else point.vector
+        return source
+
+    def retrieve(self, query: str, top_k: int = 5, collection_names: List[str] = None,
+                 doc_ids: Optional[List[str]] = None, auto_filter: bool = True,
+                 with_vectors: bool = False, clause_level: Optional[bool] = None,
+                 query_vec: Optional[List[float]] = None) -> List[dict[str, Any]]:
+        """
+        Hybrid search over the given collections. If doc_ids is set, only
+        sections of those documents are searched (indexed doc_id filter).
+        Otherwise, document numbers / law names detected in the query restrict
+        the search, falling back to unfiltered results when too few match.
+        With with_vectors, each source carries its dense "vector" (for diversify).
+        With clause_level (default CLAUSE_SEARCH), VBQPPL is searched on its
+        clause sub-chunks and each section only contains the matched clauses.
+        query_vec is the dense vector of query if the caller already has it.
+        """
         # 1. Embed Query
-        dense_vec = self.embedding.embed_query(query)
+        dense_vec = query_vec if query_vec is not None else self.embedding.embed_query(query)
         sparse_gen = self.sparse_embedding.embed([query])
         sparse_emb = next(sparse_gen)
         sparse_vec = SparseVector(
@@ -87,39 +216,78 @@ class RAG:
         else:
             collections = [self.vb_collection_name] # Default to vbqppl for now
 
+        query_filter = None
+        detected = False
+        if doc_ids:
+            query_filter = Filter(must=[FieldCondition(key="doc_id", match=MatchAny(any=list(doc_ids)))])
+        elif auto_filter and self.auto_filter:
+            refs = detect_document_refs(query)
+            query_filter = build_document_filter(refs)
+            detected = query_filter is not None
+            if detected:
+                logging.info(f"Detected document references: {refs}")
+
+        use_clauses = self.clause_search if clause_level is None else clause_level
+
+        def search(coll, query_filter=None):
+            clause_collection = self.clause_collections.get(coll) if use_clauses else None
+            if clause_collection:
+                groups = self._query_clause_groups(clause_collection, dense_vec, sparse_vec, top_k,
+                                                   query_filter=query_filter, with_vectors=with_vectors)
+                if groups is not None:
+                    return [s for s in (pack_clause_group(g, with_vectors) for g in groups) if s]
+            points = self._query_collection(coll, dense_vec, sparse_vec, top_k, query_filter=query_filter,
+                                            with_vectors=with_vectors)
+            return [self._point_to_source(p, with_vectors) for p in points]
+
         results = []
         for coll in collections:
-            results.extend(self._query_collection(coll, dense_vec, sparse_vec, top_k))
+            found = search(coll, query_filter)
+            if detected and len(found) < min(top_k, self.filter_min_results):
+                # Reference not found in this collection (or too specific): widen to unfiltered search
+                found_ids = {s["id"] for s in found}
+                unfiltered = search(coll)
+                found = (found + [s for s in unfiltered if s["id"] not in found_ids])[:top_k]
+            results.extend(found)
 
-        # 3. Standardize results
+        # 3. Standardize results (exact citation matches first)
         sources = []
         seen_point_ids = set()
 
-        for point in results:
-            payload = point.payload
-            
-            id = payload.get("id", "")
+        if self.citation_index is not None:
+            cited_ids = self.citation_index.lookup(query)
+            if cited_ids:
+                for doc in self.get_documents_by_ids(cited_ids, collection_names=collections):
+                    if doc_ids and doc["doc_id"] not in doc_ids:
+                        continue
+                    doc["score"] = 1.0
+                    doc["citation_match"] = True
+                    sources.append(doc)
+                    seen_point_ids.add(doc["id"])
+
+        for source in results:
             # Deduplication
-            if id in seen_point_ids:
+            if source["id"] in seen_point_ids:
                 continue
-            seen_point_ids.add(id)
-
-            sources.append({
-                "id": id,
-                "doc_id": payload.get("doc_id", ""),
-                "article_id": payload.get("article_id", ""),
-                "title": payload.get("title", ""),
-                "hierarchy_path": payload.get("hierarchy_path", ""),
-                "url": payload.get("url", "#"),
-                "content": payload.get("content", ""),
-                "score": point.score,
-                "source": payload.get("source", "")
-            })
+            seen_point_ids.add(source["id"])
+            sources.append(source)
         
         return sources
         # 4. Rerank
         # return self.rerank(query, sources, top_k=top_k)
 
+    def diversify(self, query_vec: List[float], sources: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        MMR + near-duplicate collapse over sources from retrieve(with_vectors=True); drops the vectors.
+        query_vec is the dense query vector the sources were retrieved with (no second encode).
+        """
+        if not self.mmr_enabled or not sources:
+            return [strip_vector(s) for s in sources]
+        return diversify_sources(
+            query_vec, sources, top_n=self.mmr_top_n,
+            lambda_mult=self.mmr_lambda, dup_threshold=self.mmr_dup_threshold
+        )
+
     def rerank(self, query: str, sources: list[dict[str, Any]], top_k: int = 5) -> list[dict[str, Any]]:
         if not sources:
             return []
@@ -167,28 +335,42 @@ class RAG:
         def fetch(collection, id_list):
             if not id_list: return []
             try:
-                # Use scroll to retrieve points filtering by 'id' payload field
-                points, _ = self.qdrant_client.scroll(
+                # Point IDs are derived from the payload ID, so most lookups are direct retrieves
+                points = self.qdrant_client.retrieve(
+                    collection_name=collection,
+                    ids=[get_point_uuid(i) for i in id_list],
+                    with_payload=True,
+                    with_vectors=False
+                )
+                found = {p.payload.get("id") for p in points}
+                missing = [i for i in id_list if i not in found]
+                if not missing:
+                    return points
+                # Fallback for collections ingested with random point IDs (indexed payload filter)
+                scrolled, _ = self.qdrant_client.scroll(
                     collection_name=collection,
                     scroll_filter=Filter(
                         must=[
                             FieldCondition(
                                 key="id",
-                                match=MatchAny(any=id_list)
+                                match=MatchAny(any=missing)
                             )
                         ]
                     ),
-                    limit=len(id_list),
+                    limit=len(missing),
                     with_payload=True,
                     with_vectors=False
                 )
-                return points
+                return points + scrolled
             except Exception as e:
                 logging.error(f"Error fetching docs from {collection}: {e}")
                 return []
 
+        remaining = list(ids)
         for coll in target_collections:
-            points = fetch(coll, ids)
+            points = fetch(coll, remaining)
+            found = {point.payload.get("id") for point in points}
+            remaining = [i for i in remaining if i not in found]
             for point in points:
                 payload = point.payload
                 results.append({
@@ -213,4 +395,6 @@ class RAG:
         return unique_results
 
     def close(self):
-        self.qdrant_client.close()
\ No newline at end of file
+        self.qdrant_client.close()
+        if self.model_server_client is not None:
+            self.model_server_client.close()
\ No newline at end of file
@@ -1,5 +1,10 @@
 import re
+import uuid
 import hashlib
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple, TypeVar
+
+T = TypeVar("T")
 
 
 def slugify_model_name(model_name: str) -> str:
@@ -25,6 +30,42 @@ def get_point_id(doc_id: str, hierarchy_path: str) -> str:
     return hashlib.md5(raw_combination.encode('utf-8')).hexdigest()
 
 
+def get_section_point_ids(doc_id: str, sections: List[dict]) -> Tuple[List[str], List[str]]:
+    """
+    Point IDs for the sections of one VBQPPL document, plus the hierarchy paths
+    that occur more than once. The first section with a path keeps
+    get_point_id(doc_id, path); later ones get an ordinal suffix ("path #2") so
+    they do not overwrite each other.
+    """
+    ids, duplicates, counts = [], [], {}
+    for section in sections:
+        hierarchy_path = section.get("hierarchy_path", "")
+        counts[hierarchy_path] = counts.get(hierarchy_path, 0) + 1
+        if counts[hierarchy_path] == 1:
+            ids.append(get_point_id(doc_id, hierarchy_path))
+        else:
+            ids.append(get_point_id(doc_id, f"{hierarchy_path} #{counts[hierarchy_path]}"))
+            if counts[hierarchy_path] == 2:
+                duplicates.append(hierarchy_path)
+    return ids, duplicates
+
+
+def get_point_uuid(point_key: str) -> str:
+    """
+    Convert a payload ID (MD5 hex from get_point_id/get_alqac_point_id, or a
+    Pháp Điển UUID) into a deterministic Qdrant point ID.
+    """
+    try:
+        return str(uuid.UUID(str(point_key)))
+    except ValueError:
+        return str(uuid.UUID(hashlib.md5(str(point_key).encode('utf-8')).hexdigest()))
+
+
+def get_content_hash(text: str) -> str:
+    """SHA-256 of the embedded text, used to detect changed points on re-ingestion."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
 def get_alqac_point_id(doc_id: str, article_id: str) -> str:
     """
     Generate unique point ID (MD5 Hash) for ALQAC-2025 collection.
@@ -33,4 +74,14 @@ def get_alqac_point_id(doc_id: str, article_id: str) -> str:
     safe_doc_id = str(doc_id) if doc_id else "unknown_doc"
     safe_article_id = str(article_id) if article_id else "unknown_article"
     raw_combination = f"{safe_doc_id}_{safe_article_id}"
-    return hashlib.md5(raw_combination.encode('utf-8')).hexdigest()
\ No newline at end of file
+    return hashlib.md5(raw_combination.encode('utf-8')).hexdigest()
+
+
+def batched(iterable: Iterable[T], n: int) -> Iterator[List[T]]:
+    """Yield successive lists of up to n items from any iterable (lazily)."""
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, n))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,293 @@
+"""
+Asyncio fetch engine for HTMLFetcher (--engine async)
+
+The threaded engine paces requests with time.sleep in every worker thread, so
+the request rate is a side effect of the thread count. This engine runs the
+same search + fetch steps as HTMLFetcher.fetch_and_save on a few coroutines
+sharing one httpx client (HTTP/2, keep-alive) and paces them explicitly:
+
+- a token bucket per host limits requests to `rate` requests/sec
+- a semaphore bounds the number of documents in flight (`concurrency`)
+- 429 and 5xx responses halve the host's rate (and honour Retry-After);
+  successful responses raise it back towards the configured rate
+"""
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from tqdm import tqdm
+
+from vbqppl_crawler import HTMLFetcher, FetchResult
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Requests/sec limiter for one host with multiplicative slow-down and additive recovery"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, min_rate: Optional[float] = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def slow_down(self, retry_after: Optional[float] = None):
+        self.rate = max(self.min_rate, self.rate / 2)
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def success(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header in seconds (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncFetchEngine:
+    """Fetch documents for an HTMLFetcher with asyncio + httpx"""
+
+    def __init__(self, fetcher: HTMLFetcher, rate: float = 10.0, concurrency: int = 8,
+                 max_retries: int = 3, http2: bool = True, timeout: float = 30.0):
+        """
+        Args:
+            fetcher: HTMLFetcher (or subclass) providing IDs, filenames and search parsing
+            rate: Max requests/sec per host
+            concurrency: Max documents in flight
+            max_retries: Retries per request on 429/5xx and transport errors
+        """
+        self.fetcher = fetcher
+        self.rate = rate
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.http2 = http2
+        self.timeout = timeout
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.stats = {"requests": 0, "throttled": 0, "transport_errors": 0}
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate)
+        return self.buckets[host]
+
+    async def _get(self, client: httpx.AsyncClient, url: str, params: Optional[dict] = None,
+                   headers: Optional[dict] = None) -> httpx.Response:
+        bucket = self._bucket(url)
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            self.stats["requests"] += 1
+            try:
+                response = await client.get(url, params=params, headers=headers)
+            except httpx.TransportError as e:
+                self.stats["transport_errors"] += 1
+                if attempt == self.max_retries:
+                    raise
+                bucket.slow_down(2 ** attempt)
+                logger.warning(f"Transport error on {url} ({e}), retrying")
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                self.stats["throttled"] += 1
+                retry_after = parse_retry_after(response.headers.get("Retry-After")) or 2 ** attempt
+                bucket.slow_down(retry_after)
+                logger.warning(f"HTTP {response.status_code} on {url}, slowing {urlsplit(url).netloc} "
+                               f"to {bucket.rate:.2f} req/s")
+                continue
+
+            bucket.success()
+            if response.status_code == 304:
+                # Conditional GET: not modified (httpx treats any non-2xx as an error)
+                return response
+            response.raise_for_status()
+            return response
+
+    async def search_document(self, client: httpx.AsyncClient, doc_id: str) -> Optional[str]:
+        try:
+            response = await self._get(client, self.fetcher.SEARCH_URL, params={'Keywords': doc_id})
+            # BeautifulSoup parsing is CPU-bound; keep it off the event loop
+            doc_url = await asyncio.to_thread(self.fetcher.parse_search_results, response.content)
+        except Exception as e:
+            logger.error(f"Error searching for document {doc_id}: {e}")
+            return None
+        if self.fetcher.resolve_cache is not None:
+            self.fetcher.resolve_cache.put(doc_id, doc_url)
+        return doc_url
+
+    async def fetch_and_save(self, client: httpx.AsyncClient, doc_id: str, vbqppl: Dict[str, Any]) -> FetchResult:
+        """Same steps and results as HTMLFetcher.fetch_and_save, without sleeps"""
+        name = vbqppl.get('name', '')
+        original_link = vbqppl.get('link', '')
+
+        filename = self.fetcher._generate_filename(doc_id)
+        store = self.fetcher.store
+        html_path = store.ref(filename)
+        if store.exists(filename) and self.fetcher.refresh:
+            return await self.refresh_and_save(client, doc_id, filename, name, original_link)
+        if store.exists(filename):
+            logger.info(f"Already fetched: {doc_id}")
+            return FetchResult(doc_id=doc_id, url="", html_path=html_path, status="cached",
+                               original_name=name, original_link=original_link)
+
+        resolved = self.fetcher.lookup_resolved(doc_id)
+        if resolved is not None:
+            doc_url = resolved.url
+        else:
+            logger.info(f"Searching for: {doc_id}")
+            doc_url = await self.search_document(client, doc_id)
+        if not doc_url:
+            return FetchResult(doc_id=doc_id, url="", html_path=None, status="not_found",
+                               error_message="Document not found in search results" + (" (cached)" if resolved else ""),
+                               original_name=name, original_link=original_link)
+
+        try:
+            response = await self._get(client, doc_url)
+            await asyncio.to_thread(self.fetcher.save_page, doc_id, doc_url, filename, response.text,
+                                    response.headers, 'new')
+            logger.info(f"Saved HTML: {doc_id} -> {filename}")
+            return FetchResult(doc_id=doc_id, url=doc_url, html_path=html_path, status="success",
+                               original_name=name, original_link=original_link)
+        except Exception as e:
+            logger.error(f"Error fetching {doc_id}: {e}")
+            if resolved is not None:
+                self.fetcher.resolve_cache.invalidate(doc_id)
+            return FetchResult(doc_id=doc_id, url=doc_url, html_path=None, status="error",
+                               error_message=str(e), original_name=name, original_link=original_link)
+
+    async def refresh_and_save(self, client: httpx.AsyncClient, doc_id: str, filename: str, name: str,
+                               original_link: str) -> FetchResult:
+        """Same steps and results as HTMLFetcher.refresh_and_save"""
+        html_path = self.fetcher.store.ref(filename)
+
+        def kept(message: str) -> FetchResult:
+            return FetchResult(doc_id=doc_id, url="", html_path=html_path, status="cached",
+                               error_message=message, original_name=name, original_link=original_link)
+
+        resolved = self.fetcher.lookup_resolved(doc_id)
+        if resolved is not None and resolved.url:
+            doc_url = resolved.url
+        else:
+            resolved = None
+            doc_url = await self.search_document(client, doc_id)
+            if not doc_url:
+                return kept("Refresh skipped: document not found in search results")
+
+        try:
+            response = await self._get(client, doc_url, headers=self.fetcher.conditional_headers(resolved))
+            if response.status_code == 304:
+                logger.info(f"Not modified: {doc_id}")
+                return FetchResult(doc_id=doc_id, url=doc_url, html_path=html_path, status="unchanged",
+                                   original_name=name, original_link=original_link)
+
+            changed, content_hash = await asyncio.to_thread(
+                self.fetcher.detect_change, resolved, filename, response.text
+            )
+            await asyncio.to_thread(self.fetcher.save_page, doc_id, doc_url, filename,
+                                    response.text if changed else None, response.headers,
+                                    'updated' if changed else None, content_hash)
+            if changed:
+                logger.info(f"Updated HTML: {doc_id}")
+            return FetchResult(doc_id=doc_id, url=doc_url, html_path=html_path,
+                               status="updated" if changed else "unchanged",
+                               original_name=name, original_link=original_link)
+        except Exception as e:
+            logger.error(f"Error refreshing {doc_id}: {e}")
+            if resolved is not None:
+                self.fetcher.resolve_cache.invalidate(doc_id)
+            return kept(f"Refresh failed: {e}")
+
+    async def _fetch_all(self, vbqppl_list: List[Dict[str, Any]], progress_callback=None,
+                         result_callback=None) -> List[FetchResult]:
+        unique_vbqppl = self.fetcher.unique_documents(vbqppl_list)
+        total = len(unique_vbqppl)
+        logger.info(f"Starting async fetch: {self.rate} req/s per host, {self.concurrency} in flight, "
+                    f"http2={self.http2}")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # httpx only decodes brotli when the brotli package is installed
+        headers = {**self.fetcher.HEADERS, 'Accept-Encoding': 'gzip, deflate'}
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+
+        # The result callback may block (e.g. on the bounded --pipeline queue), so it runs on its own
+        # thread: on the event loop it would stall every request in flight (and their timeouts
+        # would keep running), and in the default executor it could wait behind blocked store writes
+        loop = asyncio.get_running_loop()
+        callback_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fetch-callback") \
+            if result_callback else None
+        try:
+            async with httpx.AsyncClient(http2=self.http2, headers=headers, limits=limits,
+                                         timeout=self.timeout, follow_redirects=True) as client:
+                async def run(doc_id, vbqppl):
+                    async with semaphore:
+                        return await self.fetch_and_save(client, doc_id, vbqppl)
+
+                tasks = [asyncio.create_task(run(doc_id, vbqppl)) for doc_id, vbqppl in unique_vbqppl.items()]
+                results = []
+                start = time.perf_counter()
+                with tqdm(total=total, desc="📥 Fetching HTML", unit="doc",
+                          bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]") as pbar:
+                    for task in asyncio.as_completed(tasks):
+                        result = await task
+                        results.append(result)
+                        pbar.set_postfix_str(f"{result.doc_id[:20]}..." if len(result.doc_id) > 20 else result.doc_id)
+                        pbar.update(1)
+                        if progress_callback:
+                            progress_callback(pbar.n, total)
+                        if result_callback:
+                            await loop.run_in_executor(callback_executor, result_callback, result)
+        finally:
+            if callback_executor:
+                callback_executor.shutdown()
+
+        elapsed = time.perf_counter() - start
+        rates = ", ".join(f"{host}: {bucket.rate:.2f}" for host, bucket in self.buckets.items())
+        logger.info(f"Async fetch: {self.stats['requests']} requests in {elapsed:.1f}s "
+                    f"({self.stats['requests'] / max(elapsed, 1e-9):.2f} req/s), "
+                    f"{self.stats['throttled']} throttled, {self.stats['transport_errors']} transport errors; "
+                    f"final req/s per host: {rates}")
+        if self.fetcher.resolve_cache is not None:
+            cache_stats = self.fetcher.resolve_cache.stats()
+            logger.info(f"Resolve cache: {cache_stats['hits']} hits, {cache_stats['misses']} searches")
+        return results
+
+    def fetch_all(self, vbqppl_list: List[Dict[str, Any]],
+                  progress_callback: Optional[callable] = None,
+                  result_callback: Optional[callable] = None) -> List[FetchResult]:
+        """Drop-in replacement for HTMLFetcher.fetch_all"""
+        return asyncio.run(self._fetch_all(vbqppl_list, progress_callback, result_callback))
@@ -0,0 +1,84 @@
+"""
+Fetch throughput: per-thread connection pools vs the shared pool
+
+Fetches the same documents into a fresh temporary html dir once per mode:
+
+- per-thread: the previous HTMLFetcher design, one session per thread with its
+  own 20/30-connection pool (PerThreadPoolFetcher below)
+- shared: HTMLFetcher, thread-local sessions over one pool of max_workers connections
+
+and reports docs/sec, requests, connections opened and the connection reuse rate.
+
+    python benchmark_fetch.py --input ../data/phap_dien/Dieu.json --limit 100 --workers 20
+"""
+import time
+import argparse
+import tempfile
+import threading
+from typing import Any, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from vbqppl_crawler import HTMLFetcher, load_dieu_json, extract_all_vbqppl
+
+
+class PerThreadPoolFetcher(HTMLFetcher):
+    """HTMLFetcher with a separate connection pool per thread"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._adapters = []
+        self._adapters_lock = threading.Lock()
+
+    def _get_session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=20, pool_maxsize=30)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update(self.HEADERS)
+            self._local.session = session
+            with self._adapters_lock:
+                self._adapters.append(adapter)
+        return session
+
+    def connection_stats(self) -> Dict[str, Any]:
+        pools = [adapter.poolmanager.pools[key] for adapter in self._adapters
+                 for key in adapter.poolmanager.pools.keys()]
+        num_requests = sum(pool.num_requests for pool in pools)
+        num_connections = sum(pool.num_connections for pool in pools)
+        return {
+            'requests': num_requests,
+            'connections': num_connections,
+            'reuse_rate': 1 - num_connections / num_requests if num_requests else 0.0,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch throughput with per-thread vs shared connection pools")
+    parser.add_argument('--input', '-i', default='../data/phap_dien/Dieu.json')
+    parser.add_argument('--limit', '-l', type=int, default=100, help="Number of documents per mode")
+    parser.add_argument('--workers', type=int, default=20)
+    parser.add_argument('--delay', '-d', type=float, default=0.5)
+    args = parser.parse_args()
+
+    vbqppl_list = extract_all_vbqppl(load_dieu_json(args.input))[:args.limit]
+    print(f"Benchmarking {len(vbqppl_list)} documents, {args.workers} workers, delay {args.delay}s")
+
+    print(f"{'mode':<12} {'docs/s':>8} {'ok':>5} {'requests':>9} {'conns':>6} {'reuse':>7}")
+    for mode, fetcher_cls in (("per-thread", PerThreadPoolFetcher), ("shared", HTMLFetcher)):
+        with tempfile.TemporaryDirectory() as html_dir:
+            fetcher = fetcher_cls(html_dir, max_workers=args.workers, delay=args.delay)
+            start = time.perf_counter()
+            results = fetcher.fetch_all(vbqppl_list)
+            elapsed = time.perf_counter() - start
+            stats = fetcher.connection_stats()
+            ok = sum(1 for r in results if r.status == "success")
+            print(f"{mode:<12} {len(results) / elapsed:>8.2f} {ok:>5} {stats['requests']:>9} "
+                  f"{stats['connections']:>6} {stats['reuse_rate']:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
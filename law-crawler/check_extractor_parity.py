@@ -0,0 +1,95 @@
+"""
+Parity check and benchmark: ContentExtractor (BeautifulSoup) vs LxmlContentExtractor
+
+Extracts a random sample of cached pages with both backends, lists every
+document whose DocumentContent differs (with the first differing field) and
+reports docs/sec for each backend. Exits with status 1 if any document
+differs, so it can gate switching Phase 2 to `--extractor lxml`.
+
+With --largest N the N largest pages (the codes, Bộ luật) are used instead and
+each one is timed, which is where extraction cost is most visible.
+
+    python check_extractor_parity.py --store ./html_cache --sample 200
+    python check_extractor_parity.py --store pack://./html_store --sample 0   # whole cache
+    python check_extractor_parity.py --store ./html_cache --largest 20
+"""
+import sys
+import time
+import random
+import argparse
+from dataclasses import asdict
+
+from tqdm import tqdm
+
+from vbqppl_crawler import ContentExtractor
+from fast_extractor import LxmlContentExtractor
+from html_store import open_store
+
+
+def first_difference(expected: dict, actual: dict) -> str:
+    for field, value in expected.items():
+        if actual.get(field) == value:
+            continue
+        if field == 'sections' and value and actual.get(field):
+            for i, (a, b) in enumerate(zip(value, actual[field])):
+                if a != b:
+                    return f"sections[{i}] ({a.get('label')!r} vs {b.get('label')!r})"
+            return f"sections: {len(value)} vs {len(actual[field])}"
+        return f"{field}: {str(value)[:60]!r} vs {str(actual.get(field))[:60]!r}"
+    return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare BeautifulSoup and lxml extraction on cached HTML")
+    parser.add_argument('--store', default='./html_cache', help="HTML cache (directory or <backend>://<dir>)")
+    parser.add_argument('--sample', type=int, default=200, help="Number of random documents (0 = all)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--largest', type=int, default=0,
+                        help="Use the N largest documents instead of a random sample and time each one")
+    args = parser.parse_args()
+
+    store = open_store(args.store)
+    keys = sorted(store.keys())
+    if args.largest:
+        sizes = {key: len(store.read(key)) for key in tqdm(keys, desc="📏 Sizing", unit="doc")}
+        keys = sorted(keys, key=sizes.get, reverse=True)[:args.largest]
+    elif args.sample and args.sample < len(keys):
+        keys = random.Random(args.seed).sample(keys, args.sample)
+    print(f"Comparing {len(keys)} documents from {args.store}")
+
+    timings = {'bs4': 0.0, 'lxml': 0.0}
+    mismatches = []
+    per_document = []
+    for key in tqdm(keys, desc="🔍 Comparing", unit="doc"):
+        html_content = store.read(key)
+
+        start = time.perf_counter()
+        expected = asdict(ContentExtractor.extract_from_html(html_content, key, ""))
+        bs4_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = asdict(LxmlContentExtractor.extract_from_html(html_content, key, ""))
+        lxml_seconds = time.perf_counter() - start
+
+        timings['bs4'] += bs4_seconds
+        timings['lxml'] += lxml_seconds
+        per_document.append((key, len(html_content), len(expected['sections'] or []), bs4_seconds, lxml_seconds))
+        if actual != expected:
+            mismatches.append((key, first_difference(expected, actual)))
+
+    if args.largest:
+        print(f"{'document':<40} {'KB':>7} {'sections':>8} {'bs4 ms':>8} {'lxml ms':>8}")
+        for key, size, sections, bs4_seconds, lxml_seconds in per_document:
+            print(f"{key[:40]:<40} {size // 1024:>7} {sections:>8} {bs4_seconds * 1000:>8.0f} {lxml_seconds * 1000:>8.0f}")
+    for key, difference in mismatches:
+        print(f"MISMATCH {key}: {difference}")
+    print(f"{'backend':<8} {'docs/s':>9}")
+    for backend, seconds in timings.items():
+        print(f"{backend:<8} {len(keys) / max(seconds, 1e-9):>9.2f}")
+    print(f"Speedup: {timings['bs4'] / max(timings['lxml'], 1e-9):.2f}x, "
+          f"{len(keys) - len(mismatches)}/{len(keys)} documents identical")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Check: an interrupted --refresh must not lose changed documents
+
+Serves a few documents from a local HTTP server, crawls them, changes some of
+them and runs a refresh that is interrupted (KeyboardInterrupt) right after a
+few pages had their validators saved to the resolve cache. A second refresh
+then has to list every changed document in the change manifest and a
+--changes-only Phase 2 has to extract their new content. Exits with status 1
+on failure.
+
+    python check_refresh_resume.py
+    python check_refresh_resume.py --engine async --interrupt-after 2
+"""
+import os
+import sys
+import logging
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from corpus import iter_corpus
+from vbqppl_crawler import HTMLFetcher, VBQPPLCrawler, load_change_manifest
+
+DOCUMENTS = 8
+versions = {}
+
+
+def page(i: int) -> bytes:
+    text = f"Nội dung văn bản số {i}, phiên bản {versions.get(i, 0)}. " * 20
+    return (f'<html><body><h1 class="title">Luật số {i}</h1><div id="noidung">'
+            f'<p>Điều 1. Phạm vi điều chỉnh</p><p>{text}</p></div></body></html>').encode('utf-8')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.startswith('/tim-van-ban'):
+            i = self.path.split('Keywords=')[1].split('%2F')[0]
+            body, etag = f'<div class="doc-title"><a href="/doc/{i}-d1.html">{i}</a></div>'.encode(), None
+        else:
+            i = int(self.path.split('/doc/')[1].split('-')[0])
+            body = page(i)
+            # Even documents send an ETag, so the refresh also takes the 304 path
+            etag = f'"{i}-{versions.get(i, 0)}"' if i % 2 == 0 else None
+            if etag and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        self.send_response(200)
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def crawl(engine: str, refresh: bool, changes_only: bool = False, interrupt_after: int = 0):
+    crawler = VBQPPLCrawler('html_cache', fetch_workers=1, extract_workers=2, fetch_delay=0,
+                            fetch_engine=engine, fetch_concurrency=1, fetch_rate=100,
+                            resolve_cache='resolve_cache.sqlite', refresh=refresh)
+    if interrupt_after:
+        record_fetch = crawler.fetcher.record_fetch
+        saved = []
+
+        def interrupted(*args, **kwargs):
+            record_fetch(*args, **kwargs)
+            saved.append(args[0])
+            if len(saved) == interrupt_after:
+                raise KeyboardInterrupt
+
+        crawler.fetcher.record_fetch = interrupted
+    documents = [{'name': f'Luật số {i}/2020/QH14', 'link': ''} for i in range(DOCUMENTS)]
+    if os.path.exists('checkpoint.json'):
+        os.remove('checkpoint.json')
+    crawler.run(documents, 'content.jsonl', 'checkpoint.json', None, 'changes.jsonl', changes_only)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Interrupt a --refresh and check the rerun's change manifest")
+    parser.add_argument('--engine', choices=['threads', 'async'], default='threads')
+    parser.add_argument('--interrupt-after', type=int, default=3,
+                        help="Interrupt the refresh after this many pages had their validators saved")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    HTMLFetcher.BASE_URL = base
+    HTMLFetcher.SEARCH_URL = f'{base}/tim-van-ban.html'
+    os.chdir(tempfile.mkdtemp(prefix='check_refresh_'))
+
+    crawl(args.engine, refresh=False)
+    changed = {f'{i}/2020/QH14' for i in (0, 1, 2, 3, 5)}
+    for doc_id in changed:
+        versions[int(doc_id.split('/')[0])] = 1
+
+    try:
+        crawl(args.engine, refresh=True, interrupt_after=args.interrupt_after)
+        print("The refresh was not interrupted; lower --interrupt-after")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+    crawl(args.engine, refresh=True, changes_only=True)
+
+    listed = load_change_manifest('changes.jsonl')
+    stale = sorted(record['id'] for record in iter_corpus('content.jsonl')
+                   if record['id'] in changed and 'phiên bản 1' not in record['content'])
+    print(f"Changed: {len(changed)}, in manifest: {len(listed & changed)}, "
+          f"extracted again: {len(changed) - len(stale)}")
+    for doc_id in sorted(changed - listed):
+        print(f"MISSING from manifest: {doc_id}")
+    for doc_id in stale:
+        print(f"STALE content: {doc_id}")
+    sys.exit(1 if changed - listed or stale or listed - changed else 0)
+
+
+if __name__ == "__main__":
+    main()
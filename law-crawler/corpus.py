@@ -0,0 +1,215 @@
+"""
+Streaming corpus I/O
+
+Corpus files (e.g. vbqppl_content.json) hold full document texts plus their
+sections and can be several GB. Instead of `json.load`-ing the whole file, the
+helpers here decode one record at a time so memory stays bounded by the largest
+single document.
+
+Two formats are supported:
+- JSON: a top-level array of records (legacy output, `json.dump(..., indent=2)`)
+- JSONL: one record per line (`.jsonl` / `.ndjson`)
+
+langchain-backend/corpus.py has a copy of the reader (iter_corpus and its
+helpers), so the backend runs without this checkout; keep the two in sync
+(langchain-backend/check_corpus_parity.py compares them).
+"""
+
+import os
+import re
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+READ_CHUNK_SIZE = 1 << 20  # 1 MiB
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+_SEPARATORS = ' \t\r\n,'
+# Longest token prefix that cannot be decoded yet (a split \uXXXX pair, '-1.5e+')
+_MAX_PARTIAL_TOKEN = 16
+# CorpusWriter records of dataclasses start with their 'id' field
+_LEADING_ID = re.compile(rb'^\{"id": ("(?:[^"\\]|\\.)*")')
+
+
+def is_jsonl_path(path: str) -> bool:
+    """Check whether a path uses a JSON Lines extension"""
+    return str(path).lower().endswith(JSONL_EXTENSIONS)
+
+
+def _is_truncated(error: json.JSONDecodeError, buf_len: int) -> bool:
+    """
+    Whether a decode error can be fixed by reading more of the file: the
+    decoder stopped at (or a partial literal/escape before) the end of the
+    buffer, or a string is still open. Anything else is a malformed record.
+    """
+    return error.msg.startswith('Unterminated string') or error.pos >= buf_len - _MAX_PARTIAL_TOKEN
+
+
+def _iter_json_array(f, buf: str) -> Iterator[Dict[str, Any]]:
+    """Incrementally decode records from a top-level JSON array"""
+    decoder = json.JSONDecoder()
+    pos = buf.index('[') + 1
+    read_size = READ_CHUNK_SIZE
+
+    while True:
+        while pos < len(buf) and buf[pos] in _SEPARATORS:
+            pos += 1
+
+        if pos < len(buf) and buf[pos] == ']':
+            return
+
+        if pos < len(buf):
+            try:
+                record, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if not _is_truncated(e, len(buf)):
+                    raise ValueError(f"Malformed record in JSON array: {e.msg}") from e
+                # Record is split across chunks; read more below
+            else:
+                read_size = READ_CHUNK_SIZE
+                yield record
+                continue
+
+        chunk = f.read(read_size)
+        if not chunk:
+            raise ValueError("Unexpected end of file while reading JSON array")
+        buf = buf[pos:] + chunk
+        pos = 0
+        # Grow reads geometrically so very large records are not re-scanned too often
+        read_size = max(read_size, len(buf))
+
+
+def iter_corpus(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield corpus records one at a time from a JSON array or JSONL file.
+
+    The format is detected from the first non-whitespace character, so a
+    `.json` file that actually holds JSON Lines is also accepted.
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buf = ''
+        while not buf.strip():
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                return
+            buf += chunk
+
+        if buf.lstrip()[0] == '[':
+            yield from _iter_json_array(f, buf)
+            return
+
+        # JSON Lines: finish the partially read line, then go line by line
+        lines = buf.split('\n')
+        lines[-1] += f.readline()
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class CorpusWriter:
+    """
+    Incrementally write corpus records as a JSON array or as JSON Lines.
+
+    Records are written as they arrive, so callers never need to hold the full
+    corpus in memory.
+    """
+
+    def __init__(self, path: str, jsonl: Optional[bool] = None, indent: Optional[int] = 2,
+                 append: bool = False):
+        """
+        Args:
+            path: Output file path
+            jsonl: Force JSON Lines (True) or JSON array (False); inferred from
+                the file extension when None
+            indent: Indentation for JSON array output (ignored for JSONL)
+            append: Add to an existing JSONL file (see jsonl_ids) instead of truncating it
+        """
+        self.path = path
+        self.jsonl = is_jsonl_path(path) if jsonl is None else jsonl
+        if append and not self.jsonl:
+            raise ValueError("Only JSON Lines corpus files can be appended to")
+        self.indent = None if self.jsonl else indent
+        self.count = 0
+        self._f = open(path, 'a' if append else 'w', encoding='utf-8')
+        if not self.jsonl:
+            self._f.write('[')
+
+    def write(self, record: Dict[str, Any]):
+        """Append a single record"""
+        data = json.dumps(record, ensure_ascii=False, indent=self.indent)
+        if self.jsonl:
+            self._f.write(data + '\n')
+        else:
+            self._f.write(('\n' if self.count == 0 else ',\n') + data)
+        self.count += 1
+
+    def close(self):
+        if self._f.closed:
+            return
+        if not self.jsonl:
+            self._f.write('\n]\n' if self.count else ']\n')
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_corpus(path: str, records: Iterable[Dict[str, Any]], jsonl: Optional[bool] = None,
+                 indent: Optional[int] = 2) -> int:
+    """Write records to a JSON/JSONL corpus file and return the record count"""
+    with CorpusWriter(path, jsonl=jsonl, indent=indent) as writer:
+        for record in records:
+            writer.write(record)
+        return writer.count
+
+
+def merge_corpus(path: str, records: List[Dict[str, Any]], jsonl: Optional[bool] = None,
+                 indent: Optional[int] = 2) -> int:
+    """
+    Replace the records with the same 'id' in an existing corpus file and
+    append the new ones. The old file is streamed into a temporary file that
+    replaces it, so the corpus is never fully loaded.
+    """
+    jsonl = is_jsonl_path(path) if jsonl is None else jsonl
+    replaced = {record.get('id') for record in records}
+
+    def merged():
+        for record in iter_corpus(path):
+            if record.get('id') not in replaced:
+                yield record
+        yield from records
+
+    tmp_path = f"{path}.tmp"
+    count = write_corpus(tmp_path, merged(), jsonl=jsonl, indent=indent)
+    os.replace(tmp_path, path)
+    return count
+
+
+def jsonl_ids(path: str) -> Set[str]:
+    """
+    IDs of the complete records in a JSONL file that was being appended to.
+
+    A trailing line without a newline is the remains of an interrupted write;
+    it is cut off so CorpusWriter(path, append=True) can continue the file.
+    Only the leading "id" of each line is decoded when present.
+    """
+    ids = set()
+    if not os.path.exists(path):
+        return ids
+    complete = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            match = _LEADING_ID.match(line)
+            ids.add(json.loads(match.group(1)) if match else json.loads(line).get('id'))
+            complete += len(line)
+    if complete < os.path.getsize(path):
+        os.truncate(path, complete)
+    return ids
@@ -0,0 +1,229 @@
+"""
+lxml backend for ContentExtractor (--extractor lxml)
+
+ContentExtractor parses pages with BeautifulSoup's pure-Python html.parser
+and walks the tree with soupsieve selectors. LxmlContentExtractor runs the
+same extraction steps on a libxml2 tree (plain lxml.etree elements, without
+lxml.html's per-element Python class lookup) with precompiled XPath
+expressions and returns the same DocumentContent. Sections and full content
+come from the shared ContentTree walk, only the tree building differs.
+
+Text is collected the way BeautifulSoup's get_text() does it: script/style
+contents and comments are skipped and every text node is stripped on its own.
+libxml2 repairs invalid markup (e.g. a <div> inside a <p>) differently from
+html.parser, so run check_extractor_parity.py on a sample of the cache before
+switching backends; it lists every document whose output differs.
+"""
+import re
+from typing import List, Optional, Tuple, Union
+
+from lxml import etree
+
+from vbqppl_crawler import ContentExtractor, ContentTree, DocumentContent
+from html_store import read_html
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# get_text(): BeautifulSoup leaves out <script>/<style> contents and comments
+_TEXT_NODES = etree.XPath(".//text()[not(parent::script or parent::style)]", smart_strings=False)
+
+_PAGE_TITLE = etree.XPath(
+    f"//h1[{_has_class('title')}] | //*[{_has_class('document-title')}] | //*[{_has_class('vb-title')}]"
+    f" | //*[{_has_class('title-detail')}]//h1 | //*[{_has_class('detail-title')}]"
+)
+_NOIDUNG = etree.XPath("//*[@id='noidung']")
+_PDF_INDICATORS = etree.XPath(
+    f"//*[{_has_class('pdf-only')}] | //*[@data-content-type='pdf'] | //iframe[contains(@src, '.pdf')]"
+    f" | //*[{_has_class('content-pdf')}]"
+)
+_CONTENT_SELECTORS = [
+    etree.XPath(f"//*[@id='noidung']//*[{_has_class('the-document-body')}]"),
+    etree.XPath(f"//*[@id='noidung']//*[{_has_class('the-document-entry')}]"),
+    etree.XPath("//*[@id='noidung']"),
+    etree.XPath(f"//*[{_has_class('the-document-body')}]"),
+    etree.XPath(f"//*[{_has_class('content-vb')}]"),
+    etree.XPath(f"//*[{_has_class('main-content')}]"),
+]
+_HIDDEN = etree.XPath(
+    f".//*[{_has_class('target-hidden')} or {_has_class('bg-theo-doi')} or {_has_class('tooltip-button')}]"
+)
+_DOC_TITLE = etree.XPath(f".//*[{_has_class('docitem-13')}]")
+
+# Placeholder tag for removed elements (see _remove)
+_REMOVED = "removed-element"
+
+
+def _get_text(elem, separator: str = '', strip: bool = False) -> str:
+    """BeautifulSoup Tag.get_text() on an lxml element"""
+    strings = _TEXT_NODES(elem)
+    if strip:
+        return separator.join(s for s in (s.strip() for s in strings) if s)
+    return separator.join(strings)
+
+
+def _classes(elem) -> List[str]:
+    return (elem.get('class') or '').split()
+
+
+def _first(xpath, elem):
+    matches = xpath(elem)
+    return matches[0] if matches else None
+
+
+def _walk(tree: ContentTree, elem):
+    """Feed elem and its subtree to tree (comments only contribute their tail)"""
+    tree.open(elem, elem.tag, _classes(elem))
+    if elem.text and elem.tag not in ('script', 'style'):
+        tree.add_text(elem.text)
+    for child in elem:
+        if isinstance(child.tag, str):
+            _walk(tree, child)
+        if child.tail:
+            tree.add_text(child.tail)
+    tree.close()
+
+
+def _remove(elem):
+    """
+    Remove an element like BeautifulSoup's decompose(). drop_tree() would merge
+    the element's tail into the preceding text node, which changes
+    get_text(strip=True); an empty placeholder keeps the text nodes apart.
+    """
+    elem.clear(keep_tail=True)
+    elem.tag = _REMOVED
+
+
+class LxmlContentExtractor(ContentExtractor):
+    """ContentExtractor on lxml with the same output"""
+
+    @staticmethod
+    def table_to_markdown(table) -> str:
+        """Convert an HTML table to markdown format"""
+        rows = []
+        for tr in table.iterdescendants('tr'):
+            cells = []
+            for cell in tr.iterdescendants('th', 'td'):
+                text = _get_text(cell, separator=' ', strip=True)
+                text = text.replace('|', '\\|')
+                text = ' '.join(text.split())
+                cells.append(text)
+            if cells:
+                rows.append(cells)
+
+        if not rows:
+            return ""
+
+        max_cols = max(len(row) for row in rows)
+        for row in rows:
+            row.extend([''] * (max_cols - len(row)))
+
+        markdown_lines = ['| ' + ' | '.join(rows[0]) + ' |', '| ' + ' | '.join(['---'] * max_cols) + ' |']
+        for row in rows[1:]:
+            markdown_lines.append('| ' + ' | '.join(row) + ' |')
+        return '\n'.join(markdown_lines)
+
+    @staticmethod
+    def _extract_document_title(content_elem) -> str:
+        """Extract the document title from content (usually docitem-13 class, bold/centered)"""
+        title_elem = _first(_DOC_TITLE, content_elem)
+        if title_elem is None:
+            return ""
+        for hidden in _HIDDEN(title_elem):
+            _remove(hidden)
+        title = _get_text(title_elem, separator=' ', strip=True)
+        title = re.sub(r'_{2,}', '', title)
+        title = re.sub(r'\s+', ' ', title)
+        return title.strip()
+
+    @staticmethod
+    def extract_from_html(html_content: Union[str, bytes], doc_id: str, url: str,
+                          original_name: str = "", original_link: str = "",
+                          content_mode: str = "full") -> DocumentContent:
+        """Same as ContentExtractor.extract_from_html; also takes the page as UTF-8 bytes"""
+        def result(title: str, status: str, content: str = "", error_message: Optional[str] = None,
+                   sections=None) -> DocumentContent:
+            return DocumentContent(id=doc_id, title=title, url=url, content=content, status=status,
+                                   error_message=error_message, original_name=original_name,
+                                   original_link=original_link, sections=sections)
+
+        try:
+            html_bytes = html_content.encode('utf-8') if isinstance(html_content, str) else html_content
+            # libxml2 rejects empty documents; html.parser just finds nothing in them
+            # (lxml parsers must not be shared between threads, so one per document)
+            root = etree.fromstring(
+                html_bytes if html_bytes.strip() else b'<html></html>',
+                etree.HTMLParser(encoding='utf-8'),
+            )
+
+            page_title_elem = _first(_PAGE_TITLE, root)
+            page_title = _get_text(page_title_elem, strip=True) if page_title_elem is not None else "Unknown Title"
+
+            # Check for PDF/updating content
+            noidung_elem = _first(_NOIDUNG, root)
+            if noidung_elem is not None:
+                noidung_text = _get_text(noidung_elem)
+                if 'đang được cập nhật' in noidung_text.lower() and len(noidung_text) < 200:
+                    return result(page_title, "pdf_skip",
+                                  error_message="Document content is only available as PDF or being updated")
+
+            if _PDF_INDICATORS(root):
+                return result(page_title, "pdf_skip", error_message="Document content is only available as PDF")
+
+            # Find content container
+            content_elem = None
+            for selector in _CONTENT_SELECTORS:
+                content_elem = _first(selector, root)
+                if content_elem is not None:
+                    if len(_get_text(content_elem, strip=True)) > 100:
+                        break
+                    content_elem = None
+
+            if content_elem is None:
+                return result(page_title, "error", error_message="Could not find content container")
+
+            # Remove hidden elements and tooltips BEFORE any processing
+            for hidden in _HIDDEN(content_elem):
+                _remove(hidden)
+
+            doc_title = LxmlContentExtractor._extract_document_title(content_elem) or page_title
+
+            tree = LxmlContentExtractor._build_tree(content_elem)
+            sections = ContentExtractor._extract_sections(tree)
+            full_content = ContentExtractor._document_content(tree, sections, content_mode)
+
+            if not full_content and not sections:
+                return result(doc_title, "error", error_message="Content is empty")
+            return result(doc_title, "success", content=full_content, sections=sections if sections else None)
+
+        except Exception as e:
+            return result("Unknown", "error", error_message=str(e))
+
+    @staticmethod
+    def _build_tree(content_elem) -> ContentTree:
+        """Flatten the content container (libxml2 caps nesting depth, so recursion is safe)"""
+        tree = ContentTree(LxmlContentExtractor.table_to_markdown)
+        _walk(tree, content_elem)
+        return tree.finish()
+
+    @staticmethod
+    def extract_from_bytes(args: Tuple[bytes, str, str, str, str], content_mode: str = "full") -> DocumentContent:
+        """Same as ContentExtractor.extract_from_bytes, without decoding the page"""
+        html_bytes, doc_id, url, original_name, original_link = args
+        return LxmlContentExtractor.extract_from_html(html_bytes, doc_id, url, original_name, original_link,
+                                                      content_mode)
+
+    @staticmethod
+    def extract_from_file(args: Tuple[str, str, str, str, str], content_mode: str = "full") -> DocumentContent:
+        """Same as ContentExtractor.extract_from_file"""
+        html_path, doc_id, url, original_name, original_link = args
+        try:
+            html_content = read_html(html_path)
+        except Exception as e:
+            return DocumentContent(id=doc_id, title="Unknown", url=url, content="", status="error",
+                                   error_message=f"Error reading HTML file: {e}",
+                                   original_name=original_name, original_link=original_link)
+        return LxmlContentExtractor.extract_from_html(html_content, doc_id, url, original_name, original_link,
+                                                      content_mode)
@@ -0,0 +1,481 @@
+"""
+Storage backends for fetched HTML (Phase 1 cache)
+
+- file: one uncompressed .html file per document (original html_cache layout)
+- zstd: one zstd-compressed blob per document, spread over 256 shard directories
+- pack: a single append-only pack file of zstd frames plus a SQLite index.
+  Blobs are content-addressed (sha256), so identical pages are stored once.
+
+Stores are addressed by the filename HTMLFetcher._generate_filename gives a
+document (the "key"). FetchResult.html_path holds a reference to the stored
+page: a plain path for the file backend (as before), `zstd://<root>#<key>` or
+`pack://<root>#<key>` otherwise. read_html() resolves any reference and keeps
+one open store per process, so Phase 2 workers read straight from the store.
+
+WriteBehindStore wraps any of them for the fetch/extract pipeline: pages are
+written by a background thread and handed to the extractor from memory.
+
+    python html_store.py migrate --src ./html_cache --dest pack://./html_store --checkpoint ./fetch_checkpoint.json
+    python html_store.py stats --store pack://./html_store
+"""
+import os
+import time
+import queue
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from tqdm import tqdm
+
+logger = logging.getLogger(__name__)
+
+ZSTD_LEVEL = 9
+_codecs = threading.local()
+
+
+def _zstd():
+    """Thread-local (ZstdCompressor, ZstdDecompressor); zstandard objects must not be shared between threads"""
+    if not hasattr(_codecs, "compressor"):
+        import zstandard
+        _codecs.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        _codecs.decompressor = zstandard.ZstdDecompressor()
+    return _codecs.compressor, _codecs.decompressor
+
+
+def _allocated_bytes(root: Path) -> Tuple[int, int]:
+    """(bytes allocated on disk, number of files) under root"""
+    total, files = 0, 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            st = os.stat(os.path.join(dirpath, name))
+            total += getattr(st, "st_blocks", 0) * 512 or st.st_size
+            files += 1
+    return total, files
+
+
+class HTMLStore:
+    """Key -> HTML page storage"""
+
+    backend = None
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def read(self, key: str) -> str:
+        raise NotImplementedError
+
+    def write(self, key: str, html_content: str):
+        raise NotImplementedError
+
+    def keys(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def ref(self, key: str) -> str:
+        """Reference stored in FetchResult.html_path, readable with read_html()"""
+        return f"{self.backend}://{self.root}#{key}"
+
+    def as_read(self, html_content: str) -> str:
+        """The page as read() returns it after write(html_content)"""
+        return html_content
+
+    def when_written(self, key: str, callback: Callable[[], None]):
+        """Call callback once the page written under key is stored (right away: write() is synchronous)"""
+        callback()
+
+    def disk_usage(self) -> Tuple[int, int]:
+        return _allocated_bytes(self.root)
+
+    def close(self):
+        pass
+
+
+class FileStore(HTMLStore):
+    """One .html file per document"""
+
+    backend = "file"
+
+    def exists(self, key: str) -> bool:
+        return (self.root / key).exists()
+
+    def read(self, key: str) -> str:
+        return (self.root / key).read_text(encoding="utf-8")
+
+    def write(self, key: str, html_content: str):
+        (self.root / key).write_text(html_content, encoding="utf-8")
+
+    def keys(self) -> Iterator[str]:
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".html"):
+                    yield entry.name
+
+    def ref(self, key: str) -> str:
+        return str(self.root / key)
+
+    def as_read(self, html_content: str) -> str:
+        # read_text() translates \r\n and \r to \n
+        return html_content.replace("\r\n", "\n").replace("\r", "\n")
+
+
+class ZstdShardedStore(HTMLStore):
+    """One zstd blob per document in root/<md5(key)[:2]>/<key>.zst"""
+
+    backend = "zstd"
+
+    def _path(self, key: str) -> Path:
+        return self.root / hashlib.md5(key.encode()).hexdigest()[:2] / f"{key}.zst"
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def read(self, key: str) -> str:
+        return _zstd()[1].decompress(self._path(key).read_bytes()).decode("utf-8")
+
+    def write(self, key: str, html_content: str):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        # Write-then-rename so readers never see a truncated blob
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(_zstd()[0].compress(html_content.encode("utf-8")))
+        os.replace(tmp_path, path)
+
+    def keys(self) -> Iterator[str]:
+        for shard in sorted(p for p in self.root.iterdir() if p.is_dir()):
+            for path in shard.glob("*.zst"):
+                yield path.name[:-len(".zst")]
+
+
+class PackStore(HTMLStore):
+    """
+    Append-only pack of zstd frames (root/pack.dat) indexed in root/index.sqlite.
+
+    Rewriting a key appends a new frame and repoints the index; the old frame
+    stays in the pack as dead bytes.
+    """
+
+    backend = "pack"
+
+    def __init__(self, root: str):
+        super().__init__(root)
+        self.pack_path = self.root / "pack.dat"
+        self.pack_path.touch(exist_ok=True)
+        self._lock = threading.Lock()
+        self._fd = os.open(self.pack_path, os.O_RDWR)
+        self._db = sqlite3.connect(self.root / "index.sqlite", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS blobs ("
+                         "digest TEXT PRIMARY KEY, offset INTEGER NOT NULL, length INTEGER NOT NULL, "
+                         "size INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS docs (key TEXT PRIMARY KEY, digest TEXT NOT NULL)")
+        self._db.commit()
+
+    def _locate(self, key: str) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT b.offset, b.length FROM docs d JOIN blobs b ON b.digest = d.digest WHERE d.key = ?", (key,)
+            ).fetchone()
+
+    def exists(self, key: str) -> bool:
+        return self._locate(key) is not None
+
+    def read(self, key: str) -> str:
+        location = self._locate(key)
+        if location is None:
+            raise KeyError(key)
+        offset, length = location
+        return _zstd()[1].decompress(os.pread(self._fd, length, offset)).decode("utf-8")
+
+    def write(self, key: str, html_content: str):
+        raw = html_content.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        # Compress outside the lock so fetch threads only serialize on the append
+        frame = _zstd()[0].compress(raw)
+        with self._lock:
+            known = self._db.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if not known:
+                offset = os.lseek(self._fd, 0, os.SEEK_END)
+                os.write(self._fd, frame)
+                self._db.execute("INSERT INTO blobs (digest, offset, length, size) VALUES (?, ?, ?, ?)",
+                                 (digest, offset, len(frame), len(raw)))
+            self._db.execute("INSERT INTO docs (key, digest) VALUES (?, ?) "
+                             "ON CONFLICT(key) DO UPDATE SET digest = excluded.digest", (key, digest))
+            self._db.commit()
+
+    def keys(self) -> Iterator[str]:
+        with self._lock:
+            keys = [row[0] for row in self._db.execute("SELECT key FROM docs ORDER BY key")]
+        return iter(keys)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+            os.close(self._fd)
+
+
+class WriteBehindStore(HTMLStore):
+    """
+    Store wrapper whose write() returns without touching the disk.
+
+    Pages are written by one background thread, and written pages are kept in
+    memory until take() hands them over (the crawler's --pipeline mode sends
+    them to the extraction processes instead of reading them back). write()
+    blocks while max_pending pages wait to be written or taken, which
+    throttles the fetchers when extraction falls behind. when_written()
+    callbacks run on the writer thread once the page is stored, and are
+    dropped if storing it fails.
+    """
+
+    def __init__(self, store: HTMLStore, max_pending: int = 64):
+        self.store = store
+        self.root = store.root
+        self.backend = store.backend
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._unwritten: Dict[str, str] = {}
+        self._untaken: Dict[str, str] = {}
+        self._on_written: Dict[str, List[Callable[[], None]]] = {}
+        self._max_pending = max_pending
+        self._holding = True
+        self._slots = threading.Semaphore(max_pending)
+        self._writes: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_pending)
+        self._writer = threading.Thread(target=self._write_loop, name="html-store-writer", daemon=True)
+        self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            key = self._writes.get()
+            try:
+                if key is None:
+                    return
+                with self._lock:
+                    html_content = self._unwritten.get(key)
+                if html_content is None:
+                    continue
+                try:
+                    self.store.write(key, html_content)
+                    written = True
+                except Exception as e:
+                    self.errors += 1
+                    written = False
+                    logger.error(f"Error writing {key} to the HTML store: {e}")
+                callbacks = []
+                with self._lock:
+                    # Keep the page (and its callbacks) if it was written again in the meantime
+                    if self._unwritten.get(key) is html_content:
+                        del self._unwritten[key]
+                        callbacks = self._on_written.pop(key, [])
+                for callback in callbacks if written else []:
+                    try:
+                        callback()
+                    except Exception as e:
+                        logger.error(f"Error after writing {key} to the HTML store: {e}")
+            finally:
+                self._writes.task_done()
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            if key in self._unwritten:
+                return True
+        return self.store.exists(key)
+
+    def read(self, key: str) -> str:
+        with self._lock:
+            html_content = self._unwritten.get(key)
+        if html_content is not None:
+            return self.store.as_read(html_content)
+        return self.store.read(key)
+
+    def write(self, key: str, html_content: str):
+        self._slots.acquire()
+        with self._lock:
+            if not self._holding or key in self._untaken:
+                self._slots.release()  # Not kept, or replaces a page that already holds a slot
+            if self._holding:
+                self._untaken[key] = html_content
+            self._unwritten[key] = html_content
+        self._writes.put(key)
+
+    def take(self, key: str) -> Optional[str]:
+        """The page last written under key, as read() returns it, or None if there is none to take"""
+        with self._lock:
+            html_content = self._untaken.pop(key, None)
+        if html_content is None:
+            return None
+        self._slots.release()
+        return self.store.as_read(html_content)
+
+    def when_written(self, key: str, callback: Callable[[], None]):
+        with self._lock:
+            if key in self._unwritten:
+                self._on_written.setdefault(key, []).append(callback)
+                return
+        callback()
+
+    def stop_holding(self):
+        """Drop the pages waiting for take() and keep no new ones, so write() stops blocking on them"""
+        with self._lock:
+            if not self._holding:
+                return
+            self._holding = False
+            self._untaken.clear()
+        # Free every slot, held or waited for (write() now gives its slot straight back)
+        for _ in range(self._max_pending):
+            self._slots.release()
+
+    def keys(self) -> Iterator[str]:
+        self.flush()
+        return self.store.keys()
+
+    def ref(self, key: str) -> str:
+        return self.store.ref(key)
+
+    def as_read(self, html_content: str) -> str:
+        return self.store.as_read(html_content)
+
+    def disk_usage(self) -> Tuple[int, int]:
+        self.flush()
+        return self.store.disk_usage()
+
+    def flush(self):
+        """Wait until every page written so far is on disk"""
+        self._writes.join()
+
+    def close(self):
+        """Flush and stop the writer thread (the wrapped store stays open)"""
+        self.flush()
+        self._writes.put(None)
+        self._writer.join()
+
+
+BACKENDS = {"file": FileStore, "zstd": ZstdShardedStore, "pack": PackStore}
+
+# Stores opened by read_html, keyed by (pid, location): SQLite connections must not cross a fork
+_open_stores: Dict[Tuple[int, str], HTMLStore] = {}
+_open_lock = threading.Lock()
+
+
+def open_store(location: str, backend: str = "file") -> HTMLStore:
+    """Open a store from a directory and backend name, or from a `<backend>://<dir>` location"""
+    if "://" in location:
+        backend, location = location.split("://", 1)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown HTML store backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[backend](location)
+
+
+def split_ref(ref: str) -> Tuple[Optional[str], str]:
+    """(`<backend>://<dir>` store location, key) of a reference; location is None for plain file paths"""
+    if "://" not in ref:
+        return None, Path(ref).name
+    location, key = ref.split("#", 1)
+    return location, key
+
+
+def read_html(ref: str) -> str:
+    """Read a page from a FetchResult.html_path reference (file path or store reference)"""
+    location, key = split_ref(ref)
+    if location is None:
+        with open(ref, "r", encoding="utf-8") as f:
+            return f.read()
+    cache_key = (os.getpid(), location)
+    store = _open_stores.get(cache_key)
+    if store is None:
+        with _open_lock:
+            store = _open_stores.get(cache_key)
+            if store is None:
+                store = _open_stores[cache_key] = open_store(location)
+    return store.read(key)
+
+
+def migrate(src: HTMLStore, dest: HTMLStore) -> int:
+    """Copy every page of src into dest (keys already in dest are skipped)"""
+    copied = 0
+    for key in tqdm(list(src.keys()), desc=f"📦 {src.backend} -> {dest.backend}", unit="doc"):
+        if not dest.exists(key):
+            dest.write(key, src.read(key))
+            copied += 1
+    return copied
+
+
+def rewrite_checkpoint(checkpoint_file: str, dest: HTMLStore) -> int:
+    """Point the html_path references of a fetch checkpoint at dest"""
+    import json
+
+    with open(checkpoint_file, "r", encoding="utf-8") as f:
+        results = json.load(f)
+    updated = 0
+    for result in results:
+        if result.get("html_path"):
+            key = split_ref(result["html_path"])[1]
+            if dest.exists(key):
+                result["html_path"] = dest.ref(key)
+                updated += 1
+    with open(checkpoint_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return updated
+
+
+def store_stats(store: HTMLStore) -> dict:
+    """Disk usage and full-scan read throughput (what Phase 2 sees)"""
+    disk_bytes, files = store.disk_usage()
+    keys = list(store.keys())
+    raw_bytes = 0
+    start = time.perf_counter()
+    for key in tqdm(keys, desc="📖 Reading", unit="doc"):
+        raw_bytes += len(store.read(key).encode("utf-8"))
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    return {
+        "backend": store.backend,
+        "documents": len(keys),
+        "files": files,
+        "disk_mb": round(disk_bytes / 2**20, 1),
+        "raw_mb": round(raw_bytes / 2**20, 1),
+        "ratio": round(raw_bytes / disk_bytes, 2) if disk_bytes else 0.0,
+        "read_docs_per_sec": round(len(keys) / elapsed, 1),
+        "read_mb_per_sec": round(raw_bytes / 2**20 / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML cache stores: migrate between backends and report stats")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate", help="Copy an HTML cache into another store")
+    migrate_parser.add_argument("--src", default="./html_cache", help="Source store (directory or <backend>://<dir>)")
+    migrate_parser.add_argument("--dest", required=True, help="Destination store, e.g. pack://./html_store")
+    migrate_parser.add_argument("--checkpoint", default=None,
+                                help="Fetch checkpoint whose html_path entries are repointed to --dest")
+
+    stats_parser = subparsers.add_parser("stats", help="Disk usage and read throughput of one or more stores")
+    stats_parser.add_argument("--store", nargs="+", default=["./html_cache"])
+
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        src, dest = open_store(args.src), open_store(args.dest)
+        copied = migrate(src, dest)
+        print(f"Copied {copied} documents from {args.src} to {args.dest}")
+        if args.checkpoint:
+            updated = rewrite_checkpoint(args.checkpoint, dest)
+            print(f"Repointed {updated} checkpoint entries in {args.checkpoint}")
+        dest.close()
+    else:
+        rows = [store_stats(open_store(location)) for location in args.store]
+        print(f"{'backend':<8} {'docs':>8} {'files':>8} {'disk MB':>9} {'raw MB':>9} {'ratio':>6} "
+              f"{'docs/s':>9} {'MB/s':>8}")
+        for row in rows:
+            print(f"{row['backend']:<8} {row['documents']:>8} {row['files']:>8} {row['disk_mb']:>9} "
+                  f"{row['raw_mb']:>9} {row['ratio']:>6} {row['read_docs_per_sec']:>9} {row['read_mb_per_sec']:>8}")
+
+
+if __name__ == "__main__":
+    main()
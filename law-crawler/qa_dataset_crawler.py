@@ -13,11 +13,17 @@ from bs4 import BeautifulSoup
 # Import from existing crawler
 try:
     from vbqppl_crawler import HTMLFetcher, ContentExtractor, DocumentContent
+    from corpus import iter_corpus, write_corpus
+    from resolve_cache import ResolveCache, DEFAULT_PATH as DEFAULT_RESOLVE_CACHE
+    from html_store import read_html
 except ImportError:
     # Handle case where we run from root
     import sys
     sys.path.append('law-crawler')
     from vbqppl_crawler import HTMLFetcher, ContentExtractor, DocumentContent
+    from corpus import iter_corpus, write_corpus
+    from resolve_cache import ResolveCache, DEFAULT_PATH as DEFAULT_RESOLVE_CACHE
+    from html_store import read_html
 
 # Configure logging
 logging.basicConfig(
@@ -190,32 +196,25 @@ class QAContentExtractor(ContentExtractor):
         )
 
 def main():
-    # 1. Load Existing Corpus
-    print(f"Loading main corpus from {MAIN_CORPUS_PATH}...")
-    existing_docs_map = {}
-    
-    if os.path.exists(MAIN_CORPUS_PATH):
-        try:
-            with open(MAIN_CORPUS_PATH, 'r', encoding='utf-8') as f:
-                docs = json.load(f)
-                for doc in docs:
-                    if 'id' in doc:
-                        existing_docs_map[normalize_text(doc['id'])] = doc
-                        # Also map title/original_name if available for fuzzy lookup
-                        if 'title' in doc:
-                            existing_docs_map[normalize_text(doc['title'])] = doc
-        except Exception as e:
-            logger.error(f"Error loading existing corpus: {e}")
-            
-    print(f"Loaded {len(existing_docs_map)} entries from main corpus.")
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Crawl VBQPPL documents referenced by the QA dataset')
+    parser.add_argument('--dataset', type=str, default=DATASET_PATH, help='Path to QA dataset JSON')
+    parser.add_argument('--corpus', type=str, default=MAIN_CORPUS_PATH,
+                        help='Path to main corpus (JSON array or JSONL)')
+    parser.add_argument('--output', '-o', type=str, default=OUTPUT_PATH,
+                        help='Path to output corpus (.jsonl writes JSON Lines)')
+    parser.add_argument('--resolve-cache', type=str, default=DEFAULT_RESOLVE_CACHE,
+                        help='SQLite cache of doc_id -> URL search results, shared with vbqppl_crawler.py')
+    args = parser.parse_args()
 
-    # 2. Load QA Dataset & Identify Required Docs
+    # 1. Load QA Dataset & Identify Required Docs
     print("Loading QA dataset...")
     try:
-        with open(DATASET_PATH, 'r', encoding='utf-8') as f:
+        with open(args.dataset, 'r', encoding='utf-8') as f:
             qa_data = json.load(f)
     except FileNotFoundError:
-         print(f"Dataset not found at {DATASET_PATH}")
+         print(f"Dataset not found at {args.dataset}")
          return
     
     required_law_names = set()
@@ -229,12 +228,39 @@ def main():
     
     print(f"Found {len(required_law_names)} unique document references required.")
 
+    fetcher = QAHTMLFetcher(html_dir=HTML_DIR, resolve_cache=ResolveCache(args.resolve_cache))
+
+    # Lookup keys (normalized ID and name) for every required document
+    required_keys = set()
+    for law_name in required_law_names:
+        required_keys.add(normalize_text(fetcher.extract_document_id(law_name)))
+        required_keys.add(normalize_text(law_name))
+
+    # 2. Stream Existing Corpus, keeping only the documents we need
+    print(f"Streaming main corpus from {args.corpus}...")
+    existing_docs_map = {}
+    
+    if os.path.exists(args.corpus):
+        try:
+            for doc in iter_corpus(args.corpus):
+                if 'id' in doc:
+                    key = normalize_text(doc['id'])
+                    if key in required_keys:
+                        existing_docs_map[key] = doc
+                    # Also map title/original_name if available for fuzzy lookup
+                    if 'title' in doc:
+                        key = normalize_text(doc['title'])
+                        if key in required_keys:
+                            existing_docs_map[key] = doc
+        except Exception as e:
+            logger.error(f"Error loading existing corpus: {e}")
+            
+    print(f"Matched {len(existing_docs_map)} entries from main corpus.")
+
     # 3. Separate into Found vs Missing
     qa_corpus_docs: List[Dict] = []
     missing_laws = []
     
-    fetcher = QAHTMLFetcher(html_dir=HTML_DIR)
-
     for law_name in required_law_names:
         # Try to find in existing corpus
         # Strategy 1: strict ID match
@@ -277,8 +303,7 @@ def main():
                 continue
                 
             try:
-                with open(res.html_path, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
+                html_content = read_html(res.html_path)
                 
                 guess_id = fetcher.extract_document_id(res.original_name or res.doc_id)
                 
@@ -309,9 +334,8 @@ def main():
     
     final_docs_list = list(unique_qa_docs.values())
     
-    print(f"Saving {len(final_docs_list)} documents to {OUTPUT_PATH}...")
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(final_docs_list, f, ensure_ascii=False, indent=4)
+    print(f"Saving {len(final_docs_list)} documents to {args.output}...")
+    write_corpus(args.output, final_docs_list)
     print("Done.")
 
 if __name__ == "__main__":
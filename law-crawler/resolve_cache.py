@@ -0,0 +1,109 @@
+"""
+Persistent doc_id -> URL resolution cache
+
+Every fetch starts with a luatvietnam.vn search to find the document page.
+The result only depends on the document ID, so it is stored in a small SQLite
+database shared by vbqppl_crawler.py and qa_dataset_crawler.py:
+
+- resolved IDs keep their URL until the page stops answering (invalidate)
+- misses ("not found in search results") are cached too, but expire after
+  `negative_ttl` seconds so documents published later are picked up
+- fetched_at records when the document page was last downloaded, together
+  with its ETag / Last-Modified validators and content hash (used by the
+  crawler's --refresh mode for conditional GETs)
+
+Search errors (timeouts, 5xx) are never cached.
+"""
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+DEFAULT_PATH = "./resolve_cache.sqlite"
+DEFAULT_NEGATIVE_TTL = 7 * 24 * 3600
+
+
+@dataclass
+class ResolveEntry:
+    doc_id: str
+    url: Optional[str]  # None: not found in search results
+    resolved_at: float
+    fetched_at: Optional[float] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None  # HTMLFetcher.content_fingerprint of the cached page
+
+
+class ResolveCache:
+    """Thread-safe SQLite key-value store of search results"""
+
+    def __init__(self, path: str = DEFAULT_PATH, negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        self.path = path
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS resolved ("
+            "doc_id TEXT PRIMARY KEY, url TEXT, resolved_at REAL NOT NULL, fetched_at REAL)"
+        )
+        # Validator columns were added after the first release of the cache
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(resolved)")}
+        for column in ("etag", "last_modified", "content_hash"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE resolved ADD COLUMN {column} TEXT")
+        self._conn.commit()
+
+    def lookup(self, doc_id: str) -> Optional[ResolveEntry]:
+        """Cached entry for doc_id, or None if unknown or an expired miss"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, resolved_at, fetched_at, etag, last_modified, content_hash FROM resolved WHERE doc_id = ?",
+                (doc_id,)
+            ).fetchone()
+            if row is None or (row[0] is None and time.time() - row[1] > self.negative_ttl):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return ResolveEntry(doc_id, *row)
+
+    def put(self, doc_id: str, url: Optional[str]):
+        """Record a search result (url=None for not found)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO resolved (doc_id, url, resolved_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(doc_id) DO UPDATE SET url = excluded.url, resolved_at = excluded.resolved_at",
+                (doc_id, url, time.time()),
+            )
+            self._conn.commit()
+
+    def mark_fetched(self, doc_id: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                     content_hash: Optional[str] = None):
+        """Record a download of doc_id's page and the validators it was served with"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE resolved SET fetched_at = ?, etag = ?, last_modified = ?, content_hash = ? WHERE doc_id = ?",
+                (time.time(), etag, last_modified, content_hash, doc_id),
+            )
+            self._conn.commit()
+
+    def invalidate(self, doc_id: str):
+        """Forget doc_id, e.g. when its cached URL no longer resolves"""
+        with self._lock:
+            self._conn.execute("DELETE FROM resolved WHERE doc_id = ?", (doc_id,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            resolved, not_found = self._conn.execute(
+                "SELECT COUNT(url), COUNT(*) - COUNT(url) FROM resolved"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "resolved": resolved, "not_found": not_found}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
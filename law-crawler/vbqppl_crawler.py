@@ -14,19 +14,28 @@ import json
 import re
 import time
 import os
+import queue
 import logging
 import hashlib
+import threading
 from pathlib import Path
-from typing import Optional, Dict, List, Any, Tuple
+from typing import Optional, Dict, List, Any, Set, Tuple
 from dataclasses import dataclass, asdict
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from urllib.parse import urljoin, quote
 import multiprocessing
+from itertools import repeat
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, SoupStrainer, Tag
 from tqdm import tqdm
 
+from corpus import CorpusWriter, write_corpus, merge_corpus, iter_corpus, is_jsonl_path, jsonl_ids
+from resolve_cache import ResolveCache, DEFAULT_PATH as DEFAULT_RESOLVE_CACHE
+from html_store import (HTMLStore, FileStore, WriteBehindStore, BACKENDS as HTML_STORE_BACKENDS,
+                        open_store, read_html)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -65,20 +74,46 @@ class FetchResult:
     """Result of fetching HTML from a URL"""
     doc_id: str
     url: str
-    html_path: Optional[str]  # Path to saved HTML file
-    status: str  # 'success', 'not_found', 'error'
+    html_path: Optional[str]  # Saved HTML: file path or html_store reference
+    status: str  # 'success', 'cached', 'updated', 'unchanged', 'not_found', 'error'
     error_message: Optional[str] = None
     original_name: Optional[str] = None
     original_link: Optional[str] = None
 
 
+# Fetch statuses with usable HTML on disk
+FETCHED_STATUSES = ('success', 'cached', 'updated', 'unchanged')
+
+# Fetch status -> change recorded in the change manifest
+MANIFEST_CHANGES = {'success': 'new', 'updated': 'updated'}
+
+# Upper bound for the number of documents sent to an extraction process at once
+EXTRACT_CHUNKSIZE = 16
+
+# How DocumentContent.content is built (--content-mode):
+# - full: flat text of the whole page, always extracted
+# - lazy: only for documents without sections (empty otherwise, the sections hold the text)
+# - sections: the sections joined together, full text only for documents without sections
+CONTENT_MODES = ('full', 'lazy', 'sections')
+
+
 class HTMLFetcher:
     """Handles fetching and saving HTML content using multithreading"""
     
     BASE_URL = "https://luatvietnam.vn"
     SEARCH_URL = "https://luatvietnam.vn/van-ban/tim-van-ban.html"
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'vi,en-US;q=0.9,en;q=0.8',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive',
+        'Referer': 'https://luatvietnam.vn/',
+    }
     
-    def __init__(self, html_dir: str, max_workers: int = 10, delay: float = 0.5):
+    def __init__(self, html_dir: str, max_workers: int = 10, delay: float = 0.5,
+                 resolve_cache: Optional[ResolveCache] = None, refresh: bool = False,
+                 store: Optional[HTMLStore] = None):
         """
         Initialize the HTML fetcher
         
@@ -86,42 +121,46 @@ class HTMLFetcher:
             html_dir: Directory to save HTML files
             max_workers: Maximum number of concurrent threads
             delay: Delay between requests per thread
+            resolve_cache: Persistent doc_id -> URL cache, skips the search request on re-crawls
+            refresh: Re-check already cached documents with conditional GETs and
+                overwrite the ones whose content changed
+            store: Where fetched HTML is kept (html_store.py), one file per document in html_dir by default
         """
         self.html_dir = Path(html_dir)
-        self.html_dir.mkdir(parents=True, exist_ok=True)
+        self.store = store or FileStore(html_dir)
         self.max_workers = max_workers
         self.delay = delay
-        
-        # Create a session for each thread
-        self._local = None
+        self.resolve_cache = resolve_cache
+        self.refresh = refresh
+        self.change_journal: Optional[str] = None
+        self._journal_lock = threading.Lock()
+        
+        # One session per thread (requests.Session is not thread-safe), all sharing a
+        # single connection pool sized to the number of worker threads
+        self._local = threading.local()
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers, pool_block=True)
     
     def _get_session(self) -> requests.Session:
-        """Get or create a thread-local session"""
-        import threading
-        if not hasattr(self, '_sessions'):
-            self._sessions = {}
-        
-        thread_id = threading.current_thread().ident
-        if thread_id not in self._sessions:
+        """Get or create the calling thread's session"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
             session = requests.Session()
-            
-            # Increase connection pool size to handle concurrent threads (avoiding warnings)
-            from requests.adapters import HTTPAdapter
-            adapter = HTTPAdapter(pool_connections=20, pool_maxsize=30)
-            session.mount('http://', adapter)
-            session.mount('https://', adapter)
-            
-            session.headers.update({
-                'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'vi,en-US;q=0.9,en;q=0.8',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Referer': 'https://luatvietnam.vn/',
-            })
-            self._sessions[thread_id] = session
-        
-        return self._sessions[thread_id]
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+            session.headers.update(self.HEADERS)
+            self._local.session = session
+        return session
+    
+    def connection_stats(self) -> Dict[str, Any]:
+        """Requests sent and connections opened through the shared pool"""
+        pools = [self._adapter.poolmanager.pools[key] for key in self._adapter.poolmanager.pools.keys()]
+        num_requests = sum(pool.num_requests for pool in pools)
+        num_connections = sum(pool.num_connections for pool in pools)
+        return {
+            'requests': num_requests,
+            'connections': num_connections,
+            'reuse_rate': 1 - num_connections / num_requests if num_requests else 0.0,
+        }
     
     def extract_document_id(self, vbqppl_name: str) -> Optional[str]:
         """Extract document ID from VBQPPL name"""
@@ -158,24 +197,111 @@ class HTMLFetcher:
             search_params = {'Keywords': doc_id}
             response = session.get(self.SEARCH_URL, params=search_params, timeout=30)
             response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find the first search result link
-            result_links = soup.select('.doc-title a')
-            if not result_links:
-                result_links = soup.select('.art-search a[href*="-d1.html"], a[href*="-d1.html"]')
-            
-            for link in result_links:
-                href = link.get('href', '')
-                if href and '-d1.html' in href:
-                    return urljoin(self.BASE_URL, href) if not href.startswith('http') else href
-            
-            return None
+            doc_url = self.parse_search_results(response.content)
             
         except Exception as e:
             logger.error(f"Error searching for document {doc_id}: {e}")
             return None
+        
+        # Only completed searches are cached, errors are retried on the next run
+        if self.resolve_cache is not None:
+            self.resolve_cache.put(doc_id, doc_url)
+        return doc_url
+    
+    @staticmethod
+    def content_fingerprint(html_content: str) -> str:
+        """Hash of the document body text, ignoring page chrome (ads, related links, counters)"""
+        body = BeautifulSoup(html_content, 'html.parser', parse_only=SoupStrainer(id='noidung'))
+        text = body.get_text(' ', strip=True) or html_content
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def conditional_headers(resolved) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers from a cached ResolveEntry"""
+        headers = {}
+        if resolved is not None and resolved.etag:
+            headers['If-None-Match'] = resolved.etag
+        if resolved is not None and resolved.last_modified:
+            headers['If-Modified-Since'] = resolved.last_modified
+        return headers
+    
+    def detect_change(self, resolved, key: str, html_content: str) -> Tuple[bool, str]:
+        """Compare a freshly downloaded page with the stored copy; returns (changed, new content hash)"""
+        new_hash = self.content_fingerprint(html_content)
+        if resolved is not None and resolved.content_hash:
+            old_hash = resolved.content_hash
+        else:
+            old_hash = self.content_fingerprint(self.store.read(key))
+        return new_hash != old_hash, new_hash
+    
+    def record_fetch(self, doc_id: str, headers, content_hash: Optional[str] = None):
+        """Store the validators a page was served with in the resolve cache"""
+        if self.resolve_cache is not None:
+            self.resolve_cache.mark_fetched(doc_id, etag=headers.get('ETag'),
+                                            last_modified=headers.get('Last-Modified'),
+                                            content_hash=content_hash)
+    
+    def open_change_journal(self, journal_file: Optional[str]) -> Set[str]:
+        """
+        Append new and updated documents to journal_file as they are fetched
+        
+        Returns the documents the journal already lists, i.e. changes found by an
+        interrupted earlier run (a half-written last line is cut off).
+        """
+        self.change_journal = journal_file
+        if not journal_file:
+            return set()
+        jsonl_ids(journal_file)
+        return load_change_manifest(journal_file)
+    
+    def record_change(self, doc_id: str, change: str, url: str, filename: str):
+        """Append a change manifest record for doc_id to the change journal"""
+        if not self.change_journal:
+            return
+        record = {'doc_id': doc_id, 'change': change, 'url': url, 'html_path': self.store.ref(filename),
+                  'detected_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with self._journal_lock, open(self.change_journal, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    
+    def save_page(self, doc_id: str, url: str, filename: str, html_content: Optional[str], headers,
+                  change: Optional[str] = None, content_hash: Optional[str] = None):
+        """
+        Save a fetched page: journal the change, store the HTML, then record its
+        validators and content hash in the resolve cache
+        
+        The validators come last because a rerun trusts them to skip unchanged
+        pages: if they were saved first, an interrupted run would leave changed
+        documents that the next run reports as unchanged and leaves out of the
+        change manifest (or, with a write-behind store, keeps the old page).
+        html_content None keeps the stored page (not modified).
+        """
+        if change:
+            self.record_change(doc_id, change, url, filename)
+        if html_content is not None:
+            self.store.write(filename, html_content)
+        self.store.when_written(filename, lambda: self.record_fetch(doc_id, headers, content_hash))
+    
+    def lookup_resolved(self, doc_id: str):
+        """Cached search result for doc_id (ResolveEntry), or None if it has to be searched"""
+        if self.resolve_cache is None:
+            return None
+        return self.resolve_cache.lookup(doc_id)
+    
+    def parse_search_results(self, content: bytes) -> Optional[str]:
+        """Return the URL of the first document in a search result page"""
+        soup = BeautifulSoup(content, 'html.parser')
+        
+        # Find the first search result link
+        result_links = soup.select('.doc-title a')
+        if not result_links:
+            result_links = soup.select('.art-search a[href*="-d1.html"], a[href*="-d1.html"]')
+        
+        for link in result_links:
+            href = link.get('href', '')
+            if href and '-d1.html' in href:
+                return urljoin(self.BASE_URL, href) if not href.startswith('http') else href
+        
+        return None
     
     def fetch_and_save(self, vbqppl: Dict[str, Any]) -> FetchResult:
         """
@@ -205,24 +331,28 @@ class HTMLFetcher:
         
         # Check if already fetched
         filename = self._generate_filename(doc_id)
-        html_path = self.html_dir / filename
-        if html_path.exists():
+        if self.store.exists(filename) and self.refresh:
+            return self.refresh_and_save(doc_id, filename, name, original_link)
+        if self.store.exists(filename):
             logger.info(f"Already fetched: {doc_id}")
             return FetchResult(
                 doc_id=doc_id,
                 url="",
-                html_path=str(html_path),
+                html_path=self.store.ref(filename),
                 status="cached",
                 original_name=name,
                 original_link=original_link
             )
         
-        # Add delay to be respectful
-        time.sleep(self.delay)
-        
-        # Search for document URL
-        logger.info(f"Searching for: {doc_id}")
-        doc_url = self.search_document(doc_id)
+        # Search for document URL, unless it was resolved by an earlier crawl
+        resolved = self.lookup_resolved(doc_id)
+        if resolved is not None:
+            doc_url = resolved.url
+        else:
+            # Add delay to be respectful
+            time.sleep(self.delay)
+            logger.info(f"Searching for: {doc_id}")
+            doc_url = self.search_document(doc_id)
         
         if not doc_url:
             return FetchResult(
@@ -230,7 +360,7 @@ class HTMLFetcher:
                 url="",
                 html_path=None,
                 status="not_found",
-                error_message="Document not found in search results",
+                error_message="Document not found in search results" + (" (cached)" if resolved else ""),
                 original_name=name,
                 original_link=original_link
             )
@@ -242,15 +372,14 @@ class HTMLFetcher:
             response = session.get(doc_url, timeout=30)
             response.raise_for_status()
             
-            # Save HTML to disk
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(response.text)
+            # Save HTML to the cache store
+            self.save_page(doc_id, doc_url, filename, response.text, response.headers, change='new')
             
             logger.info(f"Saved HTML: {doc_id} -> {filename}")
             return FetchResult(
                 doc_id=doc_id,
                 url=doc_url,
-                html_path=str(html_path),
+                html_path=self.store.ref(filename),
                 status="success",
                 original_name=name,
                 original_link=original_link
@@ -258,6 +387,9 @@ class HTMLFetcher:
             
         except Exception as e:
             logger.error(f"Error fetching {doc_id}: {e}")
+            if resolved is not None:
+                # The cached URL may be stale; search again next time
+                self.resolve_cache.invalidate(doc_id)
             return FetchResult(
                 doc_id=doc_id,
                 url=doc_url,
@@ -268,21 +400,54 @@ class HTMLFetcher:
                 original_link=original_link
             )
     
-    def fetch_all(self, vbqppl_list: List[Dict[str, Any]], 
-                  progress_callback: Optional[callable] = None) -> List[FetchResult]:
+    def refresh_and_save(self, doc_id: str, filename: str, name: str, original_link: str) -> FetchResult:
         """
-        Fetch all VBQPPL documents using multithreading
+        Re-fetch an already cached document with a conditional GET
         
-        Args:
-            vbqppl_list: List of VBQPPL dictionaries
-            progress_callback: Optional callback function(completed, total)
-            
-        Returns:
-            List of FetchResult objects
+        The cached file is only overwritten when the document body changed. If
+        the document can no longer be resolved or fetched, the cached copy is kept.
         """
-        results = []
+        html_path = self.store.ref(filename)
+        
+        def kept(message: str) -> FetchResult:
+            return FetchResult(doc_id=doc_id, url="", html_path=html_path, status="cached",
+                               error_message=message, original_name=name, original_link=original_link)
+        
+        time.sleep(self.delay)
+        resolved = self.lookup_resolved(doc_id)
+        if resolved is not None and resolved.url:
+            doc_url = resolved.url
+        else:
+            resolved = None
+            doc_url = self.search_document(doc_id)
+            if not doc_url:
+                return kept("Refresh skipped: document not found in search results")
         
-        # Deduplicate based on extracted document ID
+        try:
+            session = self._get_session()
+            response = session.get(doc_url, headers=self.conditional_headers(resolved), timeout=30)
+            response.raise_for_status()
+            if response.status_code == 304:
+                logger.info(f"Not modified: {doc_id}")
+                return FetchResult(doc_id=doc_id, url=doc_url, html_path=html_path, status="unchanged",
+                                   original_name=name, original_link=original_link)
+            
+            changed, content_hash = self.detect_change(resolved, filename, response.text)
+            self.save_page(doc_id, doc_url, filename, response.text if changed else None, response.headers,
+                           change='updated' if changed else None, content_hash=content_hash)
+            if changed:
+                logger.info(f"Updated HTML: {doc_id}")
+            return FetchResult(doc_id=doc_id, url=doc_url, html_path=html_path,
+                               status="updated" if changed else "unchanged",
+                               original_name=name, original_link=original_link)
+        except Exception as e:
+            logger.error(f"Error refreshing {doc_id}: {e}")
+            if resolved is not None:
+                self.resolve_cache.invalidate(doc_id)
+            return kept(f"Refresh failed: {e}")
+    
+    def unique_documents(self, vbqppl_list: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Deduplicate VBQPPL entries based on the extracted document ID"""
         unique_vbqppl = {}
         logger.info("Extracting IDs and deduplicating...")
         
@@ -293,8 +458,27 @@ class HTMLFetcher:
             if doc_id and doc_id not in unique_vbqppl:
                 unique_vbqppl[doc_id] = vbqppl
         
+        logger.info(f"Refined list: {len(unique_vbqppl)} unique documents to fetch (from {len(vbqppl_list)} total entries)")
+        return unique_vbqppl
+    
+    def fetch_all(self, vbqppl_list: List[Dict[str, Any]], 
+                  progress_callback: Optional[callable] = None,
+                  result_callback: Optional[callable] = None) -> List[FetchResult]:
+        """
+        Fetch all VBQPPL documents using multithreading
+        
+        Args:
+            vbqppl_list: List of VBQPPL dictionaries
+            progress_callback: Optional callback function(completed, total)
+            result_callback: Optional callback function(FetchResult), called as
+                each document completes
+            
+        Returns:
+            List of FetchResult objects
+        """
+        results = []
+        unique_vbqppl = self.unique_documents(vbqppl_list)
         total = len(unique_vbqppl)
-        logger.info(f"Refined list: {total} unique documents to fetch (from {len(vbqppl_list)} total entries)")
         logger.info(f"Starting to fetch with {self.max_workers} threads")
         
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
@@ -329,10 +513,106 @@ class HTMLFetcher:
                     pbar.update(1)
                     if progress_callback:
                         progress_callback(pbar.n, total)
-        
+                    if result_callback:
+                        result_callback(results[-1])
+        
+        stats = self.connection_stats()
+        logger.info(f"Connections: {stats['requests']} requests over {stats['connections']} connections "
+                    f"(reuse rate {stats['reuse_rate']:.1%})")
+        if self.resolve_cache is not None:
+            cache_stats = self.resolve_cache.stats()
+            logger.info(f"Resolve cache: {cache_stats['hits']} hits, {cache_stats['misses']} searches")
         return results
 
 
+@dataclass
+class ContentNode:
+    """An element of the content container (see ContentTree)"""
+    elem: Any
+    tag: str
+    classes: List[str]
+    parent: int  # Index of the parent node, -1 for the container
+    start: int  # get_text(strip=True) of the element is ContentTree.text[start:end]
+    end: int = 0
+    in_table: bool = False  # Inside a <table>
+    has_table: bool = False  # A <table> somewhere below
+    has_mab2: bool = False  # A .mab2 element somewhere below
+
+
+class ContentTree:
+    """
+    The content container flattened in a single walk over the parse tree
+
+    Every element becomes a ContentNode, in document order (nodes[0] is the
+    container). Stripped text nodes are joined into one string, so the
+    get_text(strip=True) of an element is a slice of it, and the text of a child
+    is always contained in the text of its parent. Table ancestry and
+    table/mab2 descendants are recorded during the same walk. Together these
+    replace the per-element find_parent()/find()/parent.get_text() calls that
+    made extraction quadratic on long codes.
+
+    Parser backends feed open()/add_text()/close() in document order.
+    """
+
+    def __init__(self, table_to_markdown):
+        self.nodes: List[ContentNode] = []
+        self.text = ""
+        self._strings: List[str] = []
+        self._length = 0
+        self._open: List[int] = []
+        self._table_to_markdown = table_to_markdown
+        self._markdown: Dict[int, str] = {}
+
+    @property
+    def current(self):
+        """Innermost element that is still open"""
+        return self.nodes[self._open[-1]].elem if self._open else None
+
+    def open(self, elem, tag: str, classes: List[str]):
+        parent = self._open[-1] if self._open else -1
+        in_table = parent >= 0 and (self.nodes[parent].in_table or self.nodes[parent].tag == 'table')
+        self._open.append(len(self.nodes))
+        self.nodes.append(ContentNode(elem, tag, classes, parent, self._length, in_table=in_table))
+
+    def add_text(self, string: str):
+        string = string.strip()
+        if string:
+            self._strings.append(string)
+            self._length += len(string)
+
+    def close(self):
+        node = self.nodes[self._open.pop()]
+        node.end = self._length
+        if node.parent >= 0:
+            parent = self.nodes[node.parent]
+            parent.has_table = parent.has_table or node.has_table or node.tag == 'table'
+            parent.has_mab2 = parent.has_mab2 or node.has_mab2 or 'mab2' in node.classes
+
+    def finish(self) -> "ContentTree":
+        while self._open:
+            self.close()
+        self.text = ''.join(self._strings)
+        return self
+
+    def text_of(self, index: int) -> str:
+        node = self.nodes[index]
+        return self.text[node.start:node.end]
+
+    def text_length(self, index: int) -> int:
+        node = self.nodes[index]
+        return node.end - node.start
+
+    def lines(self) -> str:
+        """get_text(separator='\\n', strip=True) of the container"""
+        return '\n'.join(self._strings)
+
+    def markdown(self, index: int) -> str:
+        """table_to_markdown of a <table> node, converted once"""
+        if index not in self._markdown:
+            self._markdown[index] = self._table_to_markdown(self.nodes[index].elem)
+        return self._markdown[index]
+
+
 class ContentExtractor:
     """Handles extracting content from saved HTML files using multiprocessing"""
     
@@ -381,6 +661,9 @@ class ContentExtractor:
         'phu_luc': re.compile(r'^(Phụ lục|PHỤ LỤC)\s*([IVXLCDM]+|\d+)?', re.IGNORECASE),
     }
     
+    # Elements collected by the full-content fallback
+    FULL_CONTENT_TAGS = ('p', 'div', 'span', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'b', 'strong', 'i', 'em')
+    
     @staticmethod
     def _extract_document_title(content_elem: BeautifulSoup) -> str:
         """Extract the document title from content (usually docitem-13 class, bold/centered)"""
@@ -455,7 +738,8 @@ class ContentExtractor:
     
     @staticmethod
     def extract_from_html(html_content: str, doc_id: str, url: str, 
-                          original_name: str = "", original_link: str = "") -> DocumentContent:
+                          original_name: str = "", original_link: str = "",
+                          content_mode: str = "full") -> DocumentContent:
         """
         Extract document content from HTML string with hierarchical structure
         
@@ -465,6 +749,7 @@ class ContentExtractor:
             url: Original document URL
             original_name: Original VBQPPL name
             original_link: Original VBQPPL link
+            content_mode: How the content field is built, see CONTENT_MODES
             
         Returns:
             DocumentContent object with sections containing hierarchy paths
@@ -552,198 +837,9 @@ class ContentExtractor:
             if not doc_title:
                 doc_title = page_title
             
-            # ============================================
-            # HIERARCHICAL STRUCTURE EXTRACTION
-            # ============================================
-            # Track current hierarchy: Phần > Chương > Mục > Điều/Phụ lục
-            hierarchy = {
-                'phan': None,
-                'chuong': None,
-                'muc': None,
-            }
-            
-            sections = []  # List of extracted sections with hierarchy paths
-            current_section_content = []
-            current_section_label = None
-            current_section_type = None
-            
-            def _build_hierarchy_path():
-                """Build the hierarchy path string"""
-                parts = []
-                if hierarchy['phan']:
-                    parts.append(hierarchy['phan'])
-                if hierarchy['chuong']:
-                    parts.append(hierarchy['chuong'])
-                if hierarchy['muc']:
-                    parts.append(hierarchy['muc'])
-                return ' > '.join(parts) if parts else ""
-            
-            def _save_current_section():
-                """Save the current section to sections list"""
-                nonlocal current_section_content, current_section_label, current_section_type
-                if current_section_label and current_section_content:
-                    content_text = '\n'.join(current_section_content).strip()
-                    content_text = re.sub(r'\n{3,}', '\n\n', content_text)
-                    if content_text:
-                        hierarchy_path = _build_hierarchy_path()
-                        if hierarchy_path:
-                            full_path = f"{hierarchy_path} > {current_section_label}"
-                        else:
-                            full_path = current_section_label
-                        
-                        sections.append({
-                            'label': current_section_label,
-                            'content': content_text,
-                            'hierarchy_path': full_path,
-                            'type': current_section_type or 'unknown'
-                        })
-                current_section_content = []
-                current_section_label = None
-                current_section_type = None
-            
-            # Process structural elements
-            # Look for docitem-2 (Chương headers), docitem-5 (Điều headers), etc.
-            # Include 'table' in search to handle markdown conversion
-            all_elements = content_elem.find_all(['p', 'div', 'span', 'table'], recursive=True)
-            processed_headers = set()  # Track processed headers to avoid duplicates
-            
-            for elem in all_elements:
-                classes = elem.get('class', [])
-                
-                # Special handling for tables
-                if elem.name == 'table':
-                    # Skip nested tables (handled by outer table)
-                    if elem.find_parent('table'):
-                        continue
-                    text = ContentExtractor.table_to_markdown(elem)
-                    header_type = None # Tables are content, not headers
-                else:
-                    # For non-table elements
-                    # If this element strictly contains a table, skip it and let the table be processed separately
-                    # This avoids flattening the table into text
-                    if elem.find('table'):
-                        continue
-                        
-                    # Skip content that is inside a table (already handled by table_to_markdown)
-                    if elem.find_parent('table'):
-                        continue
-                        
-                    text = elem.get_text(strip=True)
-                
-                if not text or len(text) < 3:
-                    continue
-                
-                # Skip duplicate content from nested elements
-                # Check if this element's text is a subset of parent's text
-                parent = elem.parent
-                if parent and parent != content_elem and parent.name in ['p', 'div', 'span']:
-                    # Only check for duplicate if parent was NOT skipped
-                    # Parent is skipped if it contains a table
-                    parent_has_table = parent.find('table')
-                    
-                    if not parent_has_table:
-                        parent_text = parent.get_text(strip=True)
-                        # Skip if this element's text is contained in parent
-                        # This covers both substring and exact equality
-                        if text in parent_text:
-                            continue
-                
-                # Identify header type
-                header_type = ContentExtractor._identify_header_type(text)
-                
-                if header_type:
-                    clean_text = ContentExtractor._clean_header_text(text)
-                    
-                    if header_type == 'phan':
-                        # New Phần resets everything below it
-                        _save_current_section()
-                        hierarchy['phan'] = clean_text
-                        hierarchy['chuong'] = None
-                        hierarchy['muc'] = None
-                        
-                    elif header_type == 'chuong':
-                        # New Chương resets Mục
-                        _save_current_section()
-                        hierarchy['chuong'] = clean_text
-                        hierarchy['muc'] = None
-                        
-                    elif header_type == 'muc':
-                        _save_current_section()
-                        hierarchy['muc'] = clean_text
-                        
-                    elif header_type in ('dieu', 'phu_luc'):
-                        # Start a new section for Điều or Phụ lục
-                        _save_current_section()
-                        current_section_label = clean_text
-                        current_section_type = header_type
-                        
-                        # Try to get the content following this header
-                        # The content is typically in subsequent sibling elements or child mab2 elements
-                        mab2_elem = elem.select_one('.mab2')
-                        if mab2_elem:
-                            # Content is inside this element after the label
-                            full_text = elem.get_text(strip=True)
-                            # Remove the label part to get content
-                            content_after_label = full_text[len(clean_text):].strip()
-                            if content_after_label:
-                                current_section_content.append(content_after_label)
-                        
-                elif current_section_label:
-                    # We're inside a section (after a Điều/Phụ lục), collect content
-                    # Check if this is a content element (docitem-11, docitem-12, etc)
-                    is_content_class = any(c.startswith('docitem-') and c not in ['docitem-2', 'docitem-5', 'docitem-13', 'docitem-14'] 
-                                          for c in classes)
-                    
-                    # Also check for mab2 which contains clean text
-                    if 'mab2' in classes or is_content_class or not classes:
-                        # Avoid adding header text again
-                        if not ContentExtractor._identify_header_type(text):
-                            current_section_content.append(text)
-            
-            # Save the last section
-            _save_current_section()
-            
-            # ============================================
-            # FALLBACK: Full content extraction
-            # ============================================
-            content_parts = []
-            seen_texts = set()
-            processed_tables = set()
-            
-            # Process tables
-            for table in content_elem.find_all('table'):
-                table_id = id(table)
-                if table_id not in processed_tables:
-                    processed_tables.add(table_id)
-                    md_table = ContentExtractor.table_to_markdown(table)
-                    if md_table and md_table not in seen_texts:
-                        content_parts.append('\n\n' + md_table + '\n\n')
-                        seen_texts.add(md_table)
-                        seen_texts.add(table.get_text(strip=True))
-            
-            # Process text elements
-            for element in content_elem.find_all(['p', 'div', 'span', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'b', 'strong', 'i', 'em']):
-                if element.find_parent('table'):
-                    continue
-                
-                parent = element.parent
-                if parent and parent.name in ['p', 'div', 'span'] and parent.get_text(strip=True) == element.get_text(strip=True):
-                    continue
-                
-                text = element.get_text(strip=True)
-                if text and len(text) > 5 and text not in seen_texts:
-                    is_duplicate = any(text in seen for seen in seen_texts if len(seen) > len(text))
-                    if not is_duplicate:
-                        content_parts.append(text + '\n')
-                        seen_texts.add(text)
-            
-            if not content_parts:
-                raw_content = content_elem.get_text(separator='\n', strip=True)
-                content_parts = [raw_content]
-            
-            full_content = '\n'.join(content_parts)
-            full_content = re.sub(r'\n{3,}', '\n\n', full_content)
-            full_content = full_content.strip()
+            tree = ContentExtractor._build_tree(content_elem)
+            sections = ContentExtractor._extract_sections(tree)
+            full_content = ContentExtractor._document_content(tree, sections, content_mode)
             
             if not full_content and not sections:
                 return DocumentContent(
@@ -781,12 +877,249 @@ class ContentExtractor:
             )
     
     @staticmethod
-    def extract_from_file(args: Tuple[str, str, str, str, str]) -> DocumentContent:
+    def _build_tree(content_elem: BeautifulSoup) -> ContentTree:
+        """Flatten the content container in one pass over its descendants"""
+        tree = ContentTree(ContentExtractor.table_to_markdown)
+        # Same strings as get_text(): no comments, <script>/<style> contents, etc.
+        text_types = content_elem.interesting_string_types
+        tree.open(content_elem, content_elem.name, content_elem.get('class', []))
+        for node in content_elem.descendants:
+            while node.parent is not tree.current:
+                tree.close()
+            if isinstance(node, Tag):
+                tree.open(node, node.name, node.get('class', []))
+            elif type(node) in text_types:
+                tree.add_text(node)
+        return tree.finish()
+    
+    @staticmethod
+    def _extract_sections(tree: ContentTree) -> List[Dict[str, str]]:
+        """
+        Hierarchical structure extraction
+        
+        Track current hierarchy: Phần > Chương > Mục > Điều/Phụ lục and collect
+        the content of every Điều/Phụ lục with its hierarchy path.
+        """
+        hierarchy = {
+            'phan': None,
+            'chuong': None,
+            'muc': None,
+        }
+        
+        sections = []  # List of extracted sections with hierarchy paths
+        current_section_content = []
+        current_section_label = None
+        current_section_type = None
+        
+        def _build_hierarchy_path():
+            """Build the hierarchy path string"""
+            parts = []
+            if hierarchy['phan']:
+                parts.append(hierarchy['phan'])
+            if hierarchy['chuong']:
+                parts.append(hierarchy['chuong'])
+            if hierarchy['muc']:
+                parts.append(hierarchy['muc'])
+            return ' > '.join(parts) if parts else ""
+        
+        def _save_current_section():
+            """Save the current section to sections list"""
+            nonlocal current_section_content, current_section_label, current_section_type
+            if current_section_label and current_section_content:
+                content_text = '\n'.join(current_section_content).strip()
+                content_text = re.sub(r'\n{3,}', '\n\n', content_text)
+                if content_text:
+                    hierarchy_path = _build_hierarchy_path()
+                    if hierarchy_path:
+                        full_path = f"{hierarchy_path} > {current_section_label}"
+                    else:
+                        full_path = current_section_label
+                    
+                    sections.append({
+                        'label': current_section_label,
+                        'content': content_text,
+                        'hierarchy_path': full_path,
+                        'type': current_section_type or 'unknown'
+                    })
+            current_section_content = []
+            current_section_label = None
+            current_section_type = None
+        
+        # Process structural elements
+        # Look for docitem-2 (Chương headers), docitem-5 (Điều headers), etc.
+        # Include 'table' to handle markdown conversion
+        nodes = tree.nodes
+        for index in range(1, len(nodes)):
+            node = nodes[index]
+            if node.tag not in ('p', 'div', 'span', 'table'):
+                continue
+            classes = node.classes
+            
+            # Special handling for tables
+            if node.tag == 'table':
+                # Skip nested tables (handled by outer table)
+                if node.in_table:
+                    continue
+                text = tree.markdown(index)
+            else:
+                # If this element contains a table, skip it and let the table be processed separately
+                # This avoids flattening the table into text
+                # Skip content that is inside a table (already handled by table_to_markdown)
+                if node.has_table or node.in_table:
+                    continue
+                
+                # Skip duplicate content from nested elements: the text of a child is
+                # always part of its parent's text, so skip every element whose parent
+                # is a p/div/span that is processed as a whole (i.e. has no table)
+                parent = nodes[node.parent]
+                if node.parent > 0 and parent.tag in ('p', 'div', 'span') and not parent.has_table:
+                    continue
+                
+                text = tree.text_of(index)
+            
+            if not text or len(text) < 3:
+                continue
+            
+            # Identify header type
+            header_type = ContentExtractor._identify_header_type(text)
+            
+            if header_type:
+                clean_text = ContentExtractor._clean_header_text(text)
+                
+                if header_type == 'phan':
+                    # New Phần resets everything below it
+                    _save_current_section()
+                    hierarchy['phan'] = clean_text
+                    hierarchy['chuong'] = None
+                    hierarchy['muc'] = None
+                    
+                elif header_type == 'chuong':
+                    # New Chương resets Mục
+                    _save_current_section()
+                    hierarchy['chuong'] = clean_text
+                    hierarchy['muc'] = None
+                    
+                elif header_type == 'muc':
+                    _save_current_section()
+                    hierarchy['muc'] = clean_text
+                    
+                elif header_type in ('dieu', 'phu_luc'):
+                    # Start a new section for Điều or Phụ lục
+                    _save_current_section()
+                    current_section_label = clean_text
+                    current_section_type = header_type
+                    
+                    # The content is typically in subsequent sibling elements or child mab2 elements
+                    if node.has_mab2:
+                        # Content is inside this element after the label
+                        content_after_label = text[len(clean_text):].strip()
+                        if content_after_label:
+                            current_section_content.append(content_after_label)
+                    
+            elif current_section_label:
+                # We're inside a section (after a Điều/Phụ lục), collect content
+                # Check if this is a content element (docitem-11, docitem-12, etc)
+                is_content_class = any(c.startswith('docitem-') and c not in ['docitem-2', 'docitem-5', 'docitem-13', 'docitem-14'] 
+                                      for c in classes)
+                
+                # Also check for mab2 which contains clean text
+                if 'mab2' in classes or is_content_class or not classes:
+                    # Avoid adding header text again
+                    if not ContentExtractor._identify_header_type(text):
+                        current_section_content.append(text)
+        
+        # Save the last section
+        _save_current_section()
+        return sections
+    
+    @staticmethod
+    def _extract_full_content(tree: ContentTree) -> str:
+        """
+        Fallback: full content extraction
+        
+        Flat text of the whole document, tables as markdown, without repeating
+        the text of nested elements.
+        """
+        content_parts = []
+        seen_texts = set()
+        nodes = tree.nodes
+        
+        # Process tables
+        for index in range(1, len(nodes)):
+            if nodes[index].tag == 'table':
+                md_table = tree.markdown(index)
+                if md_table and md_table not in seen_texts:
+                    content_parts.append('\n\n' + md_table + '\n\n')
+                    seen_texts.add(md_table)
+                    seen_texts.add(tree.text_of(index))
+        
+        # Process text elements. The text of an element is contained in the text
+        # of all its ancestors, so once an ancestor is kept (or dropped as a
+        # repeat) its whole subtree is covered and only exact repeats elsewhere
+        # need the hash lookup.
+        covered = [False] * len(nodes)
+        for index in range(1, len(nodes)):
+            node = nodes[index]
+            covered[index] = covered[node.parent]
+            if node.tag not in ContentExtractor.FULL_CONTENT_TAGS or node.in_table:
+                continue
+            
+            parent = nodes[node.parent]
+            if parent.tag in ('p', 'div', 'span') and tree.text_length(node.parent) == tree.text_length(index):
+                continue
+            
+            if tree.text_length(index) <= 5 or covered[index]:
+                continue
+            text = tree.text_of(index)
+            if text not in seen_texts:
+                content_parts.append(text + '\n')
+                seen_texts.add(text)
+            covered[index] = True
+        
+        if not content_parts:
+            content_parts = [tree.lines()]
+        
+        full_content = '\n'.join(content_parts)
+        full_content = re.sub(r'\n{3,}', '\n\n', full_content)
+        return full_content.strip()
+    
+    @staticmethod
+    def sections_to_content(sections: List[Dict[str, str]]) -> str:
+        """Document text rebuilt from its sections (label line, then content)"""
+        return '\n\n'.join(f"{section['label']}\n{section['content']}" for section in sections)
+    
+    @staticmethod
+    def _document_content(tree: ContentTree, sections: List[Dict[str, str]], content_mode: str) -> str:
+        """DocumentContent.content for a content mode (see CONTENT_MODES)"""
+        if sections and content_mode == 'lazy':
+            return ""
+        if sections and content_mode == 'sections':
+            return ContentExtractor.sections_to_content(sections)
+        return ContentExtractor._extract_full_content(tree)
+    
+    @staticmethod
+    def extract_from_bytes(args: Tuple[bytes, str, str, str, str], content_mode: str = "full") -> DocumentContent:
         """
-        Extract content from a saved HTML file (for multiprocessing)
+        Extract content from a page passed in memory (pipeline mode, for multiprocessing)
         
         Args:
-            args: Tuple of (html_path, doc_id, url, original_name, original_link)
+            args: Tuple of (UTF-8 HTML, doc_id, url, original_name, original_link)
+            content_mode: How the content field is built, see CONTENT_MODES
+        """
+        html_bytes, doc_id, url, original_name, original_link = args
+        return ContentExtractor.extract_from_html(
+            html_bytes.decode('utf-8'), doc_id, url, original_name, original_link, content_mode
+        )
+    
+    @staticmethod
+    def extract_from_file(args: Tuple[str, str, str, str, str], content_mode: str = "full") -> DocumentContent:
+        """
+        Extract content from a saved HTML page (for multiprocessing)
+        
+        Args:
+            args: Tuple of (html_path, doc_id, url, original_name, original_link);
+                html_path is a file path or an html_store reference
+            content_mode: How the content field is built, see CONTENT_MODES
             
         Returns:
             DocumentContent object
@@ -794,11 +1127,10 @@ class ContentExtractor:
         html_path, doc_id, url, original_name, original_link = args
         
         try:
-            with open(html_path, 'r', encoding='utf-8') as f:
-                html_content = f.read()
+            html_content = read_html(html_path)
             
             return ContentExtractor.extract_from_html(
-                html_content, doc_id, url, original_name, original_link
+                html_content, doc_id, url, original_name, original_link, content_mode
             )
         except Exception as e:
             return DocumentContent(
@@ -819,7 +1151,16 @@ class VBQPPLCrawler:
     def __init__(self, html_dir: str = "./html_cache", 
                  fetch_workers: int = 10,
                  extract_workers: int = None,
-                 fetch_delay: float = 0.5):
+                 fetch_delay: float = 0.5,
+                 fetch_engine: str = "threads",
+                 fetch_rate: float = 10.0,
+                 fetch_concurrency: int = 8,
+                 resolve_cache: Optional[str] = DEFAULT_RESOLVE_CACHE,
+                 negative_ttl: float = 7 * 24 * 3600,
+                 refresh: bool = False,
+                 html_store: str = "file",
+                 extractor: str = "bs4",
+                 content_mode: str = "full"):
         """
         Initialize the crawler
         
@@ -828,40 +1169,85 @@ class VBQPPLCrawler:
             fetch_workers: Number of threads for fetching (Phase 1)
             extract_workers: Number of processes for extraction (Phase 2), defaults to CPU count
             fetch_delay: Delay between requests per thread
+            fetch_engine: 'threads' (HTMLFetcher) or 'async' (AsyncFetchEngine)
+            fetch_rate: Requests/sec per host for the async engine
+            fetch_concurrency: Documents in flight for the async engine
+            resolve_cache: SQLite file caching doc_id -> URL search results (None to disable)
+            negative_ttl: Seconds before a cached "not found" is searched again
+            refresh: Re-check cached HTML with conditional GETs (incremental refresh)
+            html_store: Backend for the HTML cache in html_dir: 'file', 'zstd' or 'pack'
+            extractor: Phase 2 parser: 'bs4' (ContentExtractor) or 'lxml' (LxmlContentExtractor)
+            content_mode: How Phase 2 builds each document's content field, see CONTENT_MODES
         """
         self.html_dir = html_dir
-        self.fetcher = HTMLFetcher(html_dir, max_workers=fetch_workers, delay=fetch_delay)
+        cache = ResolveCache(resolve_cache, negative_ttl=negative_ttl) if resolve_cache else None
+        self.fetcher = HTMLFetcher(html_dir, max_workers=fetch_workers, delay=fetch_delay,
+                                   resolve_cache=cache, refresh=refresh,
+                                   store=open_store(html_dir, html_store))
         self.extract_workers = extract_workers or max(1, multiprocessing.cpu_count() - 4)
+        self.fetch_engine = fetch_engine
+        self.fetch_rate = fetch_rate
+        self.fetch_concurrency = fetch_concurrency
+        self.extractor = extractor
+        self.content_mode = content_mode
     
     def phase1_fetch(self, vbqppl_list: List[Dict[str, Any]], 
-                     checkpoint_file: str = None) -> List[FetchResult]:
+                     checkpoint_file: str = None,
+                     manifest_file: str = None) -> List[FetchResult]:
         """
         Phase 1: Fetch all HTML content using multithreading
         
         Args:
             vbqppl_list: List of VBQPPL dictionaries
             checkpoint_file: File to save fetch results for checkpointing
+            manifest_file: JSONL file listing the new and updated documents
             
         Returns:
             List of FetchResult objects
         """
         logger.info("=" * 60)
-        logger.info("PHASE 1: Fetching HTML content with multithreading")
+        logger.info(f"PHASE 1: Fetching HTML content ({self.fetch_engine} engine)")
         logger.info(f"Total documents to fetch: {len(vbqppl_list)}")
-        logger.info(f"Using {self.fetcher.max_workers} threads")
+        if self.fetch_engine == "async":
+            logger.info(f"Using {self.fetch_concurrency} coroutines at {self.fetch_rate} req/s per host")
+        else:
+            logger.info(f"Using {self.fetcher.max_workers} threads")
         logger.info("=" * 60)
         
         start_time = time.time()
-        results = self.fetcher.fetch_all(vbqppl_list)
-        elapsed = time.time() - start_time
-        
+        self.fetcher.open_change_journal(change_journal_path(manifest_file))
+        results = self._fetch(vbqppl_list)
+        self._save_fetch_results(results, time.time() - start_time, checkpoint_file, manifest_file)
+        return results
+    
+    def _fetch(self, vbqppl_list: List[Dict[str, Any]],
+               result_callback: Optional[callable] = None) -> List[FetchResult]:
+        """Fetch with the configured engine"""
+        if self.fetch_engine == "async":
+            from async_fetcher import AsyncFetchEngine
+            engine = AsyncFetchEngine(self.fetcher, rate=self.fetch_rate, concurrency=self.fetch_concurrency)
+            return engine.fetch_all(vbqppl_list, result_callback=result_callback)
+        return self.fetcher.fetch_all(vbqppl_list, result_callback=result_callback)
+    
+    def _save_fetch_results(self, results: List[FetchResult], elapsed: float,
+                            checkpoint_file: Optional[str], manifest_file: Optional[str]):
+        """Log Phase 1 statistics, write the change manifest and the checkpoint"""
         # Statistics
-        success = sum(1 for r in results if r.status in ['success', 'cached'])
+        success = sum(1 for r in results if r.status in FETCHED_STATUSES)
         not_found = sum(1 for r in results if r.status == 'not_found')
         errors = sum(1 for r in results if r.status == 'error')
         
         logger.info(f"Phase 1 completed in {elapsed:.2f}s")
         logger.info(f"Success: {success}, Not Found: {not_found}, Errors: {errors}")
+        if self.fetcher.refresh:
+            updated = sum(1 for r in results if r.status == 'updated')
+            unchanged = sum(1 for r in results if r.status == 'unchanged')
+            logger.info(f"Refresh: {updated} updated, {unchanged} unchanged")
+        
+        if manifest_file:
+            changes = write_change_manifest(manifest_file, results, self.fetcher.change_journal)
+            logger.info(f"Saved change manifest ({changes} new/updated documents) to: {manifest_file}")
+        self.fetcher.change_journal = None
         
         # Save checkpoint
         if checkpoint_file:
@@ -869,23 +1255,41 @@ class VBQPPLCrawler:
             with open(checkpoint_file, 'w', encoding='utf-8') as f:
                 json.dump(checkpoint_data, f, ensure_ascii=False, indent=2)
             logger.info(f"Saved fetch checkpoint to: {checkpoint_file}")
-        
-        return results
     
     def phase2_extract(self, fetch_results: List[FetchResult],
-                       output_file: str = None) -> List[DocumentContent]:
+                       output_file: str = None,
+                       output_jsonl: Optional[bool] = None,
+                       changed_ids: Optional[Set[str]] = None,
+                       resume: bool = True) -> Dict[str, int]:
         """
         Phase 2: Extract content from saved HTML files using multiprocessing
         
+        Documents are appended to <output_file>.partial.jsonl as they are
+        extracted, so memory stays flat and an interrupted run loses nothing:
+        the next run skips the doc ids already in the partial file. The partial
+        file becomes output_file once every document is done.
+        
         Args:
             fetch_results: List of FetchResult objects from Phase 1
             output_file: File to save extracted content
+            output_jsonl: Write JSON Lines instead of a JSON array (inferred from
+                the output file extension when None)
+            changed_ids: Only extract these documents (from a change manifest) and
+                merge them into the existing output file
+            resume: Continue an interrupted run from its partial file (False
+                discards it and starts over)
             
         Returns:
-            List of DocumentContent objects
+            Number of documents extracted in this run per status
         """
         # Filter only successful fetches
-        valid_results = [r for r in fetch_results if r.html_path and r.status in ['success', 'cached']]
+        valid_results = [r for r in fetch_results if r.html_path and r.status in FETCHED_STATUSES]
+        if changed_ids is not None:
+            valid_results = [r for r in valid_results if r.doc_id in changed_ids]
+        
+        partial_file, done_ids = self._open_partial_output(output_file, resume, self._partial_run(changed_ids))
+        if done_ids:
+            valid_results = [r for r in valid_results if r.doc_id not in done_ids]
         
         logger.info("=" * 60)
         logger.info("PHASE 2: Extracting content with multiprocessing")
@@ -893,81 +1297,146 @@ class VBQPPLCrawler:
         logger.info(f"Using {self.extract_workers} processes")
         logger.info("=" * 60)
         
-        if not valid_results:
-            logger.warning("No valid documents to extract")
-            return []
-        
         # Prepare arguments for multiprocessing
         extract_args = [
             (r.html_path, r.doc_id, r.url, r.original_name or "", r.original_link or "")
             for r in valid_results
         ]
         
+        if self.extractor == "lxml":
+            from fast_extractor import LxmlContentExtractor as extractor_cls
+        else:
+            extractor_cls = ContentExtractor
+        
         start_time = time.time()
-        extracted = []
+        counts: Dict[str, int] = {}
+        writer = CorpusWriter(partial_file, jsonl=True, append=True) if partial_file else None
         
-        # Use multiprocessing for CPU-bound extraction
-        with ProcessPoolExecutor(max_workers=self.extract_workers) as executor:
-            futures = {executor.submit(ContentExtractor.extract_from_file, args): args[1] 
-                       for args in extract_args}
+        try:
+            if extract_args:
+                # Use multiprocessing for CPU-bound extraction; each task carries a chunk
+                # of documents to cut pickling/IPC round trips per document
+                chunksize = max(1, min(EXTRACT_CHUNKSIZE, len(extract_args) // (self.extract_workers * 4)))
+                with ProcessPoolExecutor(max_workers=self.extract_workers) as executor, \
+                        tqdm(total=len(extract_args), desc="📄 Extracting Content", unit="doc",
+                             bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]") as pbar:
+                    results = executor.map(extractor_cls.extract_from_file, extract_args,
+                                           repeat(self.content_mode), chunksize=chunksize)
+                    for result in results:
+                        counts[result.status] = counts.get(result.status, 0) + 1
+                        if writer:
+                            writer.write(asdict(result))
+                        pbar.set_postfix_str(f"{result.id[:20]}..." if len(result.id) > 20 else result.id)
+                        pbar.update(1)
+            else:
+                logger.warning("No documents left to extract")
             
-            with tqdm(total=len(valid_results), desc="📄 Extracting Content", unit="doc",
-                      bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]") as pbar:
-                for future in as_completed(futures):
-                    doc_id = futures[future]
-                    try:
-                        result = future.result()
-                        extracted.append(result)
-                    except Exception as e:
-                        logger.error(f"Extraction failed for {doc_id}: {e}")
-                        extracted.append(DocumentContent(
-                            id=doc_id,
-                            title="Unknown",
+            # Also add not_found results from phase 1 (already in the output file when merging changes)
+            for r in fetch_results:
+                if r.status == 'not_found' and changed_ids is None and r.doc_id not in done_ids:
+                    counts['not_found'] = counts.get('not_found', 0) + 1
+                    if writer:
+                        writer.write(asdict(DocumentContent(
+                            id=r.doc_id,
+                            title="",
                             url="",
                             content="",
-                            status="error",
-                            error_message=str(e)
-                        ))
-                    
-                    pbar.set_postfix_str(f"{doc_id[:20]}..." if len(doc_id) > 20 else doc_id)
-                    pbar.update(1)
+                            status="not_found",
+                            error_message="Document not found in search results",
+                            original_name=r.original_name,
+                            original_link=r.original_link
+                        )))
+        except (Exception, KeyboardInterrupt) as e:
+            if partial_file:
+                logger.error(f"Phase 2 interrupted ({e}); run it again to resume from {partial_file}")
+            raise
+        finally:
+            if writer:
+                writer.close()
         
         elapsed = time.time() - start_time
         
         # Statistics
-        success = sum(1 for r in extracted if r.status == 'success')
-        pdf_skip = sum(1 for r in extracted if r.status == 'pdf_skip')
-        errors = sum(1 for r in extracted if r.status == 'error')
-        
         logger.info(f"Phase 2 completed in {elapsed:.2f}s")
-        logger.info(f"Success: {success}, PDF Skip: {pdf_skip}, Errors: {errors}")
-        
-        # Also add not_found results from phase 1
-        for r in fetch_results:
-            if r.status == 'not_found':
-                extracted.append(DocumentContent(
-                    id=r.doc_id,
-                    title="",
-                    url="",
-                    content="",
-                    status="not_found",
-                    error_message="Document not found in search results",
-                    original_name=r.original_name,
-                    original_link=r.original_link
-                ))
-        
-        # Save results
-        if output_file:
-            output_data = [asdict(r) for r in extracted]
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, ensure_ascii=False, indent=2)
-            logger.info(f"Saved extracted content to: {output_file}")
+        logger.info(f"Success: {counts.get('success', 0)}, PDF Skip: {counts.get('pdf_skip', 0)}, "
+                    f"Errors: {counts.get('error', 0)}, Resumed: {len(done_ids)}")
+        
+        if partial_file:
+            self._finish_partial_output(partial_file, output_file, output_jsonl, changed_ids)
+        
+        return counts
+    
+    def _partial_run(self, changed_ids: Optional[Set[str]], pipeline_changes: bool = False) -> Dict[str, Any]:
+        """What a partial output file holds, so it is only resumed by the same kind of run"""
+        if pipeline_changes:
+            changes = "pipeline"
+        elif changed_ids is not None:
+            changes = hashlib.sha256("\n".join(sorted(changed_ids)).encode('utf-8')).hexdigest()
+        else:
+            changes = None
+        return {"changes": changes, "content_mode": self.content_mode}
+    
+    @staticmethod
+    def _open_partial_output(output_file: Optional[str], resume: bool,
+                             run: Dict[str, Any]) -> Tuple[Optional[str], Set[str]]:
+        """
+        Partial JSONL file for output_file and the doc ids it already holds
         
-        return extracted
+        The run description (see _partial_run) is kept next to the partial file
+        in <partial>.meta.json. Resuming a partial file left by a different kind
+        of run (full vs changes-only, another manifest or content mode) raises
+        ValueError instead of mixing its records into this run's output.
+        """
+        if not output_file:
+            return None, set()
+        partial_file = f"{output_file}.partial.jsonl"
+        meta_file = f"{partial_file}.meta.json"
+        if resume and os.path.exists(partial_file):
+            saved_run = None
+            if os.path.exists(meta_file):
+                with open(meta_file, 'r', encoding='utf-8') as f:
+                    saved_run = json.load(f)
+            if saved_run != run:
+                raise ValueError(f"{partial_file} was left by a different run ({saved_run}, now {run}); "
+                                 f"rerun that command to finish it, or pass --no-resume to discard it")
+            done_ids = jsonl_ids(partial_file)
+            if done_ids:
+                logger.info(f"Resuming Phase 2: {len(done_ids)} documents already extracted in {partial_file}")
+            return partial_file, done_ids
+        
+        if os.path.exists(partial_file):
+            os.remove(partial_file)
+        with open(meta_file, 'w', encoding='utf-8') as f:
+            json.dump(run, f)
+        return partial_file, set()
+    
+    @staticmethod
+    def _finish_partial_output(partial_file: str, output_file: str,
+                               output_jsonl: Optional[bool], changed_ids: Optional[Set[str]]):
+        """Turn a complete partial file into output_file"""
+        output_jsonl = is_jsonl_path(output_file) if output_jsonl is None else output_jsonl
+        if changed_ids is not None and os.path.exists(output_file):
+            records = list(iter_corpus(partial_file))
+            if records:
+                count = merge_corpus(output_file, records, jsonl=output_jsonl)
+                logger.info(f"Merged {len(records)} changed documents into: {output_file} ({count} documents)")
+            os.remove(partial_file)
+        elif output_jsonl:
+            os.replace(partial_file, output_file)
+            logger.info(f"Saved extracted content to: {output_file}")
+        else:
+            write_corpus(output_file, iter_corpus(partial_file), jsonl=False)
+            os.remove(partial_file)
+            logger.info(f"Saved extracted content to: {output_file}")
+        os.remove(f"{partial_file}.meta.json")
     
     def run(self, vbqppl_list: List[Dict[str, Any]], 
             output_file: str,
-            checkpoint_file: str = None) -> List[DocumentContent]:
+            checkpoint_file: str = None,
+            output_jsonl: Optional[bool] = None,
+            manifest_file: str = None,
+            changes_only: bool = False,
+            resume: bool = True) -> Dict[str, int]:
         """
         Run the complete two-phase crawling process
         
@@ -975,13 +1444,18 @@ class VBQPPLCrawler:
             vbqppl_list: List of VBQPPL dictionaries
             output_file: File to save final extracted content
             checkpoint_file: File to save/load fetch checkpoint
+            output_jsonl: Write JSON Lines instead of a JSON array (inferred from
+                the output file extension when None)
+            manifest_file: Change manifest written by Phase 1
+            changes_only: Only re-extract the documents in the change manifest
+            resume: Continue an interrupted Phase 2 (see phase2_extract)
             
         Returns:
-            List of DocumentContent objects
+            Number of documents extracted per status
         """
-        # Check for existing checkpoint
+        # Check for existing checkpoint (a refresh always re-runs Phase 1)
         fetch_results = None
-        if checkpoint_file and os.path.exists(checkpoint_file):
+        if checkpoint_file and os.path.exists(checkpoint_file) and not self.fetcher.refresh:
             logger.info(f"Loading fetch checkpoint from: {checkpoint_file}")
             with open(checkpoint_file, 'r', encoding='utf-8') as f:
                 checkpoint_data = json.load(f)
@@ -990,12 +1464,231 @@ class VBQPPLCrawler:
         
         # Phase 1: Fetch HTML
         if fetch_results is None:
-            fetch_results = self.phase1_fetch(vbqppl_list, checkpoint_file)
+            fetch_results = self.phase1_fetch(vbqppl_list, checkpoint_file, manifest_file)
         
         # Phase 2: Extract content
-        extracted = self.phase2_extract(fetch_results, output_file)
+        changed_ids = load_change_manifest(manifest_file) if changes_only else None
+        return self.phase2_extract(fetch_results, output_file, output_jsonl, changed_ids, resume)
+    
+    def run_pipeline(self, vbqppl_list: List[Dict[str, Any]],
+                     output_file: str,
+                     checkpoint_file: str = None,
+                     output_jsonl: Optional[bool] = None,
+                     manifest_file: str = None,
+                     changes_only: bool = False,
+                     resume: bool = True,
+                     queue_size: int = 64) -> Dict[str, int]:
+        """
+        Fetch and extract at the same time (--pipeline)
         
-        return extracted
+        Each completed fetch goes through a bounded queue straight to the
+        extraction processes, so extraction runs while fetching is still in
+        progress. Freshly fetched pages are sent to the workers as bytes while
+        a background thread writes them to the HTML cache (WriteBehindStore);
+        cached pages are read by the workers as in Phase 2. The checkpoint and
+        change manifest are saved as in Phase 1, so `--phase 2` still works
+        afterwards. Output is streamed and resumable as in phase2_extract.
+        
+        Changes are journaled as they are fetched and a page's validators are
+        only recorded once the page is stored (HTMLFetcher.save_page), so after
+        an interrupted run the documents it had found changed are still listed
+        in the manifest and, with changes_only, extracted by the rerun.
+        
+        Args:
+            vbqppl_list: List of VBQPPL dictionaries
+            output_file: File to save final extracted content
+            checkpoint_file: File to save the fetch checkpoint to
+            output_jsonl: Write JSON Lines instead of a JSON array (inferred from
+                the output file extension when None)
+            manifest_file: JSONL file listing the new and updated documents
+            changes_only: Only extract new and updated documents and merge them
+                into the existing output file
+            resume: Continue an interrupted run from its partial output file
+            queue_size: Max fetched documents waiting for extraction (and
+                pages waiting to be written); fetching pauses beyond that
+            
+        Returns:
+            Number of documents extracted per status
+        """
+        # Same shortcut as run(): an existing checkpoint means Phase 1 is done
+        if checkpoint_file and os.path.exists(checkpoint_file) and not self.fetcher.refresh:
+            logger.info(f"Fetch checkpoint {checkpoint_file} exists, extracting from it")
+            with open(checkpoint_file, 'r', encoding='utf-8') as f:
+                fetch_results = [FetchResult(**r) for r in json.load(f)]
+            changed_ids = load_change_manifest(manifest_file) if changes_only else None
+            return self.phase2_extract(fetch_results, output_file, output_jsonl, changed_ids, resume)
+        
+        logger.info("=" * 60)
+        logger.info(f"PIPELINE: Fetching ({self.fetch_engine} engine) and extracting "
+                    f"({self.extract_workers} processes) concurrently")
+        logger.info(f"Total documents to fetch: {len(vbqppl_list)}, queue size: {queue_size}")
+        logger.info("=" * 60)
+        
+        if self.extractor == "lxml":
+            from fast_extractor import LxmlContentExtractor as extractor_cls
+        else:
+            extractor_cls = ContentExtractor
+        
+        partial_file, done_ids = self._open_partial_output(output_file, resume,
+                                                           self._partial_run(None, pipeline_changes=changes_only))
+        # Changes found by an interrupted run are reported as cached/unchanged now
+        journaled_ids = self.fetcher.open_change_journal(change_journal_path(manifest_file))
+        store = self.fetcher.store
+        write_behind = WriteBehindStore(store, max_pending=queue_size)
+        self.fetcher.store = write_behind
+        
+        fetched: "queue.Queue[Optional[FetchResult]]" = queue.Queue(maxsize=queue_size)
+        fetch_results: List[FetchResult] = []
+        fetch_errors: List[BaseException] = []
+        
+        stop = threading.Event()
+        
+        def hand_over(result: Optional[FetchResult]):
+            # Waits while the queue is full; once extraction has stopped, aborts the fetch instead
+            while not stop.is_set():
+                try:
+                    fetched.put(result, timeout=1)
+                    return
+                except queue.Full:
+                    pass
+            if result is not None:
+                raise RuntimeError("Pipeline extraction stopped")
+        
+        def fetch():
+            try:
+                fetch_results.extend(self._fetch(vbqppl_list, result_callback=hand_over))
+            except BaseException as e:
+                fetch_errors.append(e)
+            finally:
+                hand_over(None)
+        
+        start_time = time.time()
+        fetch_thread = threading.Thread(target=fetch, name="pipeline-fetch", daemon=True)
+        counts: Dict[str, int] = {}
+        extracted_ids: Set[str] = set()
+        writer = CorpusWriter(partial_file, jsonl=True, append=True) if partial_file else None
+        
+        def save(result: DocumentContent):
+            counts[result.status] = counts.get(result.status, 0) + 1
+            extracted_ids.add(result.id)
+            if writer:
+                writer.write(asdict(result))
+        
+        try:
+            with ProcessPoolExecutor(max_workers=self.extract_workers) as executor, \
+                    tqdm(desc="📄 Extracting Content", unit="doc", position=1) as pbar:
+                fetch_thread.start()
+                in_flight = set()
+                while True:
+                    r = fetched.get()
+                    if r is None:
+                        break
+                    html_content = write_behind.take(self.fetcher._generate_filename(r.doc_id)) if r.doc_id else None
+                    changed = r.status in MANIFEST_CHANGES or r.doc_id in journaled_ids
+                    if r.doc_id in done_ids or (changes_only and not changed):
+                        continue
+                    if r.status == 'not_found':
+                        save(DocumentContent(
+                            id=r.doc_id,
+                            title="",
+                            url="",
+                            content="",
+                            status="not_found",
+                            error_message="Document not found in search results",
+                            original_name=r.original_name,
+                            original_link=r.original_link
+                        ))
+                        continue
+                    if not r.html_path or r.status not in FETCHED_STATUSES:
+                        continue
+                    
+                    metadata = (r.doc_id, r.url, r.original_name or "", r.original_link or "")
+                    if html_content is not None:
+                        future = executor.submit(extractor_cls.extract_from_bytes,
+                                                 (html_content.encode('utf-8'),) + metadata, self.content_mode)
+                    else:
+                        future = executor.submit(extractor_cls.extract_from_file,
+                                                 (r.html_path,) + metadata, self.content_mode)
+                    in_flight.add(future)
+                    
+                    # Keep at most two tasks per process queued; write whatever is done
+                    done, in_flight = wait(in_flight, timeout=0 if len(in_flight) < 2 * self.extract_workers else None,
+                                           return_when=FIRST_COMPLETED)
+                    for future in done:
+                        save(future.result())
+                        pbar.update(1)
+                
+                for future in as_completed(in_flight):
+                    save(future.result())
+                    pbar.update(1)
+        except (Exception, KeyboardInterrupt) as e:
+            # Unblock the fetch thread (full queue, pages waiting for take()) so it can be joined
+            stop.set()
+            write_behind.stop_holding()
+            if partial_file:
+                logger.error(f"Pipeline interrupted ({e}); run it again to resume from {partial_file}")
+            raise
+        finally:
+            if writer:
+                writer.close()
+            fetch_thread.join()
+            write_behind.close()
+            self.fetcher.store = store
+        
+        if fetch_errors:
+            raise fetch_errors[0]
+        
+        elapsed = time.time() - start_time
+        self._save_fetch_results(fetch_results, elapsed, checkpoint_file, manifest_file)
+        logger.info(f"Pipeline completed in {elapsed:.2f}s")
+        logger.info(f"Success: {counts.get('success', 0)}, PDF Skip: {counts.get('pdf_skip', 0)}, "
+                    f"Errors: {counts.get('error', 0)}, Resumed: {len(done_ids)}, "
+                    f"cache write errors: {write_behind.errors}")
+        
+        if partial_file:
+            self._finish_partial_output(partial_file, output_file, output_jsonl,
+                                        extracted_ids if changes_only else None)
+        return counts
+
+
+def change_journal_path(manifest_file: Optional[str]) -> Optional[str]:
+    """Journal the fetcher appends changes to while Phase 1 runs (see HTMLFetcher.open_change_journal)"""
+    return f"{manifest_file}.partial.jsonl" if manifest_file else None
+
+
+def write_change_manifest(manifest_file: str, results: List[FetchResult],
+                          journal_file: Optional[str] = None) -> int:
+    """
+    Write the new and updated documents of a Phase 1 run as JSON Lines
+    
+    Changes come from the journal written while fetching, which also holds the
+    changes of interrupted earlier runs (those documents are reported as
+    cached/unchanged by now), limited to documents that are in the cache. The
+    journal is removed once the manifest is written.
+    """
+    detected_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    stored = {r.doc_id for r in results if r.status in FETCHED_STATUSES}
+    changes: Dict[str, Dict[str, Any]] = {}
+    if journal_file and os.path.exists(journal_file):
+        for record in iter_corpus(journal_file):
+            # A document first seen as new stays new, even if it changed again since
+            if record['doc_id'] in stored and changes.get(record['doc_id'], {}).get('change') != 'new':
+                changes[record['doc_id']] = record
+    for r in results:
+        if r.status in MANIFEST_CHANGES and r.doc_id not in changes:
+            changes[r.doc_id] = {'doc_id': r.doc_id, 'change': MANIFEST_CHANGES[r.status], 'url': r.url,
+                                 'html_path': r.html_path, 'detected_at': detected_at}
+    count = write_corpus(manifest_file, changes.values(), jsonl=True)
+    if journal_file and os.path.exists(journal_file):
+        os.remove(journal_file)
+    return count
+
+
+def load_change_manifest(manifest_file: str) -> Set[str]:
+    """Document IDs listed in a change manifest"""
+    if not manifest_file or not os.path.exists(manifest_file):
+        return set()
+    return {record['doc_id'] for record in iter_corpus(manifest_file)}
 
 
 def load_dieu_json(file_path: str) -> List[Dict[str, Any]]:
@@ -1028,8 +1721,20 @@ def main():
                         help='Path to Dieu.json file')
     parser.add_argument('--output', '-o', type=str, default='../data/vbqppl_content.json',
                         help='Path to output JSON file')
+    parser.add_argument('--output-format', type=str, choices=['auto', 'json', 'jsonl'], default='auto',
+                        help='Output format: json (array), jsonl (one document per line), '
+                             'auto (from the output file extension)')
     parser.add_argument('--html-dir', type=str, default='./html_cache',
                         help='Directory to cache fetched HTML files')
+    parser.add_argument('--html-store', type=str, choices=list(HTML_STORE_BACKENDS), default='file',
+                        help='HTML cache layout: file (one .html per document), zstd (compressed, sharded) '
+                             'or pack (append-only pack file + index); see html_store.py migrate')
+    parser.add_argument('--extractor', type=str, choices=['bs4', 'lxml'], default='bs4',
+                        help="Phase 2 HTML parser: bs4 (BeautifulSoup) or lxml (faster, same output; "
+                             "verify with check_extractor_parity.py)")
+    parser.add_argument('--content-mode', type=str, choices=list(CONTENT_MODES), default='full',
+                        help="Document content field: full (always extract the whole page), lazy (only for "
+                             "documents without sections) or sections (join the sections)")
     parser.add_argument('--checkpoint', '-c', type=str, default='./fetch_checkpoint.json',
                         help='Path to fetch checkpoint file')
     parser.add_argument('--fetch-workers', type=int, default=20,
@@ -1038,19 +1743,55 @@ def main():
                         help='Number of processes for extraction (Phase 2), defaults to CPU count - 4')
     parser.add_argument('--delay', '-d', type=float, default=0.5,
                         help='Delay between requests per thread in seconds')
+    parser.add_argument('--engine', type=str, choices=['threads', 'async'], default='threads',
+                        help='Phase 1 fetch engine: threads (sleep-paced) or async (httpx, per-host rate limit)')
+    parser.add_argument('--rate', type=float, default=10.0,
+                        help='Async engine: max requests/sec per host')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Async engine: max documents in flight')
+    parser.add_argument('--resolve-cache', type=str, default=DEFAULT_RESOLVE_CACHE,
+                        help='SQLite cache of doc_id -> URL search results, shared with qa_dataset_crawler.py')
+    parser.add_argument('--no-resolve-cache', action='store_true',
+                        help='Always search, without reading or writing the resolve cache')
+    parser.add_argument('--negative-ttl-days', type=float, default=7,
+                        help='Days before a document that was not found is searched again')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Re-check cached HTML with conditional GETs and overwrite changed documents')
+    parser.add_argument('--manifest', type=str, default='./changes.jsonl',
+                        help='Change manifest (new/updated documents) written by Phase 1')
+    parser.add_argument('--changes-only', action='store_true',
+                        help='Phase 2: only extract the documents in --manifest and merge them into --output')
+    parser.add_argument('--no-resume', action='store_true',
+                        help="Discard the partial output of an interrupted Phase 2 instead of resuming it")
     parser.add_argument('--limit', '-l', type=int, default=None,
                         help='Limit number of documents to process')
     parser.add_argument('--phase', type=str, choices=['all', '1', '2'], default='all',
                         help='Which phase to run: all, 1 (fetch only), 2 (extract only)')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Run both phases concurrently: extract each document as soon as it is fetched')
+    parser.add_argument('--pipeline-queue', type=int, default=64,
+                        help='Pipeline: max fetched documents waiting for extraction or for the cache write')
     
     args = parser.parse_args()
+    if args.pipeline and args.phase != 'all':
+        parser.error("--pipeline runs both phases; it cannot be combined with --phase 1 or 2")
+    output_jsonl = None if args.output_format == 'auto' else args.output_format == 'jsonl'
     
     # Initialize crawler
     crawler = VBQPPLCrawler(
         html_dir=args.html_dir,
         fetch_workers=args.fetch_workers,
         extract_workers=args.extract_workers,
-        fetch_delay=args.delay
+        fetch_delay=args.delay,
+        fetch_engine=args.engine,
+        fetch_rate=args.rate,
+        fetch_concurrency=args.concurrency,
+        resolve_cache=None if args.no_resolve_cache else args.resolve_cache,
+        negative_ttl=args.negative_ttl_days * 24 * 3600,
+        refresh=args.refresh,
+        html_store=args.html_store,
+        extractor=args.extractor,
+        content_mode=args.content_mode
     )
     
     if args.phase == '2':
@@ -1063,7 +1804,9 @@ def main():
             checkpoint_data = json.load(f)
         fetch_results = [FetchResult(**r) for r in checkpoint_data]
         
-        crawler.phase2_extract(fetch_results, args.output)
+        changed_ids = load_change_manifest(args.manifest) if args.changes_only else None
+        crawler.phase2_extract(fetch_results, args.output, output_jsonl, changed_ids,
+                               resume=not args.no_resume)
     else:
         # Load Dieu.json
         logger.info(f"Loading input file: {args.input}")
@@ -1081,10 +1824,16 @@ def main():
         
         if args.phase == '1':
             # Phase 1 only - fetch and save checkpoint
-            crawler.phase1_fetch(vbqppl_list, args.checkpoint)
+            crawler.phase1_fetch(vbqppl_list, args.checkpoint, args.manifest)
+        elif args.pipeline:
+            # Run both phases concurrently
+            crawler.run_pipeline(vbqppl_list, args.output, args.checkpoint, output_jsonl,
+                                 args.manifest, args.changes_only, resume=not args.no_resume,
+                                 queue_size=args.pipeline_queue)
         else:
             # Run both phases
-            crawler.run(vbqppl_list, args.output, args.checkpoint)
+            crawler.run(vbqppl_list, args.output, args.checkpoint, output_jsonl,
+                        args.manifest, args.changes_only, resume=not args.no_resume)
     
     logger.info("Done!")
 